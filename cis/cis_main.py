@@ -112,10 +112,18 @@ def col_cmd(main_arguments):
     """
     from cis.exceptions import ClassNotFoundError, CISError
     from cis.collocation.col import Collocate
+    import cis.collocation.data_index as data_index
+    import cis.collocation.neighbour_sets as neighbour_sets
+    from cis.utils import listify
 
     output_file = main_arguments.output
     data_reader = DataReader()
     missing_data_for_missing_samples = False
+    if main_arguments.index_cache:
+        data_index.enable_index_cache()
+    if main_arguments.chunk_size is not None:
+        __collocate_in_chunks(main_arguments)
+        return
     if main_arguments.samplevariable is not None:
         sample_data = data_reader.read_data_list(main_arguments.samplefiles, main_arguments.samplevariable,
                                                  main_arguments.sampleproduct)[0]
@@ -135,18 +143,92 @@ def col_cmd(main_arguments):
     kern_name = main_arguments.samplegroup['kernel'][0] if main_arguments.samplegroup['kernel'] is not None else None
     kern_options = main_arguments.samplegroup['kernel'][1] if main_arguments.samplegroup['kernel'] is not None else None
 
-    for input_group in main_arguments.datagroups:
-        variables = input_group['variables']
-        filenames = input_group['filenames']
-        product = input_group["product"] if input_group["product"] is not None else None
+    # Every data group is collocated onto the same sample points, so when there is more than one variable keep the data
+    # points found for each sample point in case another variable has the same coordinates. With only one there is
+    # nothing to reuse them, so they are found a block of sample points at a time instead.
+    num_variables = sum(len(listify(input_group['variables'])) for input_group in main_arguments.datagroups)
+    if num_variables > 1:
+        neighbour_sets.enable_neighbour_set_store()
+    try:
+        for input_group in main_arguments.datagroups:
+            variables = input_group['variables']
+            filenames = input_group['filenames']
+            product = input_group["product"] if input_group["product"] is not None else None
+
+            data = data_reader.read_data_list(filenames, variables, product)
+            data_writer = DataWriter()
+            try:
+                output = col.collocate(data, col_name, col_options, kern_name, kern_options, main_arguments.workers)
+                data_writer.write_data(output, output_file)
+            except ClassNotFoundError as e:
+                __error_occurred(str(e) + "\nInvalid collocation option.")
+    finally:
+        neighbour_sets.disable_neighbour_set_store()
+
+
+def __read_sample_chunks(data_reader, main_arguments):
+    """
+    Reads the sample points one file at a time, splitting each into chunks of at most the chunk size. Each chunk is
+    sliced from the variables in the file before they are read, so that only the points in the chunk are read, where
+    the variables have not already had to be read in full to create the sample points.
+
+    :param data_reader: DataReader with which to read the files
+    :param main_arguments: The command line arguments (minus the col command)
+    :return: generator of UngriddedData or UngriddedCoordinates objects
+    """
+    for filename in main_arguments.samplefiles:
+        if main_arguments.samplevariable is not None:
+            sample_data = data_reader.read_data_list(filename, main_arguments.samplevariable,
+                                                     main_arguments.sampleproduct)[0]
+        else:
+            sample_data = data_reader.read_coordinates(filename, main_arguments.sampleproduct)
+        if sample_data.is_gridded:
+            __error_occurred("Only ungridded sample points can be collocated in chunks")
+        num_points = sample_data.get_number_of_points()
+        for start in range(0, num_points, main_arguments.chunk_size):
+            yield sample_data.slice_points(start, start + main_arguments.chunk_size)
+
+
+def __collocate_in_chunks(main_arguments):
+    """
+    Collocates onto the sample points in chunks, appending the output for each chunk to the output file, so that only
+    one chunk of the sample points and output is held in memory at a time. The data groups are read once and held for
+    every chunk.
+
+    :param main_arguments: The command line arguments (minus the col command)
+    """
+    from cis.exceptions import ClassNotFoundError
+    from cis.collocation.col import Collocate
+    from cis.data_io.write_netcdf import append_data
+
+    output_file = main_arguments.output
+    data_reader = DataReader()
+    missing_data_for_missing_samples = main_arguments.samplevariable is not None
+
+    col_name = main_arguments.samplegroup['collocator'][0] if main_arguments.samplegroup[
+                                                                  'collocator'] is not None else None
+    col_options = main_arguments.samplegroup['collocator'][1] if main_arguments.samplegroup[
+                                                                     'collocator'] is not None else {}
+    kern_name = main_arguments.samplegroup['kernel'][0] if main_arguments.samplegroup['kernel'] is not None else None
+    kern_options = main_arguments.samplegroup['kernel'][1] if main_arguments.samplegroup['kernel'] is not None else None
+
+    # Each data group is read once and reused for every chunk. The values are only read from the files when they are
+    # first collocated, but are then held in memory until every chunk has been collocated.
+    data_list = [data_reader.read_data_list(input_group['filenames'], input_group['variables'], input_group["product"])
+                 for input_group in main_arguments.datagroups]
 
-        data = data_reader.read_data_list(filenames, variables, product)
-        data_writer = DataWriter()
+    for chunk_number, sample_chunk in enumerate(__read_sample_chunks(data_reader, main_arguments)):
+        logging.info("Collocating chunk {} of the sample points".format(chunk_number + 1))
+        col = Collocate(sample_chunk, missing_data_for_missing_samples)
+        output = []
         try:
-            output = col.collocate(data, col_name, col_options, kern_name, kern_options)
-            data_writer.write_data(output, output_file)
+            for data in data_list:
+                # Collocate updates the options it is given, so give it a fresh copy for each call.
+                output.extend(col.collocate(data, col_name, dict(col_options), kern_name, kern_options,
+                                            main_arguments.workers))
         except ClassNotFoundError as e:
             __error_occurred(str(e) + "\nInvalid collocation option.")
+        append_data(output, output_file, create=(chunk_number == 0))
 
 
 def subset_cmd(main_arguments):
@@ -176,9 +258,12 @@ def aggregate_cmd(main_arguments):
     :param main_arguments: The command line arguments (minus the aggregate command)
     """
     from cis.aggregation.aggregate import Aggregate
+    import cis.collocation.data_index as data_index
 
     if len(main_arguments.datagroups) > 1:
         __error_occurred("Aggregation can only be performed on one data group")
+    if not main_arguments.no_index_cache:
+        data_index.enable_index_cache()
     input_group = main_arguments.datagroups[0]
 
     variables = input_group['variables']
@@ -78,6 +78,10 @@ class CollocatorFactory(object):
             'nn_True_False': None,
             'nn_False_True': [ci.GriddedUngriddedCollocator, None, 'nearest'],
             'nn_True_True': [ci.GriddedCollocator, None, ci.gridded_gridded_nn],
+            'con_False_False': None,
+            'con_True_False': None,
+            'con_False_True': None,
+            'con_True_True': [ci.GriddedCollocator, None, ci.gridded_gridded_con],
             'bin_False_False': None,
             'bin_True_False': [ci.GeneralGriddedCollocator, ci.BinnedCubeCellOnlyConstraint, _GenericKernel],
             'bin_False_True': None,
@@ -86,6 +90,14 @@ class CollocatorFactory(object):
             'box_True_False': [ci.GeneralGriddedCollocator, ci.SepConstraintKdtree, _GenericKernel],
             'box_False_True': [ci.GeneralUngriddedCollocator, ci.SepConstraintKdtree, _GenericKernel],
             'box_True_True': [ci.GeneralGriddedCollocator, ci.SepConstraintKdtree, _GenericKernel],
+            'box_t_False_False': [ci.GeneralUngriddedCollocator, ci.SepConstraintTimeWindow, _GenericKernel],
+            'box_t_True_False': None,
+            'box_t_False_True': [ci.GeneralUngriddedCollocator, ci.SepConstraintTimeWindow, _GenericKernel],
+            'box_t_True_True': None,
+            'nn_k_False_False': [ci.GeneralUngriddedCollocator, ci.NNKConstraint, _GenericKernel],
+            'nn_k_True_False': [ci.GeneralGriddedCollocator, ci.NNKConstraint, _GenericKernel],
+            'nn_k_False_True': [ci.GeneralUngriddedCollocator, ci.NNKConstraint, _GenericKernel],
+            'nn_k_True_True': [ci.GeneralGriddedCollocator, ci.NNKConstraint, _GenericKernel],
             'dummy_False_False': [ci.DummyCollocator, None, None],
             'dummy_True_False': None,
             'dummy_False_True': None,
@@ -162,7 +174,7 @@ class Collocate(object):
         self.coords_to_be_written = True
         self.collocator_factory = collocator_factory
 
-    def collocate(self, data, col_name=None, col_params=None, kern=None, kern_params=None):
+    def collocate(self, data, col_name=None, col_params=None, kern=None, kern_params=None, workers=1):
         """
         Perform the collocation.
 
@@ -171,6 +183,7 @@ class Collocate(object):
         :param dict col_params: Parameters dictionary for the collocation and constraint
         :param str kern: The kernel to use
         :param dict kern_params: The kernel parameters to use
+        :param int workers: The number of worker processes to collocate with, for collocators that support them
         :return CommonData: The collocated data
         :raises CoordinateNotFoundError: If the collocator was unable to compare the sample and data points
         """
@@ -198,6 +211,13 @@ class Collocate(object):
 
         logging.info("Kernel: " + str(kernel_name))
 
+        if workers > 1:
+            if hasattr(col, 'workers'):
+                col.workers = workers
+            else:
+                logging.warning("Collocator " + str(col_name) + " does not support multiple workers, "
+                                "collocating in a single process")
+
         logging.info("Collocating, this could take a while...")
         t1 = time()
         try:
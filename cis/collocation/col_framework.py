@@ -126,6 +126,40 @@ class AbstractDataOnlyKernel(Kernel):
         :raises ValueError: If there are any problems creating a value
         """
 
+    def get_value_for_data_only_in_groups(self, values, offsets):
+        """
+        This method returns the kernel values for many groups of data values at once, where group i is given by
+        values[offsets[i]:offsets[i + 1]]. It is used by collocators which are able to constrain a whole block of
+        sample points in one go, so that the kernel is called once per block rather than once per sample point.
+
+        This default implementation simply calls :meth:`.AbstractDataOnlyKernel.get_value_for_data_only` on each
+        non-empty group. Subclasses should override it with a vectorised implementation where possible.
+
+        :param values: A 1-D numpy array of the data values for all of the groups, in group order
+        :param offsets: A 1-D integer numpy array of length (number of groups + 1) giving the start of each group in
+         values, the last element being the total number of values
+        :return: A masked array of shape (:attr:`.Kernel.return_size`, number of groups); groups for which no value
+         could be calculated are masked
+        """
+        num_groups = len(offsets) - 1
+        result = np.ma.masked_all((self.return_size, num_groups))
+        for i in range(num_groups):
+            group_values = values[offsets[i]:offsets[i + 1]]
+            if len(group_values) == 0:
+                continue
+            try:
+                value_obj = self.get_value_for_data_only(group_values)
+            except ValueError:
+                continue
+            # Mirror the per-point collocation: NaNs are only masked for kernels which return several values
+            if isinstance(value_obj, tuple):
+                for idx, val in enumerate(value_obj):
+                    if not np.isnan(val):
+                        result[idx, i] = val
+            else:
+                result[0, i] = value_obj
+        return result
+
 
 class Constraint(object):
     """
@@ -1,3 +1,5 @@
+from abc import ABCMeta, abstractmethod
+import copy
 import logging
 
 import iris
@@ -15,6 +17,7 @@ from cis.data_io.gridded_data import GriddedData, make_from_cube, GriddedDataLis
 from cis.data_io.hyperpoint import HyperPoint, HyperPointList
 from cis.data_io.ungridded_data import Metadata, UngriddedDataList, UngriddedData
 import cis.collocation.data_index as data_index
+from cis.collocation.neighbour_sets import NeighbourSets, get_neighbour_set_store
 from cis.utils import log_memory_profile, set_standard_name_if_valid
 
 
@@ -23,6 +26,12 @@ class GeneralUngriddedCollocator(Collocator):
     Collocator for locating onto ungridded sample points
     """
 
+    #: The number of sample points to constrain together when collocating in batch
+    sample_block_size = 10000
+
+    #: The number of worker processes to use when collocating in batch
+    workers = 1
+
     def collocate(self, points, data, constraint, kernel):
         """
         This collocator takes a list of HyperPoints and a data object (currently either Ungridded
@@ -41,8 +50,14 @@ class GeneralUngriddedCollocator(Collocator):
         log_memory_profile("GeneralUngriddedCollocator Initial")
 
         if isinstance(data, list):
-            # Indexing and constraints (for SepConstraintKdTree) will only take place on the first iteration,
-            # so we really can just call this method recursively if we've got a list of data.
+            # Variables sharing the same coordinates can be constrained together in a single pass.
+            if len(data) > 1 and self._can_collocate_in_batch(constraint, kernel) and \
+                    not hasattr(kernel, "get_values_in_batch") and \
+                    not getattr(constraint, "constrain_variables_separately", False):
+                output = self._collocate_variables_together(points, data, constraint, kernel)
+                if output is not None:
+                    return output
+            # Otherwise call this method recursively for each variable.
             output = UngriddedDataList()
             for var in data:
                 output.extend(self.collocate(points, var, constraint, kernel))
@@ -94,43 +109,318 @@ class GeneralUngriddedCollocator(Collocator):
         else:
             sample_enumerator = sample_points.enumerate_all_points
 
-        for i, point in sample_enumerator():
-            # Log progress periodically.
-            cell_count += 1
-            if cell_count == 1000:
-                total_count += cell_count
-                cell_count = 0
-                logging.info("    Processed {} points of {}".format(total_count, sample_points_count))
-
-            if constraint is None:
-                con_points = data_points
-            else:
-                con_points = constraint.constrain_points(point, data_points)
-            try:
-                value_obj = kernel.get_value(point, con_points)
-                # Kernel returns either a single value or a tuple of values to insert into each output variable.
-                if isinstance(value_obj, tuple):
-                    for idx, val in enumerate(value_obj):
-                        if not np.isnan(val):
-                            values[idx, i] = val
+        if self._can_collocate_in_batch(constraint, kernel):
+            self._collocate_in_batch(sample_points, [data_points], constraint, kernel, values)
+        else:
+            for i, point in sample_enumerator():
+                # Log progress periodically.
+                cell_count += 1
+                if cell_count == 1000:
+                    total_count += cell_count
+                    cell_count = 0
+                    logging.info("    Processed {} points of {}".format(total_count, sample_points_count))
+
+                if constraint is None:
+                    con_points = data_points
                 else:
-                    values[0, i] = value_obj
-            except CoordinateMultiDimError as e:
-                raise NotImplementedError(e)
-            except ValueError as e:
-                pass
+                    con_points = constraint.constrain_points(point, data_points)
+                try:
+                    value_obj = kernel.get_value(point, con_points)
+                    # Kernel returns either a single value or a tuple of values to insert into each output variable.
+                    if isinstance(value_obj, tuple):
+                        for idx, val in enumerate(value_obj):
+                            if not np.isnan(val):
+                                values[idx, i] = val
+                    else:
+                        values[0, i] = value_obj
+                except CoordinateMultiDimError as e:
+                    raise NotImplementedError(e)
+                except ValueError as e:
+                    pass
         log_memory_profile("GeneralUngriddedCollocator after running kernel on sample points")
 
+        return_data = self._create_output(points, var_set_details, values)
+        log_memory_profile("GeneralUngriddedCollocator final")
+
+        return return_data
+
+    def _create_output(self, points, var_set_details, values):
+        """
+        Creates the output data for the collocated values of a variable.
+
+        :param points: Object defining the sample points
+        :param var_set_details: List of the details of each output variable, as returned by the kernel
+        :param values: Masked array of shape (number of output variables, number of sample points)
+        :return UngriddedDataList: The collocated data
+        """
         return_data = UngriddedDataList()
         for idx, var_details in enumerate(var_set_details):
-            var_metadata = Metadata(name=var_details[0], long_name=var_details[1], shape=(len(sample_points),),
+            var_metadata = Metadata(name=var_details[0], long_name=var_details[1], shape=(values.shape[1],),
                                     missing_value=self.fill_value, units=var_details[3])
             set_standard_name_if_valid(var_metadata, var_details[2])
             return_data.append(UngriddedData(values[idx, :], var_metadata, points.coords()))
-        log_memory_profile("GeneralUngriddedCollocator final")
-
         return return_data
 
+    def _collocate_variables_together(self, points, data, constraint, kernel):
+        """
+        Collocates a list of variables which share the same coordinates in a single pass, finding the data points
+        constrained for each sample point once and then applying the kernel to the values of every variable.
+
+        :param UngriddedData or UngriddedCoordinates points: Object defining the sample points
+        :param list data: The variables to collocate
+        :param constraint: A constraint providing constrain_points_in_batch, a DummyConstraint or None
+        :param kernel: A data only kernel
+        :return UngriddedDataList: The collocated data, or None if the variables do not all have the same coordinates
+        """
+        sample_points = points.get_all_points()
+        data_points_list = [var.get_non_masked_points() for var in data]
+
+        _fix_longitude_range(points.coords(), sample_points)
+        for data_points in data_points_list:
+            _fix_longitude_range(points.coords(), data_points)
+
+        data_coords = data_points_list[0].get_coord_arrays()
+        for data_points in data_points_list[1:]:
+            if not _are_same_coords(data_coords, data_points.get_coord_arrays()):
+                return None
+        logging.info("--> Collocating {} variables with the same coordinates together".format(len(data)))
+
+        # Index the points which are not masked in every variable.
+        combined_points = copy.copy(data_points_list[0])
+        combined_mask = np.logical_and.reduce([np.ma.getmaskarray(data_points.get_value_array())
+                                               for data_points in data_points_list])
+        combined_points.data = np.ma.array(np.ma.getdata(combined_points.data), mask=combined_mask)
+        data_index.create_indexes(constraint, points, combined_points, None)
+        data_index.create_indexes(kernel, points, combined_points, None)
+        log_memory_profile("GeneralUngriddedCollocator after indexing")
+
+        var_set_details_list = [kernel.get_variable_details(var.name(), var.metadata.long_name,
+                                                            var.metadata.standard_name, var.units) for var in data]
+        return_size = len(var_set_details_list[0])
+        values = np.ma.masked_all((len(data) * return_size, len(sample_points)))
+        values.fill_value = self.fill_value
+        logging.info("    {} sample points".format(len(sample_points)))
+
+        self._collocate_in_batch(sample_points, data_points_list, constraint, kernel, values)
+        log_memory_profile("GeneralUngriddedCollocator after running kernel on sample points")
+
+        output = UngriddedDataList()
+        for var_idx, var_set_details in enumerate(var_set_details_list):
+            output.extend(self._create_output(points, var_set_details,
+                                              values[var_idx * return_size:(var_idx + 1) * return_size]))
+        return output
+
+    @staticmethod
+    def _can_collocate_in_batch(constraint, kernel):
+        """
+        Determines whether the sample points can be collocated in blocks using arrays of data indices, rather than one
+        HyperPoint at a time. This needs either a data only kernel and a constraint which can work on a block of
+        sample points (or no constraint at all), or a kernel which can look up the values for a block of sample points
+        itself and a constraint which does no more than limit the separation in the kernel's coordinate.
+
+        :param constraint: The constraint instance (or None)
+        :param kernel: The kernel instance
+        :return: True if the batch collocation can be used
+        """
+        if hasattr(kernel, "get_values_in_batch"):
+            return _get_kernel_separation_only(constraint, kernel)[0]
+        if not (hasattr(kernel, "get_value_for_data_only_in_groups") or
+                hasattr(kernel, "get_value_for_distances_in_groups")):
+            return False
+        return constraint is None or isinstance(constraint, DummyConstraint) or \
+            hasattr(constraint, "constrain_points_in_batch")
+
+    def _collocate_in_batch(self, sample_points, data_points_list, constraint, kernel, values):
+        """
+        Collocates the data onto the sample points a block of sample points at a time. The constraint returns the
+        indices of the data points for every sample point in the block and the kernel reduces over the corresponding
+        data values with numpy, so that no HyperPoints are created. Kernels providing get_value_for_distances_in_groups
+        are also given the horizontal distance from the sample point to each data point. Kernels providing
+        get_values_in_batch look up the values for the block themselves.
+
+        Several variables sharing the same coordinates can be collocated together. The data points are then
+        constrained once for all of them, including any point which is not masked in at least one variable, and the
+        points masked in each variable are removed before the kernel is applied to its values.
+
+        :param sample_points: HyperPointView of the sample points
+        :param data_points_list: List of HyperPointViews of the (non-masked) data points of each variable, which must
+         all have the same coordinates
+        :param constraint: A constraint providing constrain_points_in_batch, a DummyConstraint or None
+        :param kernel: A data only kernel, or a kernel providing get_value_for_distances_in_groups or
+         get_values_in_batch
+        :param values: Masked array of shape (number of variables * return size, number of sample points) in which to
+         store the output, the rows for each variable following those for the previous one
+        """
+        sample_indices = np.arange(len(sample_points))
+        if self.missing_data_for_missing_sample and sample_points.data is not None:
+            sample_indices = sample_indices[~np.ma.getmaskarray(sample_points.data).ravel()]
+        self._collocate_coords_in_batch(sample_indices, sample_points.get_coord_arrays(), data_points_list,
+                                        constraint, kernel, values)
+
+    def _collocate_coords_in_batch(self, sample_indices, sample_coords, data_points_list, constraint, kernel, values):
+        """
+        Collocates the data onto the sample points with the given coordinates in batch, as described for
+        _collocate_in_batch.
+
+        :param sample_indices: Indices of the sample points to collocate onto
+        :param sample_coords: List of flattened coordinate arrays (in HyperPoint order, None where a coordinate is not
+         present) of all of the sample points
+        :param data_points_list: List of HyperPointViews of the (non-masked) data points of each variable, which must
+         all have the same coordinates
+        :param constraint: A constraint providing constrain_points_in_batch, a DummyConstraint or None
+        :param kernel: A data only kernel, or a kernel providing get_value_for_distances_in_groups or
+         get_values_in_batch
+        :param values: Masked array of shape (number of variables * return size, number of sample points) in which to
+         store the output
+        """
+        data_coords = data_points_list[0].get_coord_arrays()
+        # Some constraints work best on blocks of sample points in a particular order.
+        keep_order = hasattr(constraint, "get_sample_order")
+        if keep_order:
+            sample_indices = sample_indices[constraint.get_sample_order(sample_coords, sample_indices)]
+
+        if hasattr(kernel, "get_values_in_batch"):
+            max_separation = _get_kernel_separation_only(constraint, kernel)[1]
+            data_values_list = [data_points.get_value_array() for data_points in data_points_list]
+
+            def process_block(block):
+                block_coords = [(c[block] if c is not None else None) for c in sample_coords]
+                return np.ma.concatenate([kernel.get_values_in_batch(block_coords, data_coords, data_values,
+                                                                     max_separation)
+                                          for data_values in data_values_list])
+
+            self._process_blocks(sample_indices, sample_coords, process_block, values, keep_order)
+            return
+
+        data_value_arrays = [data_points.get_value_array() for data_points in data_points_list]
+        data_masks = [np.ma.getmaskarray(data_values) for data_values in data_value_arrays]
+        data_values_list = [np.asarray(np.ma.getdata(data_values), dtype=np.float64)
+                            for data_values in data_value_arrays]
+        # The points to constrain are those which are not masked in every variable.
+        data_indices = np.flatnonzero(~np.logical_and.reduce(data_masks))
+
+        weighted = hasattr(kernel, "get_value_for_distances_in_groups")
+        if constraint is None or isinstance(constraint, DummyConstraint):
+            if weighted:
+                # Every sample point sees all of the data, but each at different distances.
+                constraint = SepConstraint()
+            else:
+                # Every sample point sees all of the data, so the kernel only needs to be applied once.
+                kernel_values = np.ma.concatenate([
+                    kernel.get_value_for_data_only_in_groups(data_values[~data_mask],
+                                                             np.array([0, np.sum(~data_mask)]))
+                    for data_mask, data_values in zip(data_masks, data_values_list)])
+                for idx in range(kernel_values.shape[0]):
+                    values[idx, sample_indices] = kernel_values[idx, 0]
+                return
+
+        # The data points for every sample point are only found up front when they can be kept for another collocation
+        # to reuse; otherwise each block is constrained as it is processed, so that only one block of sets is held at a
+        # time.
+        neighbour_sets = None
+        if hasattr(constraint, "get_neighbour_set_parameters") and get_neighbour_set_store() is not None:
+            neighbour_sets = self._get_neighbour_sets(sample_indices, sample_coords, data_coords, data_indices,
+                                                      constraint)
+
+        def process_block(block):
+            block_coords = [(c[block] if c is not None else None) for c in sample_coords]
+            if neighbour_sets is not None:
+                offsets, indices = neighbour_sets.get_groups(block)
+            else:
+                offsets, indices = constraint.constrain_points_in_batch(block_coords, data_coords, data_indices)
+            if weighted:
+                distances = _get_grouped_horizontal_distances(block_coords, data_coords, offsets, indices)
+            block_values = []
+            for data_mask, data_values in zip(data_masks, data_values_list):
+                var_offsets, var_indices = offsets, indices
+                if weighted:
+                    var_distances = distances
+                if len(data_masks) > 1:
+                    keep = ~data_mask[indices]
+                    var_offsets, var_indices = _filter_grouped_indices(offsets, indices, keep)
+                    if weighted:
+                        var_distances = distances[keep]
+                if weighted:
+                    block_values.append(kernel.get_value_for_distances_in_groups(data_values[var_indices],
+                                                                                 var_distances, var_offsets))
+                else:
+                    block_values.append(kernel.get_value_for_data_only_in_groups(data_values[var_indices],
+                                                                                 var_offsets))
+            return np.ma.concatenate(block_values)
+
+        self._process_blocks(sample_indices, sample_coords, process_block, values, keep_order)
+
+    def _get_neighbour_sets(self, sample_indices, sample_coords, data_coords, data_indices, constraint):
+        """
+        Finds the data points constrained for every sample point, in blocks (shared out between the workers if there
+        are more than one), and keeps them in the neighbour set store, or gets them from the store if they have already
+        been found by an earlier collocation.
+
+        :param sample_indices: Indices of the sample points to collocate onto
+        :param sample_coords: List of flattened coordinate arrays (in HyperPoint order) of all of the sample points
+        :param data_coords: List of flattened coordinate arrays (in HyperPoint order) of all of the data points
+        :param data_indices: Indices of the data points which may be constrained
+        :param constraint: A constraint providing constrain_points_in_batch and get_neighbour_set_parameters
+        :return: NeighbourSets for all of the sample points, those not in sample_indices having empty sets
+        """
+        sorted_indices = np.sort(sample_indices)
+        store = get_neighbour_set_store()
+        key = store.get_key(constraint.get_neighbour_set_parameters(), sample_coords, sorted_indices, data_coords,
+                            data_indices)
+        neighbour_sets = store.get(key)
+        if neighbour_sets is not None:
+            logging.info("    Reusing the data points found for each sample point")
+            return neighbour_sets
+
+        total_count = len(sorted_indices)
+        parallel = self.workers > 1 and total_count > 1 and _can_fork_workers()
+        block_size = self.sample_block_size
+        if parallel:
+            block_size = int(np.clip(np.ceil(total_count / (4.0 * self.workers)), 1, block_size))
+        blocks = [sorted_indices[start:start + block_size] for start in range(0, total_count, block_size)]
+
+        def constrain_block(block):
+            block_coords = [(c[block] if c is not None else None) for c in sample_coords]
+            return constraint.constrain_points_in_batch(block_coords, data_coords, data_indices)
+
+        results = _apply_to_blocks_in_workers(constrain_block, blocks, self.workers) if parallel else \
+            (constrain_block(block) for block in blocks)
+        num_samples = len(next(c for c in sample_coords if c is not None))
+        neighbour_sets = NeighbourSets.from_blocks(num_samples, blocks, results, store.get_memory_available())
+        store.add(key, neighbour_sets)
+        return neighbour_sets
+
+    def _process_blocks(self, sample_indices, sample_coords, process_block, values, keep_order=False):
+        """
+        Splits the sample points into blocks and stores the result of applying a function to each block in the output
+        array. With more than one worker the blocks are made spatially coherent and shared out between a pool of
+        forked processes, which see the data, constraint and kernel (including any index already built) of this
+        process without them being copied or pickled.
+
+        :param sample_indices: Indices of the sample points to collocate onto
+        :param sample_coords: List of flattened coordinate arrays (in HyperPoint order) of all of the sample points
+        :param process_block: Function taking an array of sample indices and returning the collocated values for them
+        :param values: Masked array of shape (return size, number of sample points) in which to store the output
+        :param keep_order: If True the blocks are taken in the order of sample_indices, even with more than one worker
+        """
+        total_count = len(sample_indices)
+        parallel = self.workers > 1 and total_count > 1 and _can_fork_workers()
+        block_size = self.sample_block_size
+        if parallel:
+            if not keep_order:
+                sample_indices = sample_indices[_get_spatial_order(sample_coords, sample_indices)]
+            # Use enough blocks to keep all of the workers busy.
+            block_size = int(np.clip(np.ceil(total_count / (4.0 * self.workers)), 1, block_size))
+        blocks = [sample_indices[start:start + block_size] for start in range(0, total_count, block_size)]
+
+        processed_count = 0
+        results = _apply_to_blocks_in_workers(process_block, blocks, self.workers) if parallel else \
+            (process_block(block) for block in blocks)
+        for block, block_values in zip(blocks, results):
+            values[:, block] = block_values
+            processed_count += len(block)
+            logging.info("    Processed {} points of {}".format(processed_count, total_count))
+
 
 class GriddedUngriddedCollocator(Collocator):
     """
@@ -138,10 +428,18 @@ class GriddedUngriddedCollocator(Collocator):
     """
 
     def __init__(self, fill_value=np.nan, var_name='', var_long_name='', var_units='',
-                 missing_data_for_missing_sample=False, extrapolate=False):
+                 missing_data_for_missing_sample=False, extrapolate=False, points_per_chunk=None,
+                 single_precision=False):
+        """
+        :param points_per_chunk: The number of sample points to interpolate at once, which bounds the memory used, or
+         None for the interpolator's default
+        :param single_precision: If True interpolate in single precision (float32), halving the memory used
+        """
         super(GriddedUngriddedCollocator, self).__init__(fill_value, var_name, var_long_name, var_units,
                                                          missing_data_for_missing_sample)
         self.extrapolate = extrapolate
+        self.points_per_chunk = int(points_per_chunk) if points_per_chunk is not None else None
+        self.dtype = np.float32 if single_precision is True or single_precision == 'True' else None
         self.interpolator = None
 
     def collocate(self, points, data, constraint, kernel):
@@ -159,10 +457,13 @@ class GriddedUngriddedCollocator(Collocator):
                        a single value
         :return: A single LazyData object
         """
-        from cis.collocation.gridded_interpolation import GriddedUngriddedInterpolator
         log_memory_profile("GriddedUngriddedCollocator Initial")
 
         if isinstance(data, list):
+            if len(data) > 1 and _are_on_same_grid(data):
+                # Variables on the same grid are interpolated together, sharing the indices and weights.
+                logging.info("--> Collocating {} variables on the same grid together".format(len(data)))
+                return self._collocate_variables(points, data, constraint, kernel)
             # Indexing and constraints (for SepConstraintKdTree) will only take place on the first iteration,
             # so we really can just call this method recursively if we've got a list of data.
             output = UngriddedDataList()
@@ -170,16 +471,31 @@ class GriddedUngriddedCollocator(Collocator):
                 output.extend(self.collocate(points, var, constraint, kernel))
             return output
 
-        if not isinstance(data, iris.cube.Cube):
-            raise ValueError("Ungridded data cannot be used with kernel nn_gridded or li")
+        return self._collocate_variables(points, [data], constraint, kernel)
+
+    def _collocate_variables(self, points, data, constraint, kernel):
+        """
+        Collocates a list of variables, all on the same grid, interpolating their values together in a single pass.
+
+        :param UngriddedData or UngriddedCoordinates points: Objects defining the sample points
+        :param list data: The GriddedData variables to resample
+        :param constraint: A DummyConstraint or None
+        :param kernel: The interpolation method
+        :return UngriddedDataList: The collocated data
+        """
+        from cis.collocation.gridded_interpolation import GriddedUngriddedInterpolator
+
+        for var in data:
+            if not isinstance(var, iris.cube.Cube):
+                raise ValueError("Ungridded data cannot be used with kernel nn_gridded or li")
         if constraint is not None and not isinstance(constraint, DummyConstraint):
             raise ValueError("A constraint cannot be specified with kernel nn_gridded or li")
-        data_points = data
 
         # First fix the sample points so that they all fall within the same 360 degree longitude range
         _fix_longitude_range(points.coords(), points)
         # Then fix the data points so that they fall onto the same 360 degree longitude range as the sample points
-        _fix_longitude_range(points.coords(), data_points)
+        for var in data:
+            _fix_longitude_range(points.coords(), var)
 
         log_memory_profile("GriddedUngriddedCollocator after data retrieval")
 
@@ -188,16 +504,23 @@ class GriddedUngriddedCollocator(Collocator):
 
         if self.interpolator is None:
             # Cache the interpolator
-            self.interpolator = GriddedUngriddedInterpolator(data, points, kernel, self.missing_data_for_missing_sample)
+            self.interpolator = GriddedUngriddedInterpolator(data[0], points, kernel,
+                                                             self.missing_data_for_missing_sample,
+                                                             self.points_per_chunk, self.dtype)
 
-        values = self.interpolator(data, fill_value=self.fill_value, extrapolate=self.extrapolate)
+        if len(data) > 1:
+            values_list = self.interpolator(data, fill_value=self.fill_value, extrapolate=self.extrapolate)
+        else:
+            values_list = [self.interpolator(data[0], fill_value=self.fill_value, extrapolate=self.extrapolate)]
 
         log_memory_profile("GriddedUngriddedCollocator after running kernel on sample points")
 
-        metadata = Metadata(self.var_name or data.name(), long_name=self.var_long_name or data.metadata.long_name,
-                            shape=values.shape, missing_value=self.fill_value, units=self.var_units or data.units)
-        set_standard_name_if_valid(metadata, data.standard_name)
-        return_data = UngriddedDataList([UngriddedData(values, metadata, points.coords())])
+        return_data = UngriddedDataList()
+        for var, values in zip(data, values_list):
+            metadata = Metadata(self.var_name or var.name(), long_name=self.var_long_name or var.metadata.long_name,
+                                shape=values.shape, missing_value=self.fill_value, units=self.var_units or var.units)
+            set_standard_name_if_valid(metadata, var.standard_name)
+            return_data.append(UngriddedData(values, metadata, points.coords()))
 
         log_memory_profile("GriddedUngriddedCollocator final")
 
@@ -231,25 +554,40 @@ class DummyConstraint(Constraint):
 
 
 class SepConstraint(PointConstraint):
+    """A separation constraint which finds the data points within the given horizontal, altitude, pressure and time
+    separations of each sample point. The separations are checked with numpy on the flattened coordinate arrays of the
+    data, for either a single sample point or a block of sample points at once.
+    """
+
+    #: The maximum number of sample/data point pairs to compare at once when constraining a block of sample points
+    max_comparisons = 10 ** 7
+
     def __init__(self, h_sep=None, a_sep=None, p_sep=None, t_sep=None):
         from cis.exceptions import InvalidCommandLineOptionError
 
         super(SepConstraint, self).__init__()
 
         self.checks = []
+        self.array_checks = []
+        self._data_points = None
+        self._data_coords = None
+        self._data_indices = None
 
         if h_sep is not None:
             self.h_sep = cis.utils.parse_distance_with_units_to_float_km(h_sep)
             self.checks.append(self.horizontal_constraint)
+            self.array_checks.append(self.horizontal_constraint_for_arrays)
         if a_sep is not None:
             self.a_sep = cis.utils.parse_distance_with_units_to_float_m(a_sep)
             self.checks.append(self.alt_constraint)
+            self.array_checks.append(self.alt_constraint_for_arrays)
         if p_sep is not None:
             try:
                 self.p_sep = float(p_sep)
             except:
                 raise InvalidCommandLineOptionError('Separation Constraint p_sep must be a valid float')
             self.checks.append(self.pressure_constraint)
+            self.array_checks.append(self.pressure_constraint_for_arrays)
         if t_sep is not None:
             from cis.parse_datetime import parse_datetimestr_delta_to_float_days
             try:
@@ -257,6 +595,7 @@ class SepConstraint(PointConstraint):
             except ValueError as e:
                 raise InvalidCommandLineOptionError(e)
             self.checks.append(self.time_constraint)
+            self.array_checks.append(self.time_constraint_for_arrays)
 
     def time_constraint(self, point, ref_point):
         return point.time_sep(ref_point) < self.t_sep
@@ -270,89 +609,387 @@ class SepConstraint(PointConstraint):
     def horizontal_constraint(self, point, ref_point):
         return point.haversine_dist(ref_point) < self.h_sep
 
+    def time_constraint_for_arrays(self, coords, ref_coords):
+        return np.abs(coords[HyperPoint.TIME] - ref_coords[HyperPoint.TIME]) < self.t_sep
+
+    def alt_constraint_for_arrays(self, coords, ref_coords):
+        return np.abs(coords[HyperPoint.ALTITUDE] - ref_coords[HyperPoint.ALTITUDE]) < self.a_sep
+
+    def pressure_constraint_for_arrays(self, coords, ref_coords):
+        pressures = coords[HyperPoint.AIR_PRESSURE]
+        ref_pressures = ref_coords[HyperPoint.AIR_PRESSURE]
+        return np.maximum(pressures / ref_pressures, ref_pressures / pressures) < self.p_sep
+
+    def horizontal_constraint_for_arrays(self, coords, ref_coords):
+        return cis.utils.haversine_for_arrays(coords[HyperPoint.LATITUDE], coords[HyperPoint.LONGITUDE],
+                                              ref_coords[HyperPoint.LATITUDE],
+                                              ref_coords[HyperPoint.LONGITUDE]) < self.h_sep
+
+    def _apply_array_checks(self, coords, ref_coords):
+        """
+        Applies the separation checks to arrays of coordinates.
+
+        :param coords: List of coordinate arrays (in HyperPoint order) of the points to check
+        :param ref_coords: List of coordinate arrays (in HyperPoint order) of the reference points, which must
+         broadcast against coords
+        :return: boolean array which is True where all of the checks pass
+        """
+        passed = True
+        for check in self.array_checks:
+            # Masked coordinate values never satisfy a check
+            passed = np.logical_and(passed, np.ma.filled(check(coords, ref_coords), False))
+        return passed
+
+    def _get_data_coords_and_indices(self, data):
+        """
+        Gets the flattened coordinates of the data points and the indices of the non-masked points, which are kept
+        for as long as the same data is being constrained.
+
+        :param data: HyperPointView of the data points
+        :return: tuple of (list of flattened coordinate arrays in HyperPoint order, indices of non-masked points)
+        """
+        if self._data_points is not data:
+            self._data_coords = data.get_coord_arrays()
+            if getattr(data, 'non_masked_iteration', False):
+                self._data_indices = data.get_non_masked_indices()
+            else:
+                self._data_indices = np.arange(len(data))
+            self._data_points = data
+        return self._data_coords, self._data_indices
+
+    def _constrain_point_indices(self, ref_point, data_coords, data_indices):
+        """
+        Finds the data points (out of those given by data_indices) which satisfy the constraint for a single sample
+        point.
+
+        :return: array of the indices of the data points within the constraint
+        """
+        ref_coords = [(np.float64(v) if v is not None else None) for v in ref_point[0:HyperPoint.number_standard_names]]
+        passed = self._apply_array_checks([(c[data_indices] if c is not None else None) for c in data_coords],
+                                          ref_coords)
+        if passed is True:
+            return data_indices
+        return data_indices[passed]
+
     def constrain_points(self, ref_point, data):
-        con_points = HyperPointList()
-        for point in data:
-            if all(check(point, ref_point) for check in self.checks):
-                con_points.append(point)
-        return con_points
+        if not hasattr(data, 'coords'):
+            # Not a HyperPointView (e.g. a HyperPointList), so check each point in turn.
+            con_points = HyperPointList()
+            for point in data:
+                if all(check(point, ref_point) for check in self.checks):
+                    con_points.append(point)
+            return con_points
 
+        data_coords, data_indices = self._get_data_coords_and_indices(data)
+        return data.get_points(self._constrain_point_indices(ref_point, data_coords, data_indices))
 
-class SepConstraintKdtree(PointConstraint):
+    def constrain_points_in_batch(self, sample_coords, data_coords, data_indices):
+        """
+        Finds the data points within the separation constraints of each of a block of sample points, by comparing
+        every sample point in the block against every non-masked data point.
+
+        :param sample_coords: List of flattened coordinate arrays (in HyperPoint order, None where a coordinate is
+         not present) for the block of sample points
+        :param data_coords: List of flattened coordinate arrays (in HyperPoint order, None where a coordinate is
+         not present) for all of the data points, including masked ones
+        :param data_indices: Indices of the non-masked data points
+        :return: tuple of (offsets, indices) - the data points constrained for sample point i are
+         indices[offsets[i]:offsets[i + 1]]
+        """
+        num_samples = len(next(c for c in sample_coords if c is not None))
+        candidate_coords = [(c[data_indices] if c is not None else None) for c in data_coords]
+        # Limit the size of the (samples, data points) comparison arrays by working through the block in pieces.
+        step = int(np.maximum(1, self.max_comparisons // np.maximum(1, len(data_indices))))
+        counts, indices = [np.zeros(0, dtype=int)], [np.zeros(0, dtype=int)]
+        for start in range(0, num_samples, step):
+            piece_coords = [(c[start:start + step, np.newaxis] if c is not None else None) for c in sample_coords]
+            num_piece_samples = len(next(c for c in piece_coords if c is not None))
+            passed = np.broadcast_to(self._apply_array_checks(candidate_coords, piece_coords),
+                                     (num_piece_samples, len(data_indices)))
+            sample_numbers, data_numbers = np.nonzero(passed)
+            counts.append(np.bincount(sample_numbers, minlength=num_piece_samples))
+            indices.append(data_indices[data_numbers])
+        offsets = np.concatenate(([0], np.cumsum(np.concatenate(counts)))).astype(int)
+        return offsets, np.concatenate(indices).astype(int)
+
+
+class SepConstraintKdtree(SepConstraint):
     """A separation constraint that uses a k-D tree to optimise spatial constraining.
     If no horizontal separation parameter is supplied, this reduces to an exhaustive
     search using the other parameter(s).
+
+    When other separations are given as well, sample points are constrained in batch using a k-D tree over all of
+    the separated coordinates, scaled by their separations.
     """
 
     def __init__(self, h_sep=None, a_sep=None, p_sep=None, t_sep=None):
-        from cis.exceptions import InvalidCommandLineOptionError
-
         self.haversine_distance_kd_tree_index = False
 
-        super(SepConstraintKdtree, self).__init__()
+        super(SepConstraintKdtree, self).__init__(h_sep, a_sep, p_sep, t_sep)
 
-        self._index_cache = {}
-        self.checks = []
-        if h_sep is not None:
-            self.h_sep = cis.utils.parse_distance_with_units_to_float_km(h_sep)
+        self._separation_index = None
+        self._separation_index_data = None
+        if h_sep is not None and len(self.array_checks) == 1:
+            # The horizontal separation is applied by the haversine k-D tree rather than by checking each point. When
+            # there are other separations the tree over all of them is used instead, with every separation checked
+            # exactly, so the haversine index is not created.
+            self.checks.remove(self.horizontal_constraint)
+            self.array_checks.remove(self.horizontal_constraint_for_arrays)
             self.haversine_distance_kd_tree_index = None
 
-        if a_sep is not None:
-            self.a_sep = cis.utils.parse_distance_with_units_to_float_m(a_sep)
-            self.checks.append(self.alt_constraint)
-        if p_sep is not None:
-            try:
-                self.p_sep = float(p_sep)
-            except:
-                raise InvalidCommandLineOptionError('Separation Constraint p_sep must be a valid float')
-            self.checks.append(self.pressure_constraint)
-        if t_sep is not None:
-            from cis.parse_datetime import parse_datetimestr_delta_to_float_days
-            try:
-                self.t_sep = parse_datetimestr_delta_to_float_days(t_sep)
-            except ValueError as e:
-                raise InvalidCommandLineOptionError(e)
-            self.checks.append(self.time_constraint)
+    def horizontal_constraint(self, point, ref_point):
+        # Points at exactly the horizontal separation are kept, as they are by the haversine k-D tree, so that the
+        # separation means the same whether or not other separations are given.
+        return point.haversine_dist(ref_point) <= self.h_sep
 
-    def time_constraint(self, point, ref_point):
-        return point.time_sep(ref_point) < self.t_sep
+    def horizontal_constraint_for_arrays(self, coords, ref_coords):
+        return cis.utils.haversine_for_arrays(coords[HyperPoint.LATITUDE], coords[HyperPoint.LONGITUDE],
+                                              ref_coords[HyperPoint.LATITUDE],
+                                              ref_coords[HyperPoint.LONGITUDE]) <= self.h_sep
 
-    def alt_constraint(self, point, ref_point):
-        return point.alt_sep(ref_point) < self.a_sep
+    def _get_separation_index(self, data_coords, data_indices):
+        """
+        Gets the k-D tree index over all of the separated coordinates, which is created the first time it is needed
+        and kept for as long as the same data is being constrained.
+        """
+        from cis.collocation.separationkdtreeindex import SeparationKDTreeIndex
+        if self._separation_index is None or self._separation_index_data is not data_coords:
+            self._separation_index = SeparationKDTreeIndex(getattr(self, 'h_sep', None), getattr(self, 'a_sep', None),
+                                                           getattr(self, 'p_sep', None), getattr(self, 't_sep', None))
+            self._separation_index.index_data(data_coords, data_indices)
+            self._separation_index_data = data_coords
+        return self._separation_index
+
+    def constrain_points_in_batch(self, sample_coords, data_coords, data_indices):
+        """
+        Finds the data points within the separation constraints of each of a block of sample points, using a
+        k-D tree for the separations when there are any.
+
+        :param sample_coords: List of flattened coordinate arrays (in HyperPoint order, None where a coordinate is
+         not present) for the block of sample points
+        :param data_coords: List of flattened coordinate arrays (in HyperPoint order, None where a coordinate is
+         not present) for all of the data points, including masked ones
+        :param data_indices: Indices of the non-masked data points
+        :return: tuple of (offsets, indices) - the data points constrained for sample point i are
+         indices[offsets[i]:offsets[i + 1]]
+        """
+        if self.array_checks:
+            # Find candidates using all of the separations then check them exactly.
+            offsets, indices = self._get_separation_index(data_coords, data_indices).find_candidate_points_in_batch(
+                sample_coords)
+            sample_numbers = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+            candidate_coords = [(c[indices] if c is not None else None) for c in data_coords]
+            ref_coords = [(c[sample_numbers] if c is not None else None) for c in sample_coords]
+            passed = self._apply_array_checks(candidate_coords, ref_coords)
+            return _filter_grouped_indices(offsets, indices, passed)
+        elif self.haversine_distance_kd_tree_index:
+            return self.haversine_distance_kd_tree_index.find_points_within_distance_in_batch(
+                sample_coords[HyperPoint.LATITUDE], sample_coords[HyperPoint.LONGITUDE], self.h_sep)
+        else:
+            return super(SepConstraintKdtree, self).constrain_points_in_batch(sample_coords, data_coords,
+                                                                              data_indices)
 
-    def pressure_constraint(self, point, ref_point):
-        return point.pres_sep(ref_point) < self.p_sep
+    def constrain_points(self, ref_point, data):
+        if self.array_checks and hasattr(data, 'coords'):
+            data_coords, data_indices = self._get_data_coords_and_indices(data)
+            sample_coords = [(np.array([v], dtype=np.float64) if v is not None else None)
+                             for v in ref_point[0:HyperPoint.number_standard_names]]
+            offsets, indices = self.constrain_points_in_batch(sample_coords, data_coords, data_indices)
+            return data.get_points(indices)
+
+        if not self.haversine_distance_kd_tree_index:
+            return super(SepConstraintKdtree, self).constrain_points(ref_point, data)
+
+        point_indices = self.haversine_distance_kd_tree_index.find_points_within_distance(ref_point, self.h_sep)
+        if not self.checks:
+            return HyperPointList(data[idx] for idx in point_indices)
+        return HyperPointList(data[idx] for idx in point_indices
+                              if all(check(data[idx], ref_point) for check in self.checks))
+
+    def get_neighbour_set_parameters(self):
+        """
+        Gets the parameters which determine the data points found for each sample point. Constraints providing this
+        have the data points for all of the sample points found once, as NeighbourSets, before any kernel is applied, so
+        that they can be reused for every variable and kernel collocated from the same data.
 
-    def horizontal_constraint(self, point, ref_point):
-        return point.haversine_dist(ref_point) < self.h_sep
+        :return: tuple of the class name and separations of the constraint
+        """
+        separations = tuple(getattr(self, name, None) for name in ('h_sep', 'a_sep', 'p_sep', 't_sep'))
+        return (type(self).__name__,) + separations
 
-    def constrain_points(self, ref_point, data):
-        con_points = HyperPointList()
-        if self.haversine_distance_kd_tree_index:
-            point_indices = self._get_cached_indices(ref_point)
-            if point_indices is None:
-                point_indices = self.haversine_distance_kd_tree_index.find_points_within_distance(ref_point, self.h_sep)
-                self._add_cached_indices(ref_point, point_indices)
-            for idx in point_indices:
-                point = data[idx]
-                if all(check(point, ref_point) for check in self.checks):
-                    con_points.append(point)
-        else:
-            for point in data:
-                if all(check(point, ref_point) for check in self.checks):
-                    con_points.append(point)
-        return con_points
 
-    def _get_cached_indices(self, ref_point):
-        key = ref_point[0:5]  # Don't use the value as a key (it's both irrelevant and un-hashable)
+class SepConstraintTimeWindow(SepConstraint):
+    """A separation constraint for time-ordered data, such as satellite swaths or aircraft tracks, which must include a
+    time separation. The sample points are constrained in blocks in order of time, and for each block a k-D tree is
+    built over only the data points within the time separation of the block, found by a binary search of the data
+    sorted by time. The index therefore only ever holds the data in a window of time moving through the data, rather
+    than the whole of it.
+    """
+
+    #: The longest time, as a multiple of the time separation, covered by the sample points constrained using the same
+    #: index
+    window_length = 10
+
+    def __init__(self, h_sep=None, a_sep=None, p_sep=None, t_sep=None):
+        from cis.exceptions import InvalidCommandLineOptionError
+
+        if t_sep is None:
+            raise InvalidCommandLineOptionError('A time separation t_sep must be given to collocate in time windows')
+        super(SepConstraintTimeWindow, self).__init__(h_sep, a_sep, p_sep, t_sep)
+        self._sorted_times = None
+
+    @staticmethod
+    def _get_times(coords):
+        """
+        :return: the flattened times in a list of coordinate arrays as floats, with NaN for missing values
+        """
+        if coords[HyperPoint.TIME] is None:
+            raise TypeError("The time coordinate is needed to collocate in time windows")
+        return np.ma.filled(np.ma.asarray(coords[HyperPoint.TIME], dtype=np.float64), np.nan).ravel()
+
+    def _get_sorted_times(self, data_coords, data_indices):
+        """
+        Sorts the times of the non-masked data points, keeping the result for as long as the same data is used.
+
+        :return: tuple of (sorted times, indices in the data of the sorted times)
+        """
+        if self._sorted_times is None or self._sorted_times[0] is not data_coords:
+            times = self._get_times(data_coords)[data_indices]
+            valid = ~np.isnan(times)
+            order = np.argsort(times[valid], kind='mergesort')
+            self._sorted_times = (data_coords, times[valid][order], np.asarray(data_indices)[valid][order])
+        return self._sorted_times[1], self._sorted_times[2]
+
+    def get_sample_order(self, sample_coords, sample_indices):
+        """
+        Gets the order in which to constrain the sample points, so that each block covers as short a time as possible.
+
+        :param sample_coords: List of flattened coordinate arrays (in HyperPoint order) of all of the sample points
+        :param sample_indices: Indices of the sample points to collocate onto
+        :return: array of positions in sample_indices in order of time
+        """
+        return np.argsort(self._get_times(sample_coords)[sample_indices], kind='mergesort')
+
+    def _constrain_window(self, sample_coords, data_coords, window_indices):
+        """
+        Finds the data points, out of those in a time window, within the separation constraints of each of a set of
+        sample points.
+
+        :return: tuple of (offsets, indices) as for constrain_points_in_batch
+        """
+        from cis.collocation.separationkdtreeindex import SeparationKDTreeIndex
+
+        num_samples = len(self._get_times(sample_coords))
+        if len(window_indices) == 0:
+            return np.zeros(num_samples + 1, dtype=int), window_indices
+        window_index = SeparationKDTreeIndex(getattr(self, 'h_sep', None), getattr(self, 'a_sep', None),
+                                             getattr(self, 'p_sep', None), self.t_sep)
+        window_index.index_data(data_coords, window_indices)
+        offsets, indices = window_index.find_candidate_points_in_batch(sample_coords)
+        # Check the candidates against the separations exactly.
+        sample_numbers = np.repeat(np.arange(num_samples), np.diff(offsets))
+        passed = self._apply_array_checks([(c[indices] if c is not None else None) for c in data_coords],
+                                          [(c[sample_numbers] if c is not None else None) for c in sample_coords])
+        return _filter_grouped_indices(offsets, indices, np.broadcast_to(passed, indices.shape))
+
+    def constrain_points_in_batch(self, sample_coords, data_coords, data_indices):
+        """
+        Finds the data points within the separation constraints of each of a block of sample points. The sample
+        points are taken in order of time, in pieces covering at most window_length times the time separation, and for
+        each piece a k-D tree is built over the data points within the time separation of it.
+
+        :param sample_coords: List of flattened coordinate arrays (in HyperPoint order, None where a coordinate is
+         not present) for the block of sample points
+        :param data_coords: List of flattened coordinate arrays (in HyperPoint order, None where a coordinate is
+         not present) for all of the data points, including masked ones
+        :param data_indices: Indices of the non-masked data points
+        :return: tuple of (offsets, indices) - the data points constrained for sample point i are
+         indices[offsets[i]:offsets[i + 1]]
+        """
+        sorted_times, sorted_indices = self._get_sorted_times(data_coords, data_indices)
+        sample_times = self._get_times(sample_coords)
+        num_samples = len(sample_times)
+        # Sample points without a time are put last, and never constrained.
+        order = np.argsort(sample_times, kind='mergesort')
+        ordered_times = sample_times[order[:np.count_nonzero(~np.isnan(sample_times))]]
+
+        counts = np.zeros(num_samples, dtype=int)
+        starts = np.zeros(num_samples, dtype=int)
+        indices = [np.zeros(0, dtype=int)]
+        total_count = 0
+        piece_start = 0
+        while piece_start < len(ordered_times):
+            piece_stop = np.searchsorted(ordered_times, ordered_times[piece_start] + self.window_length * self.t_sep,
+                                         side='right')
+            piece = order[piece_start:piece_stop]
+            window_start = np.searchsorted(sorted_times, ordered_times[piece_start] - self.t_sep, side='left')
+            window_stop = np.searchsorted(sorted_times, ordered_times[piece_stop - 1] + self.t_sep, side='right')
+            # Keep the data points in their original order, as for the other constraints.
+            window_indices = np.sort(sorted_indices[window_start:window_stop])
+            piece_offsets, piece_indices = self._constrain_window(
+                [(c[piece] if c is not None else None) for c in sample_coords], data_coords, window_indices)
+            counts[piece] = np.diff(piece_offsets)
+            starts[piece] = piece_offsets[:-1] + total_count
+            indices.append(piece_indices)
+            total_count += len(piece_indices)
+            piece_start = piece_stop
+
+        # Put the groups back into the order of the sample points.
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(int)
+        positions = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - starts, counts)
+        return offsets, np.concatenate(indices).astype(int)[positions]
+
+
+class NNKConstraint(PointConstraint):
+    """A constraint which finds the k data points nearest to each sample point along the Earth's surface, optionally
+    only out to a maximum horizontal separation. For a block of sample points the nearest points are found with a
+    single query of a k-D tree, so that the number of points reduced by the kernel, and the time and memory taken, are
+    the same however dense the data.
+    """
+
+    #: The points chosen depend on which data points are masked, so variables with different masks cannot be
+    #: constrained together
+    constrain_variables_separately = True
+
+    def __init__(self, k=1, h_sep=None):
+        """
+        :param k: the number of nearest points to find
+        :param h_sep: optional horizontal separation beyond which points are not used
+        """
+        from cis.exceptions import InvalidCommandLineOptionError
+
+        super(NNKConstraint, self).__init__()
         try:
-            return self._index_cache[key]
-        except KeyError:
-            return None
+            self.k = int(k)
+        except ValueError:
+            raise InvalidCommandLineOptionError('The number of nearest points k must be a valid integer')
+        if self.k < 1:
+            raise InvalidCommandLineOptionError('The number of nearest points k must be at least one')
+        self.h_sep = cis.utils.parse_distance_with_units_to_float_km(h_sep) if h_sep is not None else None
+        self.haversine_distance_kd_tree_index = None
+
+    def constrain_points(self, ref_point, data):
+        offsets, indices = self.constrain_points_in_batch(
+            [(np.array([v], dtype=np.float64) if v is not None else None)
+             for v in ref_point[0:HyperPoint.number_standard_names]], None, None)
+        return HyperPointList(data[idx] for idx in indices)
 
-    def _add_cached_indices(self, ref_point, indices):
-        key = ref_point[0:5]  # Don't use the value as a key (it's both irrelevant and un-hashable)
-        self._index_cache[key] = indices
+    def constrain_points_in_batch(self, sample_coords, data_coords, data_indices):
+        """
+        Finds the k nearest data points to each of a block of sample points.
+
+        :param sample_coords: List of flattened coordinate arrays (in HyperPoint order, None where a coordinate is
+         not present) for the block of sample points
+        :param data_coords: (not used) List of flattened coordinate arrays for all of the data points
+        :param data_indices: (not used) Indices of the non-masked data points, which are those in the index
+        :return: tuple of (offsets, indices) - the data points constrained for sample point i are
+         indices[offsets[i]:offsets[i + 1]], in order of increasing distance
+        """
+        nearest_indices, _ = self.haversine_distance_kd_tree_index.find_k_nearest_points(
+            sample_coords[HyperPoint.LATITUDE], sample_coords[HyperPoint.LONGITUDE], self.k, self.h_sep)
+        found = nearest_indices >= 0
+        offsets = np.concatenate(([0], np.cumsum(np.sum(found, axis=1)))).astype(int)
+        return offsets, nearest_indices[found]
 
 
 # noinspection PyPep8Naming
@@ -367,6 +1004,12 @@ class mean(AbstractDataOnlyKernel):
         """
         return np_mean(values)
 
+    def get_value_for_data_only_in_groups(self, values, offsets):
+        """
+        Return the mean of each group of values
+        """
+        return _grouped_mean(values, offsets)[np.newaxis, :]
+
 
 # noinspection PyPep8Naming
 class stddev(AbstractDataOnlyKernel):
@@ -380,6 +1023,12 @@ class stddev(AbstractDataOnlyKernel):
         """
         return np_std(values, ddof=1)
 
+    def get_value_for_data_only_in_groups(self, values, offsets):
+        """
+        Return the standard deviation of each group of values
+        """
+        return _grouped_stddev(values, offsets)[np.newaxis, :]
+
 
 # noinspection PyPep8Naming,PyShadowingBuiltins
 class min(AbstractDataOnlyKernel):
@@ -393,6 +1042,12 @@ class min(AbstractDataOnlyKernel):
         """
         return np_min(values)
 
+    def get_value_for_data_only_in_groups(self, values, offsets):
+        """
+        Return the minimum value of each group
+        """
+        return _reduce_groups(np.minimum, values, offsets)[np.newaxis, :]
+
 
 # noinspection PyPep8Naming,PyShadowingBuiltins
 class max(AbstractDataOnlyKernel):
@@ -406,6 +1061,12 @@ class max(AbstractDataOnlyKernel):
         """
         return np_max(values)
 
+    def get_value_for_data_only_in_groups(self, values, offsets):
+        """
+        Return the maximum value of each group
+        """
+        return _reduce_groups(np.maximum, values, offsets)[np.newaxis, :]
+
 
 class sum(AbstractDataOnlyKernel):
     """
@@ -418,6 +1079,12 @@ class sum(AbstractDataOnlyKernel):
         """
         return np_sum(values)
 
+    def get_value_for_data_only_in_groups(self, values, offsets):
+        """
+        Return the sum of each group of values
+        """
+        return _reduce_groups(np.add, values, offsets)[np.newaxis, :]
+
 
 # noinspection PyPep8Naming
 class moments(AbstractDataOnlyKernel):
@@ -455,6 +1122,106 @@ class moments(AbstractDataOnlyKernel):
 
         return np_mean(values), np_std(values, ddof=1), np.size(values)
 
+    def get_value_for_data_only_in_groups(self, values, offsets):
+        """
+        Returns the mean, standard deviation and number of values of each group
+        """
+        counts = np.diff(offsets)
+        means = _grouped_mean(values, offsets)
+        stddevs = _grouped_stddev(values, offsets, means)
+        num_points = np.ma.masked_equal(counts, 0)
+        # As for the per-point collocation, NaNs (e.g. the standard deviation of a single value) are masked.
+        return np.ma.vstack((np.ma.masked_invalid(means), np.ma.masked_invalid(stddevs), num_points))
+
+
+class AbstractDistanceWeightedKernel(Kernel):
+    """
+    Base class for kernels which return the mean of the data values weighted by a function of the horizontal distance
+    of each data point from the sample point. For a block of sample points the distances to all of the constrained data
+    points are calculated at once and the weighted means found with numpy, without creating any HyperPoints.
+    """
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def _get_weights(self, distances):
+        """
+        Weights of data points at the given distances.
+
+        :param distances: array of horizontal distances in kilometres
+        :return: array of weights
+        """
+
+    def get_value(self, point, data):
+        """
+        Returns the weighted mean of the values of the data points.
+        """
+        distances = np.array([point.haversine_dist(data_point) for data_point in data], dtype=np.float64)
+        if len(distances) == 0:
+            raise ValueError
+        values = np.array([data_point.val[0] for data_point in data], dtype=np.float64)
+        result = self.get_value_for_distances_in_groups(values, distances, np.array([0, len(values)]))[0, 0]
+        if result is np.ma.masked:
+            raise ValueError
+        return result
+
+    def get_value_for_distances_in_groups(self, values, distances, offsets):
+        """
+        Returns the weighted mean of each group of values, where group i is values[offsets[i]:offsets[i + 1]].
+
+        :param values: 1-D array of data values
+        :param distances: array of the horizontal distance in kilometres of each data point from its sample point
+        :param offsets: integer array of the start of each group, the last element being the total length
+        :return: masked array of shape (1, number of groups), masked for groups with no weight
+        """
+        weights = self._get_weights(distances)
+        weighted_sums = _reduce_groups(np.add, weights * values, offsets)
+        total_weights = _reduce_groups(np.add, weights, offsets)
+        return np.ma.masked_invalid(weighted_sums / np.ma.masked_equal(total_weights, 0))[np.newaxis, :]
+
+
+# noinspection PyPep8Naming
+class idw(AbstractDistanceWeightedKernel):
+    """
+    Calculate the mean of the data values weighted by the inverse of a power of their horizontal distance from the
+    sample point
+    """
+
+    #: Distance in kilometres below which points are treated as being at the sample point, to avoid dividing by zero
+    min_distance = 1e-6
+
+    def __init__(self, power=2):
+        """
+        :param power: the power of the distance by which to divide the weights
+        """
+        from cis.exceptions import InvalidCommandLineOptionError
+        try:
+            self.power = float(power)
+        except ValueError:
+            raise InvalidCommandLineOptionError('The idw kernel power must be a valid float')
+
+    def _get_weights(self, distances):
+        return np.maximum(distances, self.min_distance) ** -self.power
+
+
+# noinspection PyPep8Naming
+class gaussian(AbstractDistanceWeightedKernel):
+    """
+    Calculate the mean of the data values weighted by a Gaussian function of their horizontal distance from the
+    sample point
+    """
+
+    def __init__(self, sigma=None):
+        """
+        :param sigma: the standard deviation of the Gaussian, as a distance with units (e.g. 50km)
+        """
+        from cis.exceptions import InvalidCommandLineOptionError
+        if sigma is None:
+            raise InvalidCommandLineOptionError('The gaussian kernel needs the width of the Gaussian, sigma')
+        self.sigma = cis.utils.parse_distance_with_units_to_float_km(sigma)
+
+    def _get_weights(self, distances):
+        return np.exp(-0.5 * (distances / self.sigma) ** 2)
+
 
 class nn_horizontal(Kernel):
     def get_value(self, point, data):
@@ -475,6 +1242,10 @@ class nn_horizontal(Kernel):
 
 
 class nn_horizontal_kdtree(Kernel):
+    # The separation constraint which limits the distance to the nearest point
+    separation_check = 'horizontal_constraint_for_arrays'
+    separation_name = 'h_sep'
+
     def __init__(self):
         self.haversine_distance_kd_tree_index = None
 
@@ -490,8 +1261,110 @@ class nn_horizontal_kdtree(Kernel):
         nearest_point = data[nearest_index]
         return nearest_point.val[0]
 
+    def get_values_in_batch(self, sample_coords, data_coords, data_values, max_distance=None):
+        """
+        Collocation using nearest neighbours along the face of the earth for a block of sample points at once.
+
+        :param sample_coords: List of flattened coordinate arrays (in HyperPoint order) for the block of sample points
+        :param data_coords: (not used) List of flattened coordinate arrays for all of the data points
+        :param data_values: Flattened array of all of the data values
+        :param max_distance: Optional distance in kilometres beyond which data points are not used
+        :return: masked array of shape (1, number of sample points)
+        """
+        indices, _ = self.haversine_distance_kd_tree_index.find_nearest_points(
+            sample_coords[HyperPoint.LATITUDE], sample_coords[HyperPoint.LONGITUDE], max_distance)
+        found = indices >= 0
+        result = np.ma.masked_all((1, len(indices)))
+        result[0, found] = data_values[indices[found]]
+        return result
+
+
+class AbstractNNCoordinateKernel(Kernel):
+    """
+    Base class for kernels which find the nearest neighbour in a single coordinate. For a block of sample points, the
+    data coordinate values are sorted once and the nearest point to each sample point is found by a binary search.
+    """
+    #: Index in HyperPoint of the coordinate to use
+    coord_index = None
+    # The separation constraint which limits the separation from the nearest point
+    separation_check = None
+    separation_name = None
+
+    def __init__(self):
+        self._sorted_coord = None
+
+    def _separation(self, values, ref_values):
+        """
+        Separation in the coordinate between arrays of values and reference values.
+        """
+        return np.abs(values - ref_values)
+
+    def _get_sorted_coord(self, data_coord, data_values):
+        """
+        Sorts the values of the coordinate for the non-masked data points, keeping the result for as long as the same
+        data is used. The sort is stable so that equal values remain in the order of the data.
+
+        :return: tuple of (sorted coordinate values, indices in the data of the sorted values)
+        """
+        if self._sorted_coord is None or self._sorted_coord[0] is not data_coord:
+            data_coord = np.ma.asarray(data_coord)
+            valid = ~(np.ma.getmaskarray(data_values) | np.ma.getmaskarray(data_coord))
+            valid &= ~np.isnan(np.ma.getdata(data_coord))
+            valid_indices = np.flatnonzero(valid)
+            coord_values = np.asarray(np.ma.getdata(data_coord), dtype=np.float64)[valid_indices]
+            order = np.argsort(coord_values, kind='mergesort')
+            self._sorted_coord = (data_coord, coord_values[order], valid_indices[order])
+        return self._sorted_coord[1], self._sorted_coord[2]
+
+    def get_values_in_batch(self, sample_coords, data_coords, data_values, max_separation=None):
+        """
+        Collocation using nearest neighbours in the coordinate for a block of sample points at once. As for get_value,
+        where data points are equally near the one appearing first in the data is used.
+
+        :param sample_coords: List of flattened coordinate arrays (in HyperPoint order) for the block of sample points
+        :param data_coords: List of flattened coordinate arrays (in HyperPoint order) for all of the data points
+        :param data_values: Flattened array of all of the data values
+        :param max_separation: Optional separation at or beyond which data points are not used
+        :return: masked array of shape (1, number of sample points)
+        """
+        if sample_coords[self.coord_index] is None or data_coords[self.coord_index] is None:
+            raise TypeError("The {} coordinate is needed for nearest neighbour collocation".format(
+                HyperPoint.standard_names[self.coord_index]))
+        sorted_values, sorted_indices = self._get_sorted_coord(data_coords[self.coord_index], data_values)
+        sample_values = np.asarray(np.ma.filled(np.ma.asarray(sample_coords[self.coord_index], dtype=np.float64),
+                                                np.nan))
+        result = np.ma.masked_all((1, len(sample_values)))
+        if len(sorted_values) == 0:
+            return result
+
+        # The nearest point is either the first point at or above the sample value, or the first of the points with the
+        # largest value below it.
+        above = np.searchsorted(sorted_values, sample_values, side='left')
+        below = np.searchsorted(sorted_values, sorted_values[np.maximum(above - 1, 0)], side='left')
+        has_above = above < len(sorted_values)
+        has_below = above > 0
+        above = np.minimum(above, len(sorted_values) - 1)
+
+        above_sep = np.where(has_above, self._separation(sorted_values[above], sample_values), np.inf)
+        below_sep = np.where(has_below, self._separation(sorted_values[below], sample_values), np.inf)
+        above_indices = sorted_indices[above]
+        below_indices = sorted_indices[below]
+        use_below = (below_sep < above_sep) | ((below_sep == above_sep) & (below_indices < above_indices))
+        nearest_indices = np.where(use_below, below_indices, above_indices)
+        nearest_sep = np.where(use_below, below_sep, above_sep)
+
+        found = ~np.isnan(sample_values)
+        if max_separation is not None:
+            found &= nearest_sep < max_separation
+        result[0, found] = data_values[nearest_indices[found]]
+        return result
+
+
+class nn_altitude(AbstractNNCoordinateKernel):
+    coord_index = HyperPoint.ALTITUDE
+    separation_check = 'alt_constraint_for_arrays'
+    separation_name = 'a_sep'
 
-class nn_altitude(Kernel):
     def get_value(self, point, data):
         """
             Collocation using nearest neighbours in altitude, where both points and
@@ -509,7 +1382,17 @@ class nn_altitude(Kernel):
         return nearest_point.val[0]
 
 
-class nn_pressure(Kernel):
+class nn_pressure(AbstractNNCoordinateKernel):
+    coord_index = HyperPoint.AIR_PRESSURE
+    separation_check = 'pressure_constraint_for_arrays'
+    separation_name = 'p_sep'
+
+    def _separation(self, values, ref_values):
+        """
+        Pressure ratio between arrays of values and reference values, which is always >= 1.
+        """
+        return np.maximum(values / ref_values, ref_values / values)
+
     def get_value(self, point, data):
         """
             Collocation using nearest neighbours in pressure, where both points and
@@ -527,7 +1410,11 @@ class nn_pressure(Kernel):
         return nearest_point.val[0]
 
 
-class nn_time(Kernel):
+class nn_time(AbstractNNCoordinateKernel):
+    coord_index = HyperPoint.TIME
+    separation_check = 'time_constraint_for_arrays'
+    separation_name = 't_sep'
+
     def get_value(self, point, data):
         """
             Collocation using nearest neighbours in time, where both points and
@@ -573,19 +1460,28 @@ class nn_t(nn_time):
 class GriddedCollocator(Collocator):
 
     def __init__(self, fill_value=np.nan, var_name='', var_long_name='', var_units='',
-                 missing_data_for_missing_sample=False, extrapolate=False):
+                 missing_data_for_missing_sample=False, extrapolate=False, mdtol=0):
+        """
+        :param bool extrapolate: Extrapolate points outside of the data grid? Default False, in which case they are
+         masked.
+        :param float mdtol: For conservative collocation, the largest fraction of the area of a sample cell which may
+         be missing from the data (either masked or outside of the data grid) for it to be given a value. Default 0, so
+         that any missing data in a cell masks it.
+        """
         super(GriddedCollocator, self).__init__(fill_value, var_name, var_long_name, var_units,
-                                                         missing_data_for_missing_sample)
+                                                missing_data_for_missing_sample)
         self.extrapolate = 'extrapolate' if extrapolate else 'mask'
+        self.mdtol = float(mdtol)
 
     @staticmethod
     def _check_for_valid_kernel(kernel):
         from cis.exceptions import ClassNotFoundError
 
-        if not (isinstance(kernel, gridded_gridded_nn) or isinstance(kernel, gridded_gridded_li)):
+        if not isinstance(kernel, (gridded_gridded_nn, gridded_gridded_li, gridded_gridded_con)):
             raise ClassNotFoundError("Expected kernel of one of classes {}; found one of class {}".format(
                 str([cis.utils.get_class_name(gridded_gridded_nn),
-                     cis.utils.get_class_name(gridded_gridded_li)]),
+                     cis.utils.get_class_name(gridded_gridded_li),
+                     cis.utils.get_class_name(gridded_gridded_con)]),
                 cis.utils.get_class_name(type(kernel))))
 
     def collocate(self, points, data, constraint, kernel):
@@ -595,7 +1491,8 @@ class GriddedCollocator(Collocator):
         :param points: An Iris cube with the sampling grid to collocate onto.
         :param data: The Iris cube with the data to be collocated.
         :param constraint: None allowed yet, as this is unlikely to be required for gridded-gridded.
-        :param kernel: The kernel to use, current options are gridded_gridded_nn and gridded_gridded_li.
+        :param kernel: The kernel to use, current options are gridded_gridded_nn, gridded_gridded_li and
+         gridded_gridded_con.
         :return: An Iris cube with the collocated data.
         """
         self._check_for_valid_kernel(kernel)
@@ -673,7 +1570,7 @@ class GriddedCollocator(Collocator):
 
         output_cube = self._iris_interpolate(coord_names_and_sizes_for_output_grid,
                                              coord_names_and_sizes_for_sample_grid, data,
-                                             kernel, output_mask, points, self.extrapolate)
+                                             kernel, output_mask, points, self.extrapolate, self.mdtol)
 
         if not isinstance(output_cube, list):
             return GriddedDataList([output_cube])
@@ -706,8 +1603,8 @@ class GriddedCollocator(Collocator):
 
     @staticmethod
     def _iris_interpolate(coord_names_and_sizes_for_output_grid, coord_names_and_sizes_for_sample_grid, data, kernel,
-                          output_mask, points, extrapolate):
-        """ Collocates using iris.analysis.interpolate
+                          output_mask, points, extrapolate, mdtol=0):
+        """ Collocates using iris.analysis.interpolate, or the CIS regridder where the data can be regridded with it
         """
         coordinate_point_pairs = []
         for j in range(0, len(coord_names_and_sizes_for_sample_grid)):
@@ -718,8 +1615,18 @@ class GriddedCollocator(Collocator):
 
         # The result here will be a cube with the correct dimensions for the output, so interpolated over all points
         # in coord_names_and_sizes_for_output_grid.
-        output_cube = make_from_cube(data.interpolate(coordinate_point_pairs,
-                                                      kernel.interpolater(extrapolation_mode=extrapolate)))
+        if isinstance(kernel, gridded_gridded_con):
+            if not GriddedCollocator._can_regrid(data, coordinate_point_pairs):
+                raise cis.exceptions.UserPrintableException(
+                    "Conservative collocation is only possible for data without auxiliary coordinates spanning the "
+                    "horizontal dimensions")
+            output_cube = GriddedCollocator._regrid(data, coordinate_point_pairs, kernel, extrapolate,
+                                                    points.dim_coords, mdtol)
+        elif GriddedCollocator._can_regrid(data, coordinate_point_pairs):
+            output_cube = GriddedCollocator._regrid(data, coordinate_point_pairs, kernel, extrapolate)
+        else:
+            output_cube = make_from_cube(data.interpolate(coordinate_point_pairs,
+                                                          kernel.interpolater(extrapolation_mode=extrapolate)))
 
         # Iris outputs interpolated cubes with the dimensions in the order of the data grid, not the sample grid,
         # so we need to rearrange the order of the dimensions.
@@ -736,6 +1643,91 @@ class GriddedCollocator(Collocator):
             output_cube.data = cis.utils.apply_mask_to_numpy_array(output_cube.data, output_mask)
         return output_cube
 
+    @staticmethod
+    def _can_regrid(data, coordinate_point_pairs):
+        """
+        Can the data be regridded by the CIS regridder? This interpolates only the values and dimension coordinates,
+        so any data with other coordinates (such as hybrid heights) spanning the interpolated dimensions is left to
+        Iris.
+        """
+        cubes = data if isinstance(data, list) else [data]
+        for cube in cubes:
+            if len(cube.aux_factories) > 0:
+                return False
+            dims = set()
+            for name, _ in coordinate_point_pairs:
+                coord = cube.coord(name)
+                if coord.ndim != 1 or len(cube.coord_dims(coord)) != 1 or \
+                        not np.issubdtype(coord.points.dtype, np.number):
+                    return False
+                dims.update(cube.coord_dims(coord))
+            if any(dims.intersection(cube.coord_dims(coord)) for coord in cube.aux_coords):
+                return False
+        return True
+
+    @staticmethod
+    def _regrid(data, coordinate_point_pairs, kernel, extrapolate, sample_coords=None, mdtol=0):
+        """
+        Regrids each cube onto the sample points with the CIS regridder. The weights are calculated once for all of the
+        cubes, and are reused by later collocations between the same grids.
+
+        For the conservative kernel the values are regridded conservatively over the horizontal cells of the sample
+        grid (given by sample_coords, in the same order as the coordinate point pairs) and take the value nearest to
+        each sample point along any other coordinate.
+
+        :return: GriddedData, or GriddedDataList if data is a list
+        """
+        from iris.util import guess_coord_axis
+        from cis.collocation.regrid import get_regridder, get_conservative_regridder
+        if isinstance(data, list):
+            return GriddedDataList([GriddedCollocator._regrid(cube, coordinate_point_pairs, kernel, extrapolate,
+                                                              sample_coords, mdtol)
+                                    for cube in data])
+
+        source_coords = [data.coord(name) for name, _ in coordinate_point_pairs]
+        target_points = [np.asarray(points) for _, points in coordinate_point_pairs]
+        dims = [data.coord_dims(coord)[0] for coord in source_coords]
+        values = data.data
+        conservative_coords = {}
+
+        if isinstance(kernel, gridded_gridded_con):
+            axes = [guess_coord_axis(coord) for coord in source_coords]
+            if 'Y' not in axes or 'X' not in axes:
+                raise cis.exceptions.UserPrintableException(
+                    "Conservative collocation needs both latitude and longitude coordinates in the sample and the data")
+            horizontal = [axes.index('Y'), axes.index('X')]
+            for i in horizontal:
+                conservative_coords[dims[i]] = _get_coord_with_bounds(sample_coords[i])
+            regridder = get_conservative_regridder([_get_coord_with_bounds(source_coords[i]) for i in horizontal],
+                                                   [conservative_coords[dims[i]] for i in horizontal])
+            values = regridder(values, [dims[i] for i in horizontal], mdtol)
+            # Any other coordinates are matched to the nearest sample point
+            others = [i for i in range(len(source_coords)) if i not in horizontal]
+            method = 'nearest'
+        else:
+            others = list(range(len(source_coords)))
+            method = 'nearest' if isinstance(kernel, gridded_gridded_nn) else 'linear'
+
+        if others:
+            regridder = get_regridder([source_coords[i] for i in others], [target_points[i] for i in others], method,
+                                      extrapolate == 'extrapolate')
+            values = regridder(values, [dims[i] for i in others])
+
+        output_cube = iris.cube.Cube(values, standard_name=data.standard_name, long_name=data.long_name,
+                                     var_name=data.var_name, units=data.units, attributes=data.attributes,
+                                     cell_methods=data.cell_methods)
+        for coord in data.dim_coords:
+            dim = data.coord_dims(coord)[0]
+            if dim in conservative_coords:
+                output_cube.add_dim_coord(conservative_coords[dim].copy(), dim)
+            elif dim in dims:
+                output_cube.add_dim_coord(coord.copy(points=target_points[dims.index(dim)], bounds=None), dim)
+            else:
+                output_cube.add_dim_coord(coord.copy(), dim)
+        for coord in data.aux_coords:
+            output_cube.add_aux_coord(coord.copy(), data.coord_dims(coord))
+        return make_from_cube(output_cube)
+
 
 class gridded_gridded_nn(Kernel):
     def __init__(self):
@@ -759,10 +1751,23 @@ class gridded_gridded_li(Kernel):
         raise ValueError("gridded_gridded_li kernel selected for use with collocator other than GriddedCollocator")
 
 
+class gridded_gridded_con(Kernel):
+    def __init__(self):
+        self.name = 'conservative'
+
+    def get_value(self, point, data):
+        """Not needed for gridded/gridded collocation.
+        """
+        raise ValueError("gridded_gridded_con kernel selected for use with collocator other than GriddedCollocator")
+
+
 class GeneralGriddedCollocator(Collocator):
     """Performs collocation of data on to the points of a cube (ie onto a gridded dataset).
     """
 
+    #: The number of worker processes to use when collocating onto the cells in batch
+    workers = 1
+
     def collocate(self, points, data, constraint, kernel):
         """
         :param points: cube defining the sample points
@@ -828,7 +1833,14 @@ class GeneralGriddedCollocator(Collocator):
 
         logging.info("--> Co-locating...")
 
-        if hasattr(kernel, "get_value_for_data_only") and hasattr(constraint, "get_iterator_for_data_only"):
+        if hasattr(kernel, "get_value_for_data_only_in_groups") and hasattr(constraint, "get_groups_for_data_only"):
+            # Apply the kernel to all of the constrained cells at once
+            out_indices, data_values, offsets = constraint.get_groups_for_data_only(
+                self.missing_data_for_missing_sample, data_points, points)
+            kernel_vals = kernel.get_value_for_data_only_in_groups(data_values, offsets)
+            for idx, val in enumerate(values):
+                val[out_indices] = kernel_vals[idx]
+        elif hasattr(kernel, "get_value_for_data_only") and hasattr(constraint, "get_iterator_for_data_only"):
             # Iterate over constrained cells
             iterator = constraint.get_iterator_for_data_only(
                 self.missing_data_for_missing_sample, coord_map, coords, data_points, shape, points, values)
@@ -840,6 +1852,9 @@ class GeneralGriddedCollocator(Collocator):
                     # ValueErrors are raised by Kernel when there are no points to operate on.
                     # We don't need to do anything.
                     pass
+        elif GeneralUngriddedCollocator._can_collocate_in_batch(constraint, kernel):
+            # Treat the cell centres as ungridded sample points and find the data points for all of them in batch
+            self._collocate_cells_in_batch(coord_map, coords, data_points, shape, points, constraint, kernel, values)
         else:
             # Iterate over constrained cells
             iterator = constraint.get_iterator(
@@ -879,6 +1894,43 @@ class GeneralGriddedCollocator(Collocator):
 
         return output
 
+    def _collocate_cells_in_batch(self, coord_map, coords, data_points, shape, points, constraint, kernel, values):
+        """
+        Collocates onto the centres of the output cells as a flat array of sample points, using the batch collocation
+        of GeneralUngriddedCollocator, and reshapes the results back onto the grid. This avoids creating a HyperPoint
+        for every cell.
+
+        :param coord_map: list of tuples relating index in HyperPoint to index in coords and in the output shape
+        :param coords: the coordinates of the sample cube
+        :param data_points: the (non-masked) data points
+        :param shape: shape of the output values
+        :param points: the sample cube
+        :param constraint: a constraint providing constrain_points_in_batch or a DummyConstraint
+        :param kernel: a kernel which can be applied in batch
+        :param values: list of masked arrays of the output shape, one for each kernel return value
+        """
+        sample_coords = [None] * HyperPoint.number_standard_names
+        centres = np.meshgrid(*[coords[ci].points for (hpi, ci, shi) in coord_map], indexing='ij')
+        for (hpi, ci, shi) in coord_map:
+            sample_coords[hpi] = centres[shi].ravel()
+
+        num_cells = int(np.prod(shape))
+        sample_indices = np.arange(num_cells)
+        if self.missing_data_for_missing_sample:
+            # Every coordinate of the sample is mapped, so its dimensions just need to be put in the output order.
+            dims = [points.coord_dims(coords[ci])[0] for (hpi, ci, shi) in coord_map]
+            sample_mask = np.ma.getmaskarray(points.data).transpose(dims).ravel()
+            sample_indices = sample_indices[~sample_mask]
+
+        batch_collocator = GeneralUngriddedCollocator(
+            self.fill_value, missing_data_for_missing_sample=self.missing_data_for_missing_sample)
+        batch_collocator.workers = self.workers
+        flat_values = np.ma.masked_all((len(values), num_cells))
+        batch_collocator._collocate_coords_in_batch(sample_indices, sample_coords, [data_points], constraint, kernel,
+                                                    flat_values)
+        for idx, val in enumerate(values):
+            val[...] = flat_values[idx].reshape(shape)
+
     def _set_multi_value_kernel(self, kernel_val, values, indices):
         # This kernel returns multiple values:
         for idx, val in enumerate(kernel_val):
@@ -916,6 +1968,21 @@ class CubeCellConstraint(CellConstraint):
         :param data: list of HyperPoints to check
         :return: HyperPointList of points found within cell
         """
+        if hasattr(data, 'get_coord_arrays'):
+            # Check the coordinate arrays of all of the points at once.
+            coord_arrays = data.get_coord_arrays()
+            if getattr(data, 'non_masked_iteration', False):
+                indices = data.get_non_masked_indices()
+            else:
+                indices = np.arange(len(data))
+            for idx in range(HyperPoint.number_standard_names):
+                cell = sample_point[idx]
+                if cell is not None:
+                    coord = coord_arrays[idx][indices]
+                    within = np.ma.filled((np.min(cell.bound) <= coord) & (coord < np.max(cell.bound)), False)
+                    indices = indices[within]
+            return data.get_points(indices)
+
         con_points = HyperPointList()
         for point in data:
             include = True
@@ -949,11 +2016,28 @@ class BinningCubeCellConstraint(IndexedConstraint):
         :return: HyperPointList of points found within cell
         """
         point_list = self.grid_cell_bin_index.get_points_by_indices(sample_point)
-        con_points = HyperPointList()
-        if point_list is not None:
-            for point in point_list:
-                con_points.append(data[point])
-        return con_points
+        return HyperPointList([data[point] for point in point_list])
+
+    def get_iterator_for_data_only(self, missing_data_for_missing_sample, coord_map, coords, data_points, shape, points,
+                                   values):
+        """
+        The method returns an iterator over the output indices and a numpy array slice of the data values, for the
+        cells containing data points.
+
+        :param missing_data_for_missing_sample: If true anywhere there is missing data on the sample then final point is
+         missing; otherwise just use the sample
+        :param coord_map: Not needed for the data only kernel
+        :param coords: Not needed for the data only kernel
+        :param data_points: The (non-masked) data points
+        :param shape: Not needed
+        :param points: The original points object, these are the points to collocate
+        :param values: Not needed
+        :return: Iterator which iterates through (sample indices and data slice) to be placed in these points
+        """
+        data_points_sorted = data_points.get_value_array()[self.grid_cell_bin_index.indices]
+        for out_indices, cell_slice in self.grid_cell_bin_index.get_iterator():
+            if not missing_data_for_missing_sample or points.data[out_indices] is not np.ma.masked:
+                yield out_indices, data_points_sorted[cell_slice]
 
 
 class BinnedCubeCellOnlyConstraint(Constraint):
@@ -974,13 +2058,9 @@ class BinnedCubeCellOnlyConstraint(Constraint):
 
         for out_indices, slice_start_end in self.grid_cell_bin_index_slices.get_iterator():
             if not missing_data_for_missing_sample or points.data[out_indices] is not np.ma.masked:
-                # iterate through the points which are within the same cell
-
-                con_points = HyperPointList()
-                slice_indicies = slice(*slice_start_end)
-
-                for x in self.grid_cell_bin_index_slices.sort_order[slice_indicies]:
-                    con_points.append(data_points[x])
+                # Get the points which are within the same cell together from the coordinate and value arrays
+                cell_indices = self.grid_cell_bin_index_slices.sort_order[slice(*slice_start_end)]
+                con_points = data_points.get_points(cell_indices)
 
                 hp_values = [None] * HyperPoint.number_standard_names
                 for (hpi, ci, shi) in coord_map:
@@ -1005,7 +2085,7 @@ class BinnedCubeCellOnlyConstraint(Constraint):
         :param values: Not needed
         :return: Iterator which iterates through (sample indices and data slice) to be placed in these points
         """
-        data_points_sorted = data_points.data[self.grid_cell_bin_index_slices.sort_order]
+        data_points_sorted = data_points.get_value_array()[self.grid_cell_bin_index_slices.sort_order]
         if missing_data_for_missing_sample:
             for out_indices, slice_start_end in self.grid_cell_bin_index_slices.get_iterator():
                 if points.data[out_indices] is not np.ma.masked:
@@ -1016,6 +2096,30 @@ class BinnedCubeCellOnlyConstraint(Constraint):
                 data_slice = data_points_sorted[slice(*slice_start_end)]
                 yield out_indices, data_slice
 
+    def get_groups_for_data_only(self, missing_data_for_missing_sample, data_points, points):
+        """
+        The method returns all of the groups of data values contributing to the cells at once, so that a kernel can
+        operate on all of the cells in a single call rather than being called for each cell in turn.
+
+        :param missing_data_for_missing_sample: If true anywhere there is missing data on the sample then final point is
+         missing; otherwise just use the sample
+        :param data_points: The (non-masked) data points
+        :param points: The original points object, these are the points to collocate
+        :return: tuple of (out_indices, data values, offsets) - out_indices is a tuple of arrays giving the sample
+         indices of each group, and group i is data values[offsets[i]:offsets[i + 1]]
+        """
+        out_indices, offsets = self.grid_cell_bin_index_slices.get_groups()
+        # Leave out the points outside the grid, which are sorted to the start.
+        in_grid_order = self.grid_cell_bin_index_slices.sort_order[offsets[0]:]
+        data_points_sorted = data_points.get_value_array()[in_grid_order]
+        counts = np.diff(offsets)
+        if missing_data_for_missing_sample:
+            keep = ~np.ma.getmaskarray(points.data)[out_indices]
+            data_points_sorted = data_points_sorted[np.repeat(keep, counts)]
+            out_indices = tuple(i[keep] for i in out_indices)
+            counts = counts[keep]
+        return out_indices, data_points_sorted, np.concatenate(([0], np.cumsum(counts))).astype(int)
+
 
 def make_coord_map(points, data):
     """
@@ -1080,6 +2184,18 @@ def _find_longitude_range(coords):
     return low
 
 
+def _get_coord_with_bounds(coord):
+    """Gets a coordinate with bounds, guessing them for a copy of the coordinate if it has none.
+    :param coord: one dimensional coordinate
+    :return: the coordinate, or a copy of it with guessed bounds
+    """
+    if not coord.has_bounds():
+        logging.warning("Creating guessed bounds for {} as none exist in file".format(coord.name()))
+        coord = coord.copy()
+        coord.guess_bounds()
+    return coord
+
+
 def _fix_longitude_range(coords, data_points):
     """Sets the longitude range of the data points to match that of the sample coordinates.
     :param coords: coordinates for grid on which to collocate
@@ -1088,3 +2204,212 @@ def _fix_longitude_range(coords, data_points):
     range_start = _find_longitude_range(coords)
     if range_start is not None:
         data_points.set_longitude_range(range_start)
+
+
+def _are_same_coords(coords, other_coords):
+    """Determines whether two lists of flattened coordinate arrays, as returned by
+    HyperPointView.get_coord_arrays, are the same.
+
+    :return: True if the same coordinates are present in both lists with the same values
+    """
+    for coord, other_coord in zip(coords, other_coords):
+        if coord is None or other_coord is None:
+            if coord is not other_coord:
+                return False
+        elif coord is not other_coord and not (np.array_equal(np.ma.getdata(coord), np.ma.getdata(other_coord)) and
+                                               np.array_equal(np.ma.getmaskarray(coord),
+                                                              np.ma.getmaskarray(other_coord))):
+            return False
+    return True
+
+
+def _are_on_same_grid(cubes):
+    """Determines whether a list of cubes are all on the same grid, with the same shape and the same coordinates
+    (including any hybrid vertical coordinates) over the same dimensions, so that they can be interpolated together.
+
+    :return: True if all of the cubes are on the same grid as the first
+    """
+    first = cubes[0]
+    for cube in cubes[1:]:
+        if cube.shape != first.shape or len(cube.coords()) != len(first.coords()):
+            return False
+        for coord in first.coords():
+            other_coords = cube.coords(coord.name())
+            if len(other_coords) != 1 or cube.coord_dims(other_coords[0]) != first.coord_dims(coord) or \
+                    not np.array_equal(other_coords[0].points, coord.points):
+                return False
+    return True
+
+
+def _get_kernel_separation_only(constraint, kernel):
+    """Determines whether a constraint does no more than limit the separation of the data points from each sample
+    point in the coordinate used by a nearest neighbour kernel, so that it can be replaced by a nearest neighbour
+    search limited to that separation.
+
+    :param constraint: The constraint instance (or None)
+    :param kernel: A nearest neighbour kernel defining separation_check and separation_name
+    :return: tuple of (True if the constraint only limits the kernel's separation (or does nothing), the maximum
+     separation or None if there is no limit)
+    """
+    if constraint is None or isinstance(constraint, DummyConstraint):
+        return True, None
+    if isinstance(constraint, SepConstraint):
+        separation_check = getattr(constraint, kernel.separation_check)
+        if all(check == separation_check for check in constraint.array_checks):
+            return True, getattr(constraint, kernel.separation_name, None)
+    return False, None
+
+
+def _filter_grouped_indices(offsets, indices, keep):
+    """Removes entries from grouped indices, where group i is indices[offsets[i]:offsets[i + 1]].
+
+    :param offsets: integer array of the start of each group, the last element being the total length
+    :param indices: array of grouped indices
+    :param keep: boolean array the same length as indices, True for entries to keep
+    :return: tuple of the new (offsets, indices)
+    """
+    num_groups = len(offsets) - 1
+    group_numbers = np.repeat(np.arange(num_groups), np.diff(offsets))
+    counts = np.bincount(group_numbers[keep], minlength=num_groups)
+    return np.concatenate(([0], np.cumsum(counts))), indices[keep]
+
+
+def _get_grouped_horizontal_distances(sample_coords, data_coords, offsets, indices):
+    """Calculates the horizontal distance between each sample point and each of its group of data points, where the
+    data points for sample point i are indices[offsets[i]:offsets[i + 1]].
+
+    :param sample_coords: List of flattened coordinate arrays (in HyperPoint order) for the sample points
+    :param data_coords: List of flattened coordinate arrays (in HyperPoint order) for all of the data points
+    :param offsets: integer array of the start of each group, the last element being the total length
+    :param indices: array of grouped indices of data points
+    :return: array of distances in kilometres, the same length as indices
+    """
+    if any(coords[i] is None for coords in (sample_coords, data_coords)
+           for i in (HyperPoint.LATITUDE, HyperPoint.LONGITUDE)):
+        raise TypeError("The latitude and longitude coordinates are needed for distance weighted collocation")
+    sample_numbers = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    return cis.utils.haversine_for_arrays(
+        np.asarray(np.ma.getdata(data_coords[HyperPoint.LATITUDE]), dtype=np.float64)[indices],
+        np.asarray(np.ma.getdata(data_coords[HyperPoint.LONGITUDE]), dtype=np.float64)[indices],
+        np.asarray(np.ma.getdata(sample_coords[HyperPoint.LATITUDE]), dtype=np.float64)[sample_numbers],
+        np.asarray(np.ma.getdata(sample_coords[HyperPoint.LONGITUDE]), dtype=np.float64)[sample_numbers])
+
+
+def _reduce_groups(ufunc, values, offsets):
+    """Applies a numpy ufunc reduction (e.g. np.add or np.minimum) to each group of values, where group i is
+    values[offsets[i]:offsets[i + 1]].
+
+    :param ufunc: numpy ufunc to reduce with
+    :param values: 1-D array of values
+    :param offsets: integer array of the start of each group, the last element being the total length
+    :return: masked array with one element per group, masked for empty groups
+    """
+    counts = np.diff(offsets)
+    non_empty = counts > 0
+    result = np.ma.masked_all(len(counts))
+    if non_empty.any():
+        # Empty groups have to be left out of reduceat, as it would return the next value for them. Groups are
+        # contiguous so each remaining group still ends where the next non-empty one starts.
+        result[non_empty] = ufunc.reduceat(values[:offsets[-1]], offsets[:-1][non_empty])
+    return result
+
+
+def _grouped_mean(values, offsets):
+    """Calculates the mean of each group of values, where group i is values[offsets[i]:offsets[i + 1]].
+
+    :return: masked array with one element per group, masked for empty groups
+    """
+    counts = np.diff(offsets)
+    return _reduce_groups(np.add, values, offsets) / np.ma.masked_equal(counts, 0)
+
+
+def _grouped_stddev(values, offsets, means=None):
+    """Calculates the corrected sample standard deviation (with one degree of freedom) of each group of values, where
+    group i is values[offsets[i]:offsets[i + 1]]. As for numpy, groups of a single value give NaN.
+
+    :param means: optional masked array of the mean of each group, if already calculated
+    :return: masked array with one element per group, masked for empty groups
+    """
+    counts = np.diff(offsets)
+    if means is None:
+        means = _grouped_mean(values, offsets)
+    deviations = values[:offsets[-1]] - np.repeat(means.filled(0), counts)
+    sum_squares = _reduce_groups(np.add, deviations ** 2, offsets)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variances = sum_squares.filled(np.nan) / (counts - 1)
+    return np.ma.array(np.sqrt(variances), mask=np.ma.getmaskarray(sum_squares))
+
+
+# The function applied to each block of sample points by the worker processes, which inherit it when forked
+_block_function = None
+
+
+def _apply_block_function(block):
+    return _block_function(block)
+
+
+def _can_fork_workers():
+    """Determines whether worker processes can be forked on this platform, so that they share the memory of this
+    process.
+    """
+    import multiprocessing
+    try:
+        return 'fork' in multiprocessing.get_all_start_methods()
+    except AttributeError:
+        # Python 2 always forks where it is able to.
+        import os
+        return hasattr(os, 'fork')
+
+
+def _apply_to_blocks_in_workers(function, blocks, workers):
+    """Applies a function to each of a list of blocks using a pool of forked worker processes, yielding the results in
+    order. The first block is processed in this process before the pool is started so that anything built lazily by the
+    function, such as an index on the data, is built once and shared with the workers.
+
+    :param function: function to apply to each block
+    :param blocks: list of blocks
+    :param workers: number of worker processes
+    :return: generator of the results for each block
+    """
+    import multiprocessing
+    global _block_function
+
+    if len(blocks) == 0:
+        return
+    yield function(blocks[0])
+    if len(blocks) == 1:
+        return
+
+    logging.info("    Using {} worker processes".format(workers))
+    _block_function = function
+    try:
+        context = multiprocessing.get_context('fork')
+    except AttributeError:
+        context = multiprocessing
+    pool = context.Pool(workers)
+    try:
+        for result in pool.imap(_apply_block_function, blocks[1:]):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+        _block_function = None
+
+
+def _get_spatial_order(sample_coords, sample_indices):
+    """Gets an order for a set of sample points in which nearby points are close together, by sorting them by
+    longitude within one degree latitude bands (or by the first coordinate present if there is no horizontal position).
+
+    :param sample_coords: List of flattened coordinate arrays (in HyperPoint order) of all of the sample points
+    :param sample_indices: Indices of the sample points to order
+    :return: array of positions in sample_indices
+    """
+    lat = sample_coords[HyperPoint.LATITUDE]
+    lon = sample_coords[HyperPoint.LONGITUDE]
+    if lat is not None and lon is not None:
+        return np.lexsort((np.ma.filled(lon[sample_indices], np.nan),
+                           np.floor(np.ma.filled(lat[sample_indices], np.nan))))
+    for coord in sample_coords:
+        if coord is not None:
+            return np.argsort(np.ma.filled(coord[sample_indices], np.nan), kind='mergesort')
+    return np.arange(len(sample_indices))
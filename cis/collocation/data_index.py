@@ -2,17 +2,17 @@
 Indexes over data used for fast lookup when collocating.
 """
 import logging
-import math
-import datetime
 
 import numpy as np
 import numpy.ma as ma
 
 from cis.collocation.haversinedistancekdtreeindex import HaversineDistanceKDTreeIndex
-from cis.time_util import convert_datetime_to_std_time
 
 
 class GridCellBinIndexInSlices(object):
+    #: The index depends on the grid as well as the data
+    uses_grid = True
+
     def __init__(self):
         # cells numbers for each hyperpoint
         self.cell_numbers = None
@@ -60,11 +60,7 @@ class GridCellBinIndexInSlices(object):
                 lower_bounds[shi] = coord.bounds[::, 0]
                 max_bounds[shi] = coord.bounds[-1, 1]
 
-            hp_coord = hyper_points.coords[hpi]
-            if isinstance(hp_coord[0], datetime.datetime):
-                hp_coord = convert_datetime_to_std_time(hp_coord)
-
-            hp_coords.append(hp_coord)
+            hp_coords.append(hyper_points.get_coord_arrays()[hpi])
 
         bounds_coords_max = list(zip(lower_bounds, hp_coords, max_bounds))
 
@@ -76,12 +72,12 @@ class GridCellBinIndexInSlices(object):
         # -1 or M_i indicates the point is outside the grid.
         # Output is a list of coordinates which lists the indexes where the hyper points
         #    should be located in the grid
-        indices = np.vstack(
+        indices = np.vstack([
             np.where(
                 ci < max_coordinate_value,
                 np.searchsorted(bi, ci, side='right') - 1,
                 -1)
-            for bi, ci, max_coordinate_value in bounds_coords_max)
+            for bi, ci, max_coordinate_value in bounds_coords_max])
 
         # D-tuple giving the shape of the output grid
         grid_shape = tuple(len(bi_ci[0]) for bi_ci in bounds_coords_max)
@@ -109,7 +105,7 @@ class GridCellBinIndexInSlices(object):
         self.cell_numbers = np.where(
             grid_mask,
             np.tensordot(
-                np.cumproduct((1,) + grid_shape[:-1]),
+                np.cumprod((1,) + grid_shape[:-1]),
                 indices,
                 axes=1
             ),
@@ -121,6 +117,28 @@ class GridCellBinIndexInSlices(object):
         self._indices = indices[:, self.sort_order]
         self.hp_coords = [hp_coord[self.sort_order] for hp_coord in hp_coords]
 
+    def to_arrays(self):
+        """
+        :return: dictionary of the arrays making up the index, from which it can be recreated with from_arrays
+        """
+        arrays = {'cell_numbers': self.cell_numbers, 'sort_order': self.sort_order, 'indices': self._indices}
+        for i, hp_coord in enumerate(self.hp_coords):
+            arrays['hp_coord_{}'.format(i)] = hp_coord
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        :param arrays: dictionary of arrays returned by to_arrays
+        :return: the index
+        """
+        index = cls()
+        index.cell_numbers = arrays['cell_numbers']
+        index.sort_order = arrays['sort_order']
+        index._indices = arrays['indices']
+        index.hp_coords = [arrays['hp_coord_{}'.format(i)] for i in range(len(index._indices))]
+        return index
+
     def get_iterator(self):
         """
         Get an iterator through all the points which will contribute to a cell.
@@ -164,10 +182,37 @@ class GridCellBinIndexInSlices(object):
             out_indices = tuple(self._indices[:, cell_slice_indices[0]])
             yield out_indices, cell_slice_indices
 
+    def get_groups(self):
+        """
+        Get all of the groups of points which contribute to a cell at once, as an alternative to iterating over them
+        with get_iterator. self.sort_order can be used to order the points.
+
+        :return: tuple of (out_indices, offsets) - out_indices is a tuple of arrays, one for each coordinate iterated
+                 over, giving the indices of the cells containing points, and the (sorted) points in cell i are those
+                 from offsets[i] to offsets[i + 1]
+        """
+        num_points = len(self.cell_numbers)
+        # Points outside the grid have a cell number of -1 so are sorted to the start.
+        first_in_grid = np.searchsorted(self.cell_numbers, 0)
+        starts = np.flatnonzero(np.diff(self.cell_numbers[first_in_grid:])) + 1 + first_in_grid
+        if first_in_grid < num_points:
+            starts = np.concatenate(([first_in_grid], starts))
+        offsets = np.concatenate((starts, [num_points])).astype(int)
+        return tuple(self._indices[:, starts]), offsets
+
 
 class GridCellBinIndex(object):
+    #: The index depends on the grid as well as the data
+    uses_grid = True
+
     def __init__(self):
-        self.index = None
+        # shape of the grid of cells (in the order of the coordinates to be iterated over)
+        self.shape = None
+
+        # indices of the data points sorted by cell; the points in the cell with flattened (C order) cell number i are
+        # indices[offsets[i]:offsets[i + 1]]
+        self.indices = None
+        self.offsets = None
 
     def index_data(self, coords, data, coord_map):
         """
@@ -178,75 +223,94 @@ class GridCellBinIndex(object):
         :param coord_map: list of tuples relating index in HyperPoint to index in coords and in
                           coords to be iterated over
         """
-        # Create an index array matching the shape of the coordinates to be iterated over.
-        shape = []
-        for (hpi, ci, shi) in coord_map:
-            shape.append(len(coords[ci].points))
-        num_cell_indices = len(shape)
+        hp_coords = data.get_coord_arrays()
 
-        # Set a logging interval.
-        num_bin_checks = sum([math.log(x) for x in shape])
-        log_every_points = 2000000 / num_bin_checks
-        log_every_points -= log_every_points % 100
-        log_every_points = max(log_every_points, 100)
+        self.shape = [None] * len(coord_map)
+        cell_indices = [None] * len(coord_map)
+        in_grid = ma.getmaskarray(data.get_value_array()) == False
+        for (hpi, ci, shi) in coord_map:
+            hp_coord = np.ma.filled(np.ma.asarray(hp_coords[hpi], dtype=np.float64), np.nan)
+            cell_indices[shi] = _find_cell_indices(coords[ci], hp_coord)
+            self.shape[shi] = len(coords[ci].points)
+            in_grid &= cell_indices[shi] >= 0
+        self.shape = tuple(self.shape)
+
+        # Sort the points in the grid by cell number, keeping points in the same cell in the order of the data.
+        point_indices = np.flatnonzero(in_grid)
+        cell_numbers = np.ravel_multi_index([c[point_indices] for c in cell_indices], self.shape)
+        sort_order = np.argsort(cell_numbers, kind='mergesort')
+        self.indices = point_indices[sort_order]
+        counts = np.bincount(cell_numbers, minlength=int(np.prod(self.shape)))
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(int)
+        logging.info("    Indexed %d points of %d", len(self.indices), len(in_grid))
+
+    def to_arrays(self):
+        """
+        :return: dictionary of the arrays making up the index, from which it can be recreated with from_arrays
+        """
+        return {'shape': np.array(self.shape, dtype=int), 'indices': self.indices, 'offsets': self.offsets}
 
-        # Create the index, which will be an array containing of a lists of data points that are
-        # within each cell.
-        self.index = np.empty(tuple(shape), dtype=np.dtype(object))
-        self.index.fill(None)
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        :param arrays: dictionary of arrays returned by to_arrays
+        :return: the index
+        """
+        index = cls()
+        index.shape = tuple(int(n) for n in arrays['shape'])
+        index.indices = arrays['indices']
+        index.offsets = arrays['offsets']
+        return index
 
-        coord_decreasing = [False] * len(coords)
-        coord_lengths = [0] * len(coords)
-        lower_bounds = [None] * len(coords)
-        upper_bounds = [None] * len(coords)
-        for (hpi, ci, shi) in coord_map:
-            coord = coords[ci]
-            # Coordinates must be monotonic; determine whether increasing or decreasing.
-            if len(coord.points) > 1:
-                if coord.points[1] < coord.points[0]:
-                    coord_decreasing[ci] = True
-            coord_lengths[ci] = len(coord.points)
-            if coord_decreasing[ci]:
-                lower_bounds[ci] = coord.bounds[::-1, 1]
-                upper_bounds[ci] = coord.bounds[::-1, 0]
-            else:
-                lower_bounds[ci] = coord.bounds[::, 0]
-                upper_bounds[ci] = coord.bounds[::, 1]
-
-        # Populate the index by finding the cell containing each data point.
-        num_points = len(data)
-        pt_count = 0
-        pt_total = 0
-        for pt_idx, point in data.enumerate_non_masked_points():
-            point_cell_indices = [None] * num_cell_indices
-
-            # Find the interval that the point resides in for each relevant coordinate.
-            for (hpi, ci, shi) in coord_map:
-                search_index = np.searchsorted(lower_bounds[ci], point[hpi], side='right') - 1
-                if (search_index >= 0) and (point[hpi] < upper_bounds[ci][search_index]):
-                    if coord_decreasing[ci]:
-                        point_cell_indices[shi] = coord_lengths[ci] - search_index - 1
-                    else:
-                        point_cell_indices[shi] = search_index
-
-            # Add point to index if a containing interval was found for each coordinate.
-            if point_cell_indices.count(None) == 0:
-                index_entry = self.index[tuple(point_cell_indices)]
-                if index_entry is None:
-                    index_entry = []
-                index_entry.append(pt_idx)
-                self.index[tuple(point_cell_indices)] = index_entry
-
-            # Periodically log progress.
-            pt_count += 1
-            pt_total += 1
-            if pt_count == log_every_points:
-                logging.info("    Indexed %d points of %d (%d%%)",
-                             pt_total, num_points, int(pt_total * 100 / num_points))
-                pt_count = 0
+    def get_slice_by_indices(self, indices):
+        """
+        :param indices: indices of a cell (in the order of the coordinates to be iterated over)
+        :return: slice through the sorted indices giving the points within the cell
+        """
+        cell_number = np.ravel_multi_index(tuple(indices), self.shape)
+        return slice(self.offsets[cell_number], self.offsets[cell_number + 1])
 
     def get_points_by_indices(self, indices):
-        return self.index[tuple(indices)]
+        """
+        :param indices: indices of a cell (in the order of the coordinates to be iterated over)
+        :return: array of indices in data of the points within the cell
+        """
+        return self.indices[self.get_slice_by_indices(indices)]
+
+    def get_iterator(self):
+        """
+        Get an iterator through the cells which contain points, in order of cell number.
+
+        :return: an iterator of (out_indices, slice through the sorted indices giving the points within the cell)
+        """
+        for cell_number in np.flatnonzero(np.diff(self.offsets)):
+            out_indices = tuple(int(i) for i in np.unravel_index(cell_number, self.shape))
+            yield out_indices, slice(self.offsets[cell_number], self.offsets[cell_number + 1])
+
+
+def _find_cell_indices(coord, values):
+    """
+    Finds the cell of a monotonic coordinate containing each of an array of values. A value on the boundary between
+    two cells lies in the cell for which it is the lower bound.
+
+    :param coord: coordinate with bounds
+    :param values: array of values to locate
+    :return: array of cell indices, -1 for values outside all of the cells
+    """
+    decreasing = len(coord.points) > 1 and coord.points[1] < coord.points[0]
+    if decreasing:
+        lower_bounds = coord.bounds[::-1, 1]
+        upper_bounds = coord.bounds[::-1, 0]
+    else:
+        lower_bounds = coord.bounds[::, 0]
+        upper_bounds = coord.bounds[::, 1]
+
+    search_index = np.searchsorted(lower_bounds, values, side='right') - 1
+    with np.errstate(invalid='ignore'):
+        found = (search_index >= 0) & (values < upper_bounds[np.maximum(search_index, 0)])
+    if decreasing:
+        search_index = len(coord.points) - search_index - 1
+    return np.where(found, search_index, -1)
 
 
 # Map of names of attributes of a constraint or kernel to the class used to
@@ -256,6 +320,41 @@ _index_attributes = {'grid_cell_bin_index': GridCellBinIndex,
                      'haversine_distance_kd_tree_index': HaversineDistanceKDTreeIndex}
 
 
+# Persistent cache of indexes, or None if indexes are always built
+_index_cache = None
+
+
+def enable_index_cache(directory=None, max_size=None):
+    """
+    Stores the indexes created by create_indexes in a persistent on-disk cache, so that they can be reused by later
+    runs collocating the same data.
+
+    :param directory: directory in which to store the cache, or None for the default
+    :param max_size: maximum total size of the cache in bytes, or None for the default
+    """
+    from cis.collocation.index_cache import IndexCache
+    global _index_cache
+    if max_size is None:
+        _index_cache = IndexCache(directory)
+    else:
+        _index_cache = IndexCache(directory, max_size)
+
+
+def disable_index_cache():
+    """
+    Stops using the on-disk cache of indexes.
+    """
+    global _index_cache
+    _index_cache = None
+
+
+def get_index_cache():
+    """
+    :return: the IndexCache in use, or None if indexes are always built
+    """
+    return _index_cache
+
+
 def create_indexes(operator, coords, data, coord_map):
     """
     :param operator: constraint or kernel instance
@@ -265,8 +364,20 @@ def create_indexes(operator, coords, data, coord_map):
                       coords to be iterated over
     """
     for attr, cls in _index_attributes.items():
-        if hasattr(operator, attr):
-            index = cls()
-            logging.info("--> Creating index for %s", operator.__class__.__name__)
-            index.index_data(coords, data, coord_map)
+        # An attribute set to False indicates that the operator does not want the index in this configuration.
+        if hasattr(operator, attr) and getattr(operator, attr) is not False:
+            index = None
+            key = None
+            if _index_cache is not None and hasattr(cls, 'from_arrays'):
+                if getattr(cls, 'uses_grid', False):
+                    key = _index_cache.get_key(cls, data, coords, coord_map)
+                else:
+                    key = _index_cache.get_key(cls, data)
+                index = _index_cache.load(key, cls)
+            if index is None:
+                index = cls()
+                logging.info("--> Creating index for %s", operator.__class__.__name__)
+                index.index_data(coords, data, coord_map)
+                if key is not None:
+                    _index_cache.save(key, index)
             setattr(operator, attr, index)
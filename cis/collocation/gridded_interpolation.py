@@ -24,7 +24,8 @@ import numpy as np
 
 class GriddedUngriddedInterpolator(object):
 
-    def __init__(self, _data, sample, method='linear', missing_data_for_missing_sample=False):
+    def __init__(self, _data, sample, method='linear', missing_data_for_missing_sample=False, chunk_size=None,
+                 dtype=None):
         """
         Prepare an interpolation over the grid defined by a GriddedData source onto an UngriddedData sample.
 
@@ -34,6 +35,9 @@ class GriddedUngriddedInterpolator(object):
         :param GriddedData _data: The source data, only the coordinates are used from this at initialisation.
         :param UngriddedData sample: The points to sample the source data at.
         :param str method: The interpolation method to use (either 'linear' or 'nearest'). Default is 'linear'.
+        :param int chunk_size: The number of sample points to interpolate at once, or None for the default.
+        :param dtype: The floating point type in which to interpolate the values (for example np.float32 to halve the
+         memory needed), or None to use that of the values.
         """
         from iris.analysis._interpolation import extend_circular_coord, extend_circular_data
         from cis.utils import move_item_to_end
@@ -66,7 +70,7 @@ class GriddedUngriddedInterpolator(object):
                 decreasing = (coord_points.size > 1 and
                               coord_points[1] < coord_points[0])
                 if decreasing:
-                    self._decreasing_coord_dims.append(decreasing)
+                    self._decreasing_coord_dims.append(coord_dim)
                     coord_points = coord_points[::-1]
 
                 if getattr(coord, 'circular', False):
@@ -107,7 +111,8 @@ class GriddedUngriddedInterpolator(object):
             self.missing_mask = None
 
         self._interp = _RegularGridInterpolator(grid_points, sample_points,
-                                                hybrid_coord=hybrid_coord, hybrid_dims=hybrid_dims, method=method)
+                                                hybrid_coord=hybrid_coord, hybrid_dims=hybrid_dims, method=method,
+                                                chunk_size=chunk_size, dtype=dtype)
 
     def _get_dims_order(self, data, coords):
         """
@@ -124,44 +129,91 @@ class GriddedUngriddedInterpolator(object):
         dim_slices = [slice(None)] * data.ndim
         for dim in self._decreasing_coord_dims:
                 dim_slices[dim] = slice(-1, None, -1)
-        data = data[dim_slices]
+        data = data[tuple(dim_slices)]
         return data
 
+    def _read_window(self, data):
+        """
+        Read the values of a GriddedData object within the window of the grid used by the interpolation, arranged to
+        match the grid of the interpolator. Only this block is read from the (possibly lazily loaded) data so that a
+        few sample points need not realise the whole of a large source.
+
+        :param GriddedData data: Data values to interpolate
+        :return ndarray: The values in the window, transposed, with decreasing coordinates inverted and extended over
+         any circular coordinates
+        """
+        from iris.analysis._interpolation import extend_circular_data
+        window = self._interp.window
+        if any(dim_window.stop <= dim_window.start for dim_window in window):
+            # There are no points to interpolate, so there is nothing to read
+            return np.empty([np.maximum(0, dim_window.stop - dim_window.start) for dim_window in window],
+                            dtype=data.dtype)
+
+        read_slices = [slice(None)] * data.ndim
+        window_slices = [slice(None)] * data.ndim
+        extended_dims = []
+        for dim, dim_window in enumerate(window):
+            data_dim = self._data_transpose[dim]
+            size = data.shape[data_dim]
+            if dim in self._circular_coord_dims and dim_window.stop > size:
+                # The window wraps around onto the copy of the first point, so read the whole dimension
+                extended_dims.append(dim)
+                window_slices[dim] = dim_window
+            elif dim in self._decreasing_coord_dims:
+                read_slices[data_dim] = slice(size - np.minimum(dim_window.stop, size), size - dim_window.start)
+            else:
+                read_slices[data_dim] = dim_window
+
+        # Slicing the cube rather than its data keeps the data lazy until the block is read
+        data_array = data[tuple(read_slices)].data.transpose(self._data_transpose)
+        data_array = self._account_for_inverted(data_array)
+        for dim in extended_dims:
+            data_array = extend_circular_data(data_array, dim)
+        return data_array[tuple(window_slices)]
+
     def __call__(self, data, fill_value=np.nan, extrapolate=False):
         """
          Perform the prepared interpolation over the given data GriddedData object - this assumes that the coordinates
           used to initialise the interpolator are identical as those in this data object.
 
+        A list of GriddedData objects (all with those same coordinates) can be given to interpolate all of them in a
+        single pass: their values are stacked along a trailing dimension so that the indices and weights are applied
+        once for every variable together.
+
         If extrapolate is True then fill_value is ignored (since there will be no invalid values).
 
-        :param GriddedData data: Data values to interpolate
+        :param GriddedData or list data: Data values to interpolate
         :param float fill_value: The fill value to use for sample points outside of the bounds of the data
         :param bool extrapolate: Extrapolate points outside the bounds of the data? Default False.
-        :return ndarray: Interpolated values.
+        :return ndarray or list: Interpolated values, or a list of the interpolated values of each variable if data is
+         a list.
         """
-        from iris.analysis._interpolation import extend_circular_data
         if extrapolate:
             fill_value = None
 
-        # Apply a transpose if we need to so that the indices line-up correctly
-        data_array = data.data.transpose(self._data_transpose)
-        # Account for any circular coords present
-        for dim in self._circular_coord_dims:
-            data_array = extend_circular_data(data_array, dim)
-
-        data_array = self._account_for_inverted(data_array)
-
-        result = self._interp(data_array, fill_value=fill_value)
+        if isinstance(data, list):
+            arrays = [self._read_window(var) for var in data]
+            if any(np.ma.is_masked(array) for array in arrays):
+                data_array = np.ma.stack(arrays, axis=-1)
+            else:
+                data_array = np.stack([np.ma.getdata(array) for array in arrays], axis=-1)
+            result = self._interp(data_array, fill_value=fill_value, windowed=True)
+        else:
+            result = self._interp(self._read_window(data), fill_value=fill_value, windowed=True)
 
         if self.missing_mask is not None:
             # Pack the interpolated values back into the original shape
-            expanded_result = np.ma.masked_array(np.zeros(self.missing_mask.shape), mask=self.missing_mask,
+            missing_mask = np.broadcast_to(self.missing_mask.reshape((-1,) + (1,) * (result.ndim - 1)),
+                                           self.missing_mask.shape + result.shape[1:])
+            expanded_result = np.ma.masked_array(np.zeros(missing_mask.shape), mask=missing_mask.copy(),
                                                  fill_value=fill_value)
             expanded_result[~self.missing_mask] = result
             if hasattr(result, 'mask'):
                 expanded_result.mask[~self.missing_mask] = result.mask
             result = expanded_result
 
+        if isinstance(data, list):
+            return [result[:, i] for i in range(len(data))]
         return result
 
 
@@ -205,7 +257,11 @@ class _RegularGridInterpolator(object):
     # this class is based on code originally programmed by Johannes Buchner,
     # see https://github.com/JohannesBuchner/regulargrid
 
-    def __init__(self, coords, points, hybrid_coord=None, hybrid_dims=None, method="linear"):
+    #: The default number of sample points to interpolate at once, which bounds the size of the temporary arrays
+    chunk_size = 100000
+
+    def __init__(self, coords, points, hybrid_coord=None, hybrid_dims=None, method="linear", chunk_size=None,
+                 dtype=None):
         """
         Initialise the itnerpolator - this will calculate and cache the indices of the interpolation. It will
         also interpolate the hybrid coordinate if needed to determine a unique vertical index.
@@ -216,7 +272,13 @@ class _RegularGridInterpolator(object):
         :param iterable hybrid_dims: The grid dimensions over which the hybrid coordinate is defined
         :param str method: The method of interpolation to perform. Supported are "linear" and "nearest". Default is
         "linear".
+        :param int chunk_size: The number of sample points to interpolate at once. Default is the class chunk_size.
+        :param dtype: The floating point type in which to interpolate values (the hybrid coordinate is always
+        interpolated in the type of its own points). Default is the type of the values.
         """
+        if chunk_size is not None:
+            self.chunk_size = int(chunk_size)
+        self.dtype = dtype
         if method == "linear":
             self._interp = self._evaluate_linear
         elif method == "nearest":
@@ -257,28 +319,33 @@ class _RegularGridInterpolator(object):
             # Find all of the interpolated vertical columns (one for each point)
             v_coords = self._interp(hybrid_coord, hybrid_indices, self.norm_distances)
 
-            self.indices.append(np.zeros(len(points.T), dtype=self.indices[0].dtype))
-            self.norm_distances.append(np.zeros(len(points.T)))
-
             # Calculate and store the vertical index and weight for each point based on the interpolated vertical
-            # column
-            # TODO: This loop could be a bottle-neck for many points, maybe move to Cython?
-            for i, p in enumerate(points.T):
-                vert_index, vert_norm_distance, vert_out_of_bounds = self._find_vertical_index(p[-1], v_coords[i])
-                self.indices[-1][i] = vert_index
-                self.norm_distances[-1][i] = vert_norm_distance
-                self.out_of_bounds[i] += vert_out_of_bounds
+            # column, searching all of the columns at once
+            vert_indices, vert_norm_distances, vert_out_of_bounds = self._find_vertical_indices(points[-1], v_coords)
+            self.indices.append(vert_indices.astype(self.indices[0].dtype))
+            self.norm_distances.append(vert_norm_distances)
+            self.out_of_bounds += vert_out_of_bounds
 
         else:
             self.indices, self.norm_distances, self.out_of_bounds = self._find_indices(points.T, self.grid)
 
-    def __call__(self, values, fill_value=np.nan):
+    @property
+    def window(self):
+        """
+        The smallest block of the grid containing every grid point used by the interpolation, as a tuple of a slice
+        for each dimension
+        """
+        return tuple(slice(np.min(i), np.max(i) + 2) if np.size(i) > 0 else slice(0, 0) for i in self.indices)
+
+    def __call__(self, values, fill_value=np.nan, windowed=False):
         """
         Interpolation of values at cached coordinates
 
         :param ndarray values: The data on the regular grid in n dimensions
         :param float fill_value: If provided, the value to use for points outside of the interpolation domain. If None,
         values outside the domain are extrapolated.
+        :param bool windowed: If True the values given are only those within the window of the grid, rather than on the
+        whole grid.
         :return ndarray: The interpolated values
         """
         if not hasattr(values, 'ndim'):
@@ -301,41 +368,82 @@ class _RegularGridInterpolator(object):
                 raise ValueError("fill_value must be either 'None' or "
                                  "of a type compatible with values")
 
-        for i, p in enumerate(self.grid):
-            if not values.shape[i] == len(p):
-                raise ValueError("There are %d points and %d values in "
-                                 "dimension %d" % (len(p), values.shape[i], i))
+        indices = self.indices
+        if windowed:
+            window = self.window
+            for i, w in enumerate(window):
+                if not values.shape[i] == w.stop - w.start:
+                    raise ValueError("There are %d points in the window and %d values in "
+                                     "dimension %d" % (w.stop - w.start, values.shape[i], i))
+            indices = [i - w.start for i, w in zip(indices, window)]
+        else:
+            for i, p in enumerate(self.grid):
+                if not values.shape[i] == len(p):
+                    raise ValueError("There are %d points and %d values in "
+                                     "dimension %d" % (len(p), values.shape[i], i))
 
-        result = self._interp(values, self.indices, self.norm_distances)
+        result = self._interp(values, indices, self.norm_distances, self.dtype)
 
         if fill_value is not None:
-            result = np.ma.array(result, mask=self.out_of_bounds, fill_value=fill_value)
+            # Mask every value for a point out of bounds, including those along any trailing dimensions
+            mask = np.broadcast_to(np.reshape(self.out_of_bounds, (-1,) + (1,) * (result.ndim - 1)), result.shape)
+            result = np.ma.array(result, mask=mask.copy(), fill_value=fill_value)
 
         return result
 
-    @staticmethod
-    def _evaluate_linear(values, indices, norm_distances):
+    def _evaluate_linear(self, values, indices, norm_distances, dtype=None):
+        """
+        Interpolate linearly, a chunk of sample points at a time. The result is allocated once and the contribution
+        of each corner of the grid cells is accumulated into it in place, so the temporary arrays are never larger
+        than a chunk.
+
+        :param ndarray values: The values on the grid, possibly with trailing dimensions
+        :param list indices: The index of the lower edge of the cell containing each point, in each dimension
+        :param list norm_distances: The normalised distance of each point from the lower edge, in each dimension
+        :param dtype: The floating point type in which to interpolate, or None to use that of the values
+        :return ndarray: The interpolated values
+        """
         from itertools import product
+        # Any mask on the values is not used, so index only the data
+        values = np.ma.getdata(values)
+        num_points = len(indices[0]) if len(indices) > 0 else 0
+        if dtype is None:
+            dtype = np.result_type(values.dtype, *[np.asarray(yi).dtype for yi in norm_distances])
+        elif np.iscomplexobj(values):
+            dtype = np.result_type(dtype, np.complex64)
         # slice for broadcasting over trailing dimensions in self.values
         vslice = (slice(None),) + (None,)*(values.ndim - len(indices))
-
-        # find relevant values
-        # each i and i+1 represents a edge
-        edges = product(*[[i, i + 1] for i in indices])
-        value = 0.
-        for edge_indices in edges:
-            weight = 1.
-            for ei, i, yi in zip(edge_indices, indices, norm_distances):
-                weight *= np.where(ei == i, 1 - yi, yi)
-            value += np.asarray(values[edge_indices]) * weight[vslice]
+        weight_dtype = np.finfo(dtype).dtype
+
+        value = np.zeros((num_points,) + values.shape[len(indices):], dtype=dtype)
+        for start in range(0, num_points, self.chunk_size):
+            stop = min(start + self.chunk_size, num_points)
+            chunk_indices = [i[start:stop] for i in indices]
+            upper_weights = [np.asarray(yi[start:stop], dtype=weight_dtype) for yi in norm_distances]
+            lower_weights = [1 - yi for yi in upper_weights]
+            chunk_value = value[start:stop]
+            corner_value = np.empty_like(chunk_value)
+            weight = np.empty(stop - start, dtype=weight_dtype)
+
+            # find relevant values
+            # each i and i+1 represents a edge
+            for edges in product(*[[0, 1]] * len(indices)):
+                weight.fill(1)
+                for edge, lower, upper in zip(edges, lower_weights, upper_weights):
+                    weight *= upper if edge else lower
+                edge_indices = tuple(i + edge for edge, i in zip(edges, chunk_indices))
+                np.multiply(np.asarray(values[edge_indices]), weight[vslice], out=corner_value, casting='same_kind')
+                chunk_value += corner_value
         return value
 
     @staticmethod
-    def _evaluate_nearest(values, indices, norm_distances):
+    def _evaluate_nearest(values, indices, norm_distances, dtype=None):
         idx_res = []
         for i, yi in zip(indices, norm_distances):
             idx_res.append(np.where(yi <= .5, i, i + 1))
-        return values[idx_res]
+        if dtype is not None:
+            return values[tuple(idx_res)].astype(dtype)
+        return values[tuple(idx_res)]
 
     @staticmethod
     def _find_indices(points, coords):
@@ -359,13 +467,43 @@ class _RegularGridInterpolator(object):
         return indices, norm_distances, out_of_bounds
 
     @staticmethod
-    def _find_vertical_index(point, coord):
-        i = np.searchsorted(coord, point) - 1
-        if i < 0:
-            i = 0
-        if i > coord.size - 2:
-            i = coord.size - 2
-        norm_distances = ((point - coord[i]) / (coord[i + 1] - coord[i]))
-
-        out_of_bounds = point < coord[0] or point > coord[-1]
+    def _find_vertical_indices(points, coords):
+        """
+        Find the vertical index and weight of each point within its own vertical column. All of the columns are
+        searched together with a binary search (the same one as np.searchsorted performs), taking the levels of any
+        decreasing column in reverse so that the index found is always that of the level on one side of the point.
+
+        :param ndarray points: The vertical coordinate of each point, of shape (N,)
+        :param ndarray coords: The vertical column for each point, of shape (N, number of levels)
+        :return: tuple of (indices of the lower edges, normalised distances from them, out of bounds flags)
+        """
+        points = np.asarray(points)
+        coords = np.asarray(coords)
+        num_points, size = coords.shape
+        rows = np.arange(num_points)
+        decreasing = coords[:, -1] < coords[:, 0]
+
+        def level(position):
+            # The position in the column of each point, counted from the top of any decreasing column
+            return np.where(decreasing, size - 1 - position, position)
+
+        # Find the number of levels below each point, as np.searchsorted(column, point) does for an increasing column
+        low = np.zeros(num_points, dtype=int)
+        high = np.full(num_points, size, dtype=int)
+        searching = low < high
+        while np.any(searching):
+            mid = low + ((high - low) >> 1)
+            below = coords[rows, level(np.minimum(mid, size - 1))] < points
+            low = np.where(searching & below, mid + 1, low)
+            high = np.where(searching & ~below, mid, high)
+            searching = low < high
+
+        i = np.clip(low - 1, 0, size - 2)
+        # Convert to the lower of the two levels either side of the point in the column's own order
+        i = np.where(decreasing, size - 2 - i, i)
+        norm_distances = (points - coords[rows, i]) / (coords[rows, i + 1] - coords[rows, i])
+
+        bottom = np.where(decreasing, coords[:, -1], coords[:, 0])
+        top = np.where(decreasing, coords[:, 0], coords[:, -1])
+        out_of_bounds = (points < bottom) | (points > top)
         return i, norm_distances, out_of_bounds
@@ -1,14 +1,50 @@
 import numpy as np
+from scipy.spatial import cKDTree
 
-from cis.collocation.kdtree import HaversineDistanceKDTree
 from cis.data_io.hyperpoint import HyperPoint
+from cis.utils import haversine_for_arrays
+
+RADIUS_EARTH = 6378.0
+
+
+def _lat_lon_to_unit_cartesian(latitudes, longitudes):
+    """Converts latitudes and longitudes to Cartesian coordinates on the unit sphere.
+
+    :param latitudes: array of latitudes in degrees
+    :param longitudes: array of longitudes in degrees
+    :return: array of shape (number of points, 3)
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def _distance_to_chord(distance):
+    """Converts a distance along the Earth's surface to the length of the chord between the two points on the unit
+    sphere.
+
+    :param distance: distance in kilometres
+    :return: chord length
+    """
+    return 2.0 * np.sin(np.minimum(distance / RADIUS_EARTH, np.pi) / 2.0)
 
 
 class HaversineDistanceKDTreeIndex(object):
     """k-D tree index that can be used to query using distance along the Earth's surface.
+
+    The points are indexed by their Cartesian coordinates on the unit sphere, for which the straight line (chord)
+    distance increases monotonically with the distance along the surface, so a compiled scipy cKDTree can be used.
     """
+    #: The number of nearest neighbours first fetched to choose from when points are equidistant
+    tie_candidates = 4
+
     def __init__(self):
         self.index = None
+        # Indices in the data of the points in the k-D tree (only the non-masked points are indexed)
+        self.data_indices = None
+        self.latitudes = None
+        self.longitudes = None
 
     def index_data(self, points, data, coord_map, leafsize=10):
         """
@@ -19,41 +55,153 @@ class HaversineDistanceKDTreeIndex(object):
         :param coord_map: (not used) list of tuples relating index in HyperPoint
                           to index in sample point coords and in coords to be output
         """
-        if len(data.data.shape) > 1:
-            # Flatten coordinates.
-            lat_idx = [key for key, value in list(data.dims_to_std_coords_map.items())
-                       if value == HyperPoint.LATITUDE][0]
-            lon_idx = [key for key, value in list(data.dims_to_std_coords_map.items())
-                       if value == HyperPoint.LONGITUDE][0]
-            flattened_coords = np.meshgrid(*data.coords, indexing='ij')
-            lat = flattened_coords[lat_idx].ravel()
-            lon = flattened_coords[lon_idx].ravel()
-        else:
-            lat = data.coords[HyperPoint.LATITUDE]
-            lon = data.coords[HyperPoint.LONGITUDE]
-        spatial_points = np.ma.empty((len(data), 2))
-        spatial_points[:, 0] = lat
-        spatial_points[:, 1] = lon
-        mask = np.ma.getmask(data.data).ravel()
-        self.index = HaversineDistanceKDTree(spatial_points, mask=mask, leafsize=leafsize)
+        coord_arrays = data.get_coord_arrays()
+        lat = coord_arrays[HyperPoint.LATITUDE]
+        lon = coord_arrays[HyperPoint.LONGITUDE]
+        self.data_indices = data.get_non_masked_indices()
+        self.latitudes = np.asarray(np.ma.getdata(lat), dtype=np.float64)[self.data_indices]
+        self.longitudes = np.asarray(np.ma.getdata(lon), dtype=np.float64)[self.data_indices]
+        self.index = cKDTree(_lat_lon_to_unit_cartesian(self.latitudes, self.longitudes), leafsize=leafsize)
+
+    def _query(self, latitudes, longitudes):
+        """Finds the indexed point nearest to each of a set of points. Where several points are at the same distance
+        the one appearing first in the data is chosen. A few of the nearest neighbours are fetched to choose from, and
+        for any point at which all of them are at the same distance more are fetched, until there is one further away
+        or every indexed point has been fetched.
+
+        :param latitudes: array of latitudes of the reference points
+        :param longitudes: array of longitudes of the reference points
+        :return: tuple of (distances in kilometres, positions in the k-D tree) - the distance is infinite (and the
+                 position is the number of indexed points) if there is no indexed point
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        nearest_distances = np.empty(latitudes.shape)
+        nearest_positions = np.empty(latitudes.shape, dtype=int)
+        remaining = np.arange(latitudes.size)
+        num_candidates = self.tie_candidates
+        while remaining.size > 0:
+            distances, positions, all_tied = self._query_candidates(latitudes[remaining], longitudes[remaining],
+                                                                    num_candidates)
+            done = ~all_tied if num_candidates < self.index.n else np.ones(remaining.shape, dtype=bool)
+            nearest_distances[remaining[done]] = distances[done]
+            nearest_positions[remaining[done]] = positions[done]
+            remaining = remaining[~done]
+            num_candidates *= 2
+        return nearest_distances, nearest_positions
+
+    def _query_candidates(self, latitudes, longitudes, num_candidates):
+        """Finds the indexed point nearest to each of a set of points, choosing between the given number of nearest
+        neighbours where several are at the same distance.
+
+        :return: tuple of (distances in kilometres, positions in the k-D tree, whether all of the neighbours fetched
+                 for each point were at the same distance)
+        """
+        _, positions = self.index.query(_lat_lon_to_unit_cartesian(latitudes, longitudes), k=num_candidates)
+        positions = positions.reshape(latitudes.size, num_candidates)
+        found = positions < self.index.n
+        distances = np.full(positions.shape, np.inf)
+        point_numbers = np.nonzero(found)[0]
+        distances[found] = haversine_for_arrays(self.latitudes[positions[found]], self.longitudes[positions[found]],
+                                                latitudes[point_numbers], longitudes[point_numbers])
+        nearest_distances = distances.min(axis=1)
+        tied = found & (distances <= nearest_distances[:, np.newaxis] * (1 + 1e-9))
+        nearest_positions = np.where(tied, positions, self.index.n).min(axis=1)
+        return nearest_distances, nearest_positions, tied.all(axis=1)
 
     def find_nearest_point(self, point):
         """Finds the indexed point nearest to a specified point.
         :param point: point for which the nearest point is required
         :return: index in data of closest point
         """
-        query_pt = [[point.latitude, point.longitude]]
-        (distances, indices) = self.index.query(query_pt)
-        if distances[0] == np.inf:
+        indices, distances = self.find_nearest_points([point.latitude], [point.longitude])
+        if indices[0] < 0:
             return None
         else:
             return indices[0]
 
+    def find_nearest_points(self, latitudes, longitudes, max_distance=None):
+        """Finds the indexed point nearest to each of a set of points.
+        :param latitudes: array of latitudes of the reference points
+        :param longitudes: array of longitudes of the reference points
+        :param max_distance: optional distance in kilometres beyond which points are not considered
+        :return: tuple of (indices in data of the closest points, distances in kilometres to them) - where there is no
+                 point (within max_distance) the index is -1 and the distance is infinite
+        """
+        distances, positions = self._query(latitudes, longitudes)
+        found = distances < np.inf
+        if max_distance is not None:
+            found &= distances <= max_distance
+        indices = np.full(len(positions), -1, dtype=int)
+        indices[found] = self.data_indices[positions[found]]
+        distances[~found] = np.inf
+        return indices, distances
+
+    def find_k_nearest_points(self, latitudes, longitudes, k, max_distance=None):
+        """Finds the k indexed points nearest to each of a set of points, with a single query of the k-D tree.
+
+        :param latitudes: array of latitudes of the reference points
+        :param longitudes: array of longitudes of the reference points
+        :param k: number of points to find for each reference point
+        :param max_distance: optional distance in kilometres beyond which points are not considered
+        :return: tuple of (indices in data of the nearest points, distances in kilometres to them), each of shape
+                 (number of reference points, k) and in order of increasing distance - where there are fewer than k
+                 points (within max_distance) the remaining indices are -1 and the distances infinite
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        upper_bound = np.inf
+        if max_distance is not None:
+            # Search slightly beyond the chord length so that no points are lost to rounding, then check the
+            # distances themselves.
+            upper_bound = _distance_to_chord(max_distance) * (1 + 1e-9) + 1e-12
+        _, positions = self.index.query(_lat_lon_to_unit_cartesian(latitudes, longitudes), k=k,
+                                        distance_upper_bound=upper_bound)
+        positions = np.asarray(positions).reshape(len(latitudes), k)
+        found = positions < self.index.n
+        point_numbers = np.nonzero(found)[0]
+        distances = np.full(positions.shape, np.inf)
+        distances[found] = haversine_for_arrays(self.latitudes[positions[found]], self.longitudes[positions[found]],
+                                                latitudes[point_numbers], longitudes[point_numbers])
+        if max_distance is not None:
+            found &= distances <= max_distance
+            distances[~found] = np.inf
+        indices = np.full(positions.shape, -1, dtype=int)
+        indices[found] = self.data_indices[positions[found]]
+        return indices, distances
+
     def find_points_within_distance(self, point, distance):
         """Finds the points within a specified distance of a specified point.
         :param point: reference point
         :param distance: distance in kilometres
         :return: list indices in data of points
         """
-        query_pt = [[point.latitude, point.longitude]]
-        return self.index.query_ball_point(query_pt, distance)[0]
+        offsets, indices = self.find_points_within_distance_in_batch([point.latitude], [point.longitude], distance)
+        return indices.tolist()
+
+    def find_points_within_distance_in_batch(self, latitudes, longitudes, distance):
+        """Finds the points within a specified distance of each of a set of points.
+        :param latitudes: array of latitudes of the reference points
+        :param longitudes: array of longitudes of the reference points
+        :param distance: distance in kilometres
+        :return: tuple of (offsets, indices) - the indices in data of the points within the distance of reference
+                 point i are indices[offsets[i]:offsets[i + 1]], in increasing order
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        num_points = len(latitudes)
+
+        # Search slightly beyond the chord length corresponding to the distance so that no points are lost to
+        # rounding, then check the candidates using the haversine distance itself.
+        chord = _distance_to_chord(distance) * (1 + 1e-9) + 1e-12
+        candidates = self.index.query_ball_point(_lat_lon_to_unit_cartesian(latitudes, longitudes), chord,
+                                                 return_sorted=True)
+        counts = np.array([len(c) for c in candidates], dtype=int)
+        positions = np.concatenate([np.zeros(0, dtype=int)] + [np.asarray(c, dtype=int) for c in candidates])
+        point_numbers = np.repeat(np.arange(num_points), counts)
+
+        within = haversine_for_arrays(self.latitudes[positions], self.longitudes[positions],
+                                      latitudes[point_numbers], longitudes[point_numbers]) <= distance
+        counts = np.bincount(point_numbers[within], minlength=num_points)
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(int)
+        return offsets, self.data_indices[positions[within]]
@@ -0,0 +1,154 @@
+"""
+Persistent on-disk cache of the indexes over data used when collocating, so that repeatedly collocating onto or from
+the same data does not rebuild the same index every time.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+#: Environment variable which may be set to the directory in which to store the cache
+ENV_CACHE_DIR = "CIS_INDEX_CACHE_DIR"
+
+#: Version of the cache format, changed whenever the way an index is stored changes
+CACHE_VERSION = 2
+
+
+class IndexCache(object):
+    """
+    Cache of indexes stored as .npz files in a directory. The files are named by a hash of the content of everything
+    the index is built from, so an index is reused whenever the same coordinates are indexed again, whichever files
+    they were read from. When the total size of the files exceeds the maximum the least recently used are removed.
+
+    Index classes which can be cached provide a to_arrays method, returning a dictionary of numpy arrays, and a
+    from_arrays class method which creates the index from such a dictionary. Only indexes which are quicker to load
+    from these arrays than to build should provide them.
+    """
+
+    def __init__(self, directory=None, max_size=2 * 1024 ** 3):
+        """
+        :param directory: directory in which to store the cache; by default the directory given by the
+         CIS_INDEX_CACHE_DIR environment variable or, if that is not set, .cache/cis/indexes in the user's home
+        :param max_size: maximum total size of the cached files in bytes
+        """
+        if directory is None:
+            directory = os.environ.get(ENV_CACHE_DIR, None) or \
+                os.path.join(os.path.expanduser('~'), '.cache', 'cis', 'indexes')
+        self.directory = directory
+        self.max_size = max_size
+
+    def get_key(self, cls, data, coords=None, coord_map=None):
+        """
+        Creates the key identifying an index from the content of everything from which it is built.
+
+        :param cls: index class
+        :param data: HyperPointView of the data to index
+        :param coords: coordinates of the grid on which the data is indexed, or None if the index does not depend on a
+         grid
+        :param coord_map: list of tuples relating index in HyperPoint to index in coords and in coords to be iterated
+         over, or None if the index does not depend on a grid
+        :return: key string
+        """
+        key_hash = hashlib.sha1()
+        key_hash.update("{} {}.{}".format(CACHE_VERSION, cls.__module__, cls.__name__).encode('utf-8'))
+        key_hash.update(repr(sorted(getattr(data, 'dims_to_std_coords_map', {}).items())).encode('utf-8'))
+        for coord in data.coords:
+            _update_hash_with_array(key_hash, coord)
+        _update_hash_with_array(key_hash, np.ma.getmaskarray(data.data))
+        if coord_map is not None:
+            key_hash.update(repr(coord_map).encode('utf-8'))
+            for (hpi, ci, shi) in coord_map:
+                _update_hash_with_array(key_hash, coords[ci].points)
+                _update_hash_with_array(key_hash, coords[ci].bounds)
+        return key_hash.hexdigest()
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def load(self, key, cls):
+        """
+        Loads an index from the cache.
+
+        :param key: key of the index
+        :param cls: index class
+        :return: the index, or None if it is not in the cache
+        """
+        path = self._get_path(key)
+        try:
+            with np.load(path, allow_pickle=False) as arrays:
+                index = cls.from_arrays(dict(arrays.items()))
+            # Mark the file as recently used.
+            os.utime(path, None)
+        except (IOError, OSError, ValueError, KeyError, EOFError) as e:
+            if os.path.exists(path):
+                logging.warning("Unable to read cached index {}: {}".format(path, e))
+            return None
+        logging.info("Using cached index " + path)
+        return index
+
+    def save(self, key, index):
+        """
+        Saves an index to the cache, then removes the least recently used indexes if the cache is too large. Failure
+        to write to the cache is not an error, since the index can always be rebuilt.
+
+        :param key: key of the index
+        :param index: index providing to_arrays
+        """
+        path = self._get_path(key)
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            # Write to a temporary file and rename it so that no other process can read a partly written index.
+            handle, temp_path = tempfile.mkstemp(suffix='.npz.tmp', dir=self.directory)
+            try:
+                with os.fdopen(handle, 'wb') as temp_file:
+                    np.savez(temp_file, **index.to_arrays())
+                os.rename(temp_path, path)
+            except:
+                os.remove(temp_path)
+                raise
+        except (IOError, OSError) as e:
+            logging.warning("Unable to write index to the cache in {}: {}".format(self.directory, e))
+            return
+        self._evict()
+
+    def _evict(self):
+        """
+        Removes the least recently used files until the total size of the cache is within the maximum.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    # Removed by another process
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total_size -= size
+
+
+def _update_hash_with_array(key_hash, array):
+    """
+    Adds the shape, type and content of an array (which may be None) to a hash.
+    """
+    if array is None:
+        key_hash.update(b'None')
+        return
+    array = np.ma.getdata(array)
+    if array.dtype == object:
+        from cis.time_util import convert_datetime_to_std_time
+        array = np.asarray(convert_datetime_to_std_time(array), dtype=np.float64)
+    array = np.ascontiguousarray(array)
+    key_hash.update("{} {}".format(array.shape, array.dtype.str).encode('utf-8'))
+    key_hash.update(array.view(np.uint8).ravel() if array.size > 0 else b'')
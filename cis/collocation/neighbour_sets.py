@@ -0,0 +1,238 @@
+"""
+Sets of the data points found by a constraint for each sample point, held as compressed sparse row (CSR) arrays so that
+they can be computed in batch once and then reused by every kernel and variable collocated from the same data onto the
+same sample points.
+"""
+from collections import OrderedDict
+import hashlib
+import logging
+import tempfile
+
+import numpy as np
+
+from cis.collocation.index_cache import _update_hash_with_array
+
+#: Default maximum number of bytes of neighbour sets to hold in memory, beyond which they are spilled to disk
+DEFAULT_MAX_MEMORY = 1024 ** 3
+
+#: Default maximum number of neighbour sets to keep in a store
+DEFAULT_MAX_SETS = 4
+
+
+class NeighbourSets(object):
+    """
+    The data points constrained for each of a set of sample points, in CSR form: the indices in the data of the points
+    for sample point i are indices[offsets[i]:offsets[i + 1]]. When the indices would take more memory than allowed
+    they are written to a temporary file which is memory-mapped, so that only the parts being used are read into
+    memory.
+    """
+
+    def __init__(self, offsets, indices, spill_file=None):
+        """
+        :param offsets: integer array of the start of the set for each sample point, the last element being the total
+         number of indices
+        :param indices: array (or memory-mapped array) of indices in the data
+        :param spill_file: the temporary file holding the indices if they are memory-mapped, which is removed when it
+         is closed
+        """
+        self.offsets = offsets
+        self.indices = indices
+        self._spill_file = spill_file
+
+    @classmethod
+    def from_blocks(cls, num_samples, blocks, results, max_memory=DEFAULT_MAX_MEMORY):
+        """
+        Creates the neighbour sets from the sets found for blocks of sample points, writing the indices to a
+        memory-mapped file as soon as they exceed the maximum memory.
+
+        :param num_samples: total number of sample points; the sets of any not in a block are empty
+        :param blocks: list of arrays of sample indices, in increasing order both within and between blocks
+        :param results: iterable of the (offsets, indices) found for each block
+        :param max_memory: maximum number of bytes of indices to hold in memory
+        :return: NeighbourSets
+        """
+        counts = np.zeros(num_samples, dtype=int)
+        kept, kept_size, spill_file = [], 0, None
+        for block, (block_offsets, block_indices) in zip(blocks, results):
+            counts[block] = np.diff(block_offsets)
+            block_indices = np.asarray(block_indices, dtype=np.int64)
+            if spill_file is None and kept_size + block_indices.nbytes > max_memory:
+                logging.info("    Neighbour sets exceed {} bytes, spilling them to disk".format(max_memory))
+                spill_file = tempfile.TemporaryFile(suffix='.neighbours')
+                for array in kept:
+                    array.tofile(spill_file)
+                kept = []
+            if spill_file is None:
+                kept.append(block_indices)
+                kept_size += block_indices.nbytes
+            else:
+                block_indices.tofile(spill_file)
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(int)
+        if spill_file is None:
+            indices = np.concatenate([np.zeros(0, dtype=np.int64)] + kept)
+        else:
+            spill_file.flush()
+            if offsets[-1] > 0:
+                indices = np.memmap(spill_file, dtype=np.int64, mode='r', shape=(offsets[-1],))
+            else:
+                indices = np.zeros(0, dtype=np.int64)
+        return cls(offsets, indices, spill_file)
+
+    @property
+    def spilled(self):
+        """
+        True if the indices are held in a memory-mapped file rather than in memory
+        """
+        return self._spill_file is not None
+
+    @property
+    def nbytes(self):
+        """
+        The number of bytes of memory taken by the sets (not counting any indices spilled to disk)
+        """
+        return self.offsets.nbytes + (0 if self.spilled else self.indices.nbytes)
+
+    def get_groups(self, sample_indices):
+        """
+        Gets the sets for some of the sample points.
+
+        :param sample_indices: array of indices of the sample points
+        :return: tuple of (offsets, indices) - the data points for sample_indices[i] are
+         indices[offsets[i]:offsets[i + 1]]
+        """
+        starts = self.offsets[sample_indices]
+        counts = self.offsets[np.asarray(sample_indices) + 1] - starts
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(int)
+        positions = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+        return offsets, np.asarray(self.indices[positions], dtype=int)
+
+    def close(self):
+        """
+        Removes any file to which the sets were spilled; the sets may not be used afterwards.
+        """
+        if self._spill_file is not None:
+            self.indices = None
+            self._spill_file.close()
+            self._spill_file = None
+
+
+class NeighbourSetStore(object):
+    """
+    Store of the neighbour sets computed while collocating, so that collocating the same data onto the same sample
+    points with the same constraint, for example with a different kernel, does not apply the constraint again. At most
+    a maximum number of sets are kept, and they are held in memory up to a maximum total size; the least recently used
+    sets are removed to keep within both. A set which would on its own take more than the maximum memory is spilled to
+    a memory-mapped file instead.
+    """
+
+    def __init__(self, max_memory=DEFAULT_MAX_MEMORY, max_sets=DEFAULT_MAX_SETS):
+        """
+        :param max_memory: maximum total number of bytes of sets to hold in memory
+        :param max_sets: maximum number of sets to keep
+        """
+        self.max_memory = max_memory
+        self.max_sets = max_sets
+        self._sets = OrderedDict()
+
+    @property
+    def memory_used(self):
+        """
+        The number of bytes of memory taken by the sets in the store
+        """
+        return sum(neighbour_sets.nbytes for neighbour_sets in self._sets.values())
+
+    def get_memory_available(self):
+        """
+        :return: the number of bytes of memory which may be taken by the next set added, which is the maximum since
+         older sets are removed to make room for it
+        """
+        return self.max_memory
+
+    @staticmethod
+    def get_key(parameters, sample_coords, sample_indices, data_coords, data_indices):
+        """
+        Creates the key identifying a set from the content of everything from which it is found.
+
+        :param parameters: tuple of the class and parameters of the constraint
+        :param sample_coords: list of flattened coordinate arrays (in HyperPoint order, None where a coordinate is not
+         present) of all of the sample points
+        :param sample_indices: indices of the sample points collocated onto
+        :param data_coords: list of flattened coordinate arrays (in HyperPoint order, None where a coordinate is not
+         present) of all of the data points
+        :param data_indices: indices of the data points which may be found
+        :return: key string
+        """
+        key_hash = hashlib.sha1()
+        key_hash.update(repr(parameters).encode('utf-8'))
+        for array in list(sample_coords) + [sample_indices] + list(data_coords) + [data_indices]:
+            _update_hash_with_array(key_hash, array)
+        return key_hash.hexdigest()
+
+    def get(self, key):
+        """
+        :param key: key of the set
+        :return: the NeighbourSets stored with the key, or None if there are none
+        """
+        neighbour_sets = self._sets.pop(key, None)
+        if neighbour_sets is not None:
+            # Mark the set as the most recently used.
+            self._sets[key] = neighbour_sets
+        return neighbour_sets
+
+    def add(self, key, neighbour_sets):
+        """
+        Adds a set to the store, then removes the least recently used sets if there are too many or they take too much
+        memory. The set added is always kept.
+
+        :param key: key of the set
+        :param neighbour_sets: NeighbourSets to store
+        """
+        old_sets = self._sets.pop(key, None)
+        if old_sets is not None and old_sets is not neighbour_sets:
+            old_sets.close()
+        self._sets[key] = neighbour_sets
+        while len(self._sets) > 1 and (len(self._sets) > self.max_sets or self.memory_used > self.max_memory):
+            _, evicted_sets = self._sets.popitem(last=False)
+            evicted_sets.close()
+
+    def clear(self):
+        """
+        Removes all of the sets from the store, including any spilled to disk.
+        """
+        for neighbour_sets in self._sets.values():
+            neighbour_sets.close()
+        self._sets.clear()
+
+
+# Store of neighbour sets for reuse, or None if they are found afresh for every collocation
+_store = None
+
+
+def enable_neighbour_set_store(max_memory=DEFAULT_MAX_MEMORY, max_sets=DEFAULT_MAX_SETS):
+    """
+    Keeps the neighbour sets found when collocating, so that they can be reused by later collocations of the same data
+    onto the same sample points.
+
+    :param max_memory: maximum number of bytes of sets to hold in memory
+    :param max_sets: maximum number of sets to keep
+    """
+    global _store
+    disable_neighbour_set_store()
+    _store = NeighbourSetStore(max_memory, max_sets)
+
+
+def disable_neighbour_set_store():
+    """
+    Stops keeping neighbour sets, removing any already kept.
+    """
+    global _store
+    if _store is not None:
+        _store.clear()
+    _store = None
+
+
+def get_neighbour_set_store():
+    """
+    :return: the NeighbourSetStore in use, or None if neighbour sets are not being kept
+    """
+    return _store
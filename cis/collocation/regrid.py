@@ -0,0 +1,386 @@
+"""
+Regridding of gridded data between rectilinear grids. The interpolation is separable, so the indices and weights along
+each axis are calculated once for a pair of source and target grids and then applied to any number of variables on the
+source grid, one axis at a time. Conservative regridding between latitude-longitude grids uses a sparse matrix of the
+overlaps between the cells of the two grids, which is likewise calculated once and applied to every horizontal slice.
+"""
+import hashlib
+import logging
+
+import numpy as np
+
+from cis.collocation.index_cache import _update_hash_with_array
+
+#: Version of the way the weights are stored, changed whenever it changes so that cached weights are not reused
+WEIGHTS_VERSION = 1
+
+
+class RectilinearRegridder(object):
+    """
+    Interpolates values from a rectilinear source grid onto a rectilinear target grid. Along each axis interpolated the
+    value at each target point is a weighted sum of the values at a few source points (two for linear interpolation,
+    one for nearest neighbour), so interpolating an array is a contraction with the weights along each axis in turn.
+    """
+
+    def __init__(self, axes):
+        """
+        :param axes: list of the tuple (indices, weights, out_of_bounds) for each axis interpolated: the value at
+         target point i is the sum of weights[i, k] * value[indices[i, k]] and is out of bounds if out_of_bounds[i]
+        """
+        self.axes = axes
+
+    @classmethod
+    def from_coords(cls, source_coords, target_points, method='linear', extrapolate=False):
+        """
+        Calculates the indices and weights for interpolating between the coordinates.
+
+        :param source_coords: list of the one dimensional source coordinates to interpolate over
+        :param target_points: list of arrays of the points of the target grid along each of those coordinates
+        :param str method: The interpolation method to use (either 'linear' or 'nearest'). Default is 'linear'.
+        :param bool extrapolate: Extrapolate points outside the bounds of the source? Default False, in which case they
+         are masked.
+        :return: RectilinearRegridder
+        """
+        axes = []
+        for coord, points in zip(source_coords, target_points):
+            axes.append(_get_axis_weights(coord.points, points, method, extrapolate, coord.units.modulus,
+                                          getattr(coord, 'circular', False)))
+        return cls(axes)
+
+    @property
+    def shape(self):
+        """
+        The shape of the target grid
+        """
+        return tuple(len(indices) for indices, _, _ in self.axes)
+
+    def to_arrays(self):
+        """
+        :return: dictionary of the arrays making up the regridder, from which it can be recreated with from_arrays
+        """
+        arrays = {}
+        for i, (indices, weights, out_of_bounds) in enumerate(self.axes):
+            arrays['indices_{}'.format(i)] = indices
+            arrays['weights_{}'.format(i)] = weights
+            arrays['out_of_bounds_{}'.format(i)] = out_of_bounds
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        :param arrays: dictionary of arrays returned by to_arrays
+        :return: the regridder
+        """
+        axes = []
+        while 'indices_{}'.format(len(axes)) in arrays:
+            i = len(axes)
+            axes.append((arrays['indices_{}'.format(i)], arrays['weights_{}'.format(i)],
+                         arrays['out_of_bounds_{}'.format(i)]))
+        return cls(axes)
+
+    def __call__(self, values, dims):
+        """
+        Interpolates values on the source grid onto the target grid.
+
+        :param values: array (possibly masked) of values on the source grid
+        :param dims: the dimension of values along which each of the coordinates lies
+        :return: array of the interpolated values, masked where the values are missing or out of bounds
+        """
+        data = np.ma.getdata(values)
+        mask = np.ma.getmask(values)
+        linear = any(weights.shape[1] > 1 for _, weights, _ in self.axes)
+        if linear and not np.issubdtype(data.dtype, np.inexact):
+            data = data.astype(float)
+        if mask is not np.ma.nomask:
+            # The mask is interpolated along with the values, and any target point to which a masked value contributes
+            # is masked
+            mask = mask.astype(float)
+
+        out_of_bounds = np.zeros(len(values.shape) * (1,), dtype=bool)
+        for (indices, weights, axis_out_of_bounds), dim in zip(self.axes, dims):
+            data = _contract(data, dim, indices, weights)
+            if mask is not np.ma.nomask:
+                mask = _contract(mask, dim, indices, weights)
+            if axis_out_of_bounds.any():
+                shape = [1] * data.ndim
+                shape[dim] = -1
+                out_of_bounds = out_of_bounds | axis_out_of_bounds.reshape(shape)
+
+        if mask is not np.ma.nomask or out_of_bounds.any():
+            new_mask = np.broadcast_to(out_of_bounds, data.shape)
+            if mask is not np.ma.nomask:
+                new_mask = new_mask | (mask > 0)
+            return np.ma.array(data, mask=new_mask)
+        return data
+
+
+def _contract(values, dim, indices, weights):
+    """
+    Contracts an array with the weights along one dimension.
+
+    :param values: array of values
+    :param dim: dimension to contract along
+    :param indices: array of shape (target points, source points per target point) of indices along the dimension
+    :param weights: array of the weight of each of those source points
+    :return: array with the dimension replaced by one of the target points
+    """
+    shape = [1] * values.ndim
+    shape[dim] = -1
+    if weights.shape[1] == 1:
+        return np.take(values, indices[:, 0], axis=dim)
+    result = np.take(values, indices[:, 0], axis=dim) * weights[:, 0].reshape(shape)
+    for k in range(1, weights.shape[1]):
+        result += np.take(values, indices[:, k], axis=dim) * weights[:, k].reshape(shape)
+    return result
+
+
+def _get_axis_weights(source, target, method, extrapolate, modulus=None, circular=False):
+    """
+    Calculates the indices and weights for interpolating along one axis.
+
+    :param source: the (monotonic) points of the source coordinate
+    :param target: the points to interpolate to
+    :param str method: 'linear' or 'nearest'
+    :param bool extrapolate: Extrapolate points outside the bounds of the source?
+    :param modulus: the modulus of the source coordinate (such as 360 for longitudes), or None if it has none
+    :param bool circular: Does the source coordinate wrap around from its last point to its first?
+    :return: tuple of (indices, weights, out_of_bounds) as described for RectilinearRegridder
+    """
+    if method == 'nearest' and np.issubdtype(np.asarray(source).dtype, np.integer):
+        # Points to look up on an integer coordinate are truncated to integers, as Iris does
+        target = np.asarray(target).astype(np.asarray(source).dtype)
+    source = np.asarray(source, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    size = source.size
+    # Work with increasing points, mapping the indices back at the end
+    decreasing = size > 1 and source[1] < source[0]
+    if decreasing:
+        source = source[::-1]
+    if circular and modulus and size > 0:
+        # Add a copy of the first point at the end, so that no point between the last and first is out of bounds
+        source = np.append(source, source[0] + modulus)
+    if modulus and size > 0:
+        # Wrap the points into the range of one modulus centred on the source points, as Iris does
+        offset = 0.5 * (source[0] + source[-1] - modulus)
+        target = offset + np.mod(target - offset, modulus)
+
+    if source.size == 1:
+        lower = np.zeros(target.shape, dtype=int)
+        fraction = np.zeros(target.shape)
+    else:
+        lower = np.clip(np.searchsorted(source, target) - 1, 0, source.size - 2)
+        fraction = (target - source[lower]) / (source[lower + 1] - source[lower])
+    out_of_bounds = (target < source[0]) | (target > source[-1])
+
+    if method == 'nearest':
+        indices = lower if source.size == 1 else np.where(fraction <= 0.5, lower, lower + 1)
+        indices = indices[:, np.newaxis]
+        weights = np.ones(indices.shape)
+    elif source.size == 1:
+        indices = lower[:, np.newaxis]
+        weights = np.ones(indices.shape)
+    else:
+        indices = np.column_stack((lower, lower + 1))
+        weights = np.column_stack((1 - fraction, fraction))
+
+    if circular and modulus:
+        indices = np.mod(indices, size)
+    if decreasing:
+        indices = size - 1 - indices
+    if extrapolate:
+        out_of_bounds = np.zeros(target.shape, dtype=bool)
+    return indices, weights, out_of_bounds
+
+
+class ConservativeRegridder(object):
+    """
+    Regrids values between the horizontal cells of two latitude-longitude grids, conserving their area-weighted
+    integral. The value of each target cell is the mean of the values of the source cells it overlaps, weighted by the
+    area on the sphere of each overlap. The overlaps are held as a sparse matrix, so regridding every horizontal slice
+    of an array (at each time, level and so on) is a single sparse matrix multiplication.
+    """
+
+    def __init__(self, weights, target_areas, shape):
+        """
+        :param weights: scipy.sparse CSR matrix of the area of the overlap of each target cell (row) with each source
+         cell (column), with the cells of each grid numbered along latitude then longitude
+        :param target_areas: array of the area of each target cell, in the same units as the weights
+        :param shape: the (latitude, longitude) shape of the target grid
+        """
+        self.weights = weights
+        self.target_areas = target_areas
+        self.shape = tuple(shape)
+
+    @classmethod
+    def from_coords(cls, source_coords, target_coords):
+        """
+        Calculates the overlaps between the cells of two grids.
+
+        :param source_coords: the (latitude, longitude) coordinates, with bounds, of the source grid
+        :param target_coords: the (latitude, longitude) coordinates, with bounds, of the target grid
+        :return: ConservativeRegridder
+        """
+        import scipy.sparse
+        (source_lat, source_lon), (target_lat, target_lon) = source_coords, target_coords
+        # Area of a cell on the unit sphere is (sin(upper latitude) - sin(lower latitude)) * (longitude width in
+        # radians), so the overlap of two cells is the product of their overlaps in sin(latitude) and in longitude.
+        lat_weights = _get_overlaps(*(np.sin(np.radians(np.clip(np.sort(coord.bounds, axis=1), -90, 90)))
+                                      for coord in (source_lat, target_lat)))
+        lon_weights = _get_overlaps(*(np.radians(np.sort(coord.bounds, axis=1)) for coord in (source_lon, target_lon)),
+                                    modulus=2 * np.pi if target_lon.units.modulus else None)
+        weights = scipy.sparse.kron(scipy.sparse.csr_matrix(lat_weights), scipy.sparse.csr_matrix(lon_weights),
+                                    format='csr')
+        lat_sizes = np.diff(np.sin(np.radians(np.clip(np.sort(target_lat.bounds, axis=1), -90, 90))), axis=1)
+        lon_sizes = np.diff(np.radians(np.sort(target_lon.bounds, axis=1)), axis=1)
+        target_areas = np.outer(lat_sizes, lon_sizes).ravel()
+        return cls(weights, target_areas, (len(target_lat.points), len(target_lon.points)))
+
+    def to_arrays(self):
+        """
+        :return: dictionary of the arrays making up the regridder, from which it can be recreated with from_arrays
+        """
+        return {'data': self.weights.data, 'indices': self.weights.indices, 'indptr': self.weights.indptr,
+                'weights_shape': np.array(self.weights.shape), 'target_areas': self.target_areas,
+                'shape': np.array(self.shape)}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        :param arrays: dictionary of arrays returned by to_arrays
+        :return: the regridder
+        """
+        import scipy.sparse
+        weights = scipy.sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                                          shape=tuple(arrays['weights_shape']))
+        return cls(weights, arrays['target_areas'], arrays['shape'])
+
+    def __call__(self, values, dims, mdtol=0):
+        """
+        Regrids values on the source grid onto the target grid.
+
+        :param values: array (possibly masked) of values on the source grid
+        :param dims: the dimensions of values along which the latitude and longitude lie
+        :param float mdtol: The largest fraction of the area of a target cell which may be missing (either masked or
+         outside the source grid) for it to be given a value. Default 0, so that any missing part masks the cell.
+        :return: masked array of the regridded values, with the latitude and longitude dimensions in the same positions
+        """
+        # Each column is a horizontal slice, so the weights are applied to all of them at once
+        values = np.moveaxis(values, dims, (0, 1))
+        other_shape = values.shape[2:]
+        data = np.ma.getdata(values).reshape(self.weights.shape[1], -1)
+        mask = np.ma.getmask(values)
+        if mask is np.ma.nomask:
+            totals = self.weights.dot(data)
+            valid_areas = np.asarray(self.weights.sum(axis=1))
+        else:
+            valid = ~mask.reshape(data.shape)
+            totals = self.weights.dot(np.where(valid, data, 0))
+            valid_areas = self.weights.dot(valid.astype(float))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = totals / valid_areas
+        missing = 1 - valid_areas / self.target_areas[:, np.newaxis] > mdtol + 1e-9
+        result = np.ma.array(result, mask=np.broadcast_to(missing | (valid_areas <= 0), result.shape).copy())
+
+        result = result.reshape(self.shape + other_shape)
+        return np.moveaxis(result, (0, 1), dims)
+
+
+def _get_overlaps(source_bounds, target_bounds, modulus=None):
+    """
+    Calculates the length of the overlap of each target interval with each source interval.
+
+    :param source_bounds: array of shape (source intervals, 2) of the lower and upper bounds of each interval
+    :param target_bounds: array of shape (target intervals, 2) of the lower and upper bounds of each interval
+    :param modulus: the modulus of the coordinate, or None if it has none, in which case intervals a whole number of
+     moduli apart also overlap
+    :return: array of shape (target intervals, source intervals)
+    """
+    shifts = [-modulus, 0, modulus] if modulus else [0]
+    overlaps = np.zeros((len(target_bounds), len(source_bounds)))
+    for shift in shifts:
+        lower = np.maximum(target_bounds[:, 0:1], source_bounds[:, 0] + shift)
+        upper = np.minimum(target_bounds[:, 1:2], source_bounds[:, 1] + shift)
+        overlaps += np.maximum(upper - lower, 0)
+    return overlaps
+
+
+def _get_key(source_coords, target_points, method, extrapolate):
+    """
+    Creates the key identifying a regridder from everything from which it is calculated.
+    """
+    key_hash = hashlib.sha1()
+    key_hash.update("{} {}.{} {} {}".format(WEIGHTS_VERSION, RectilinearRegridder.__module__,
+                                            RectilinearRegridder.__name__, method, extrapolate).encode('utf-8'))
+    for coord, points in zip(source_coords, target_points):
+        key_hash.update(repr((coord.units.modulus, getattr(coord, 'circular', False))).encode('utf-8'))
+        _update_hash_with_array(key_hash, coord.points)
+        _update_hash_with_array(key_hash, np.asarray(points))
+    return key_hash.hexdigest()
+
+
+# The key and regridder most recently used, which are reused while collocating many files on the same grid
+_last_regridder = (None, None)
+
+
+def _get_cached_regridder(key, cls, create):
+    """
+    Gets a regridder, reusing the one last used if it has the same key, or loading it from the persistent index cache
+    if that is enabled, and otherwise creating it (and storing it in the cache).
+
+    :param key: key identifying the regridder
+    :param cls: regridder class, which provides to_arrays and from_arrays
+    :param create: function of no arguments which creates the regridder
+    :return: the regridder
+    """
+    from cis.collocation.data_index import get_index_cache
+    global _last_regridder
+    if _last_regridder[0] == key:
+        return _last_regridder[1]
+
+    cache = get_index_cache()
+    regridder = None
+    if cache is not None:
+        regridder = cache.load(key, cls)
+    if regridder is None:
+        logging.info("--> Calculating regridding weights")
+        regridder = create()
+        if cache is not None:
+            cache.save(key, regridder)
+    _last_regridder = (key, regridder)
+    return regridder
+
+
+def get_regridder(source_coords, target_points, method='linear', extrapolate=False):
+    """
+    Gets the regridder between two grids, reusing the one last used if the grids are the same, or loading it from the
+    persistent index cache if that is enabled.
+
+    :param source_coords: list of the one dimensional source coordinates to interpolate over
+    :param target_points: list of arrays of the points of the target grid along each of those coordinates
+    :param str method: The interpolation method to use (either 'linear' or 'nearest'). Default is 'linear'.
+    :param bool extrapolate: Extrapolate points outside the bounds of the source? Default False.
+    :return: RectilinearRegridder
+    """
+    key = _get_key(source_coords, target_points, method, extrapolate)
+    return _get_cached_regridder(key, RectilinearRegridder, lambda: RectilinearRegridder.from_coords(
+        source_coords, target_points, method, extrapolate))
+
+
+def get_conservative_regridder(source_coords, target_coords):
+    """
+    Gets the conservative regridder between the horizontal cells of two grids, reusing the one last used if the grids
+    are the same, or loading it from the persistent index cache if that is enabled.
+
+    :param source_coords: the (latitude, longitude) coordinates, with bounds, of the source grid
+    :param target_coords: the (latitude, longitude) coordinates, with bounds, of the target grid
+    :return: ConservativeRegridder
+    """
+    key_hash = hashlib.sha1()
+    key_hash.update("{} {}.{}".format(WEIGHTS_VERSION, ConservativeRegridder.__module__,
+                                      ConservativeRegridder.__name__).encode('utf-8'))
+    for coord in list(source_coords) + list(target_coords):
+        key_hash.update(repr(coord.units.modulus).encode('utf-8'))
+        _update_hash_with_array(key_hash, coord.bounds)
+    return _get_cached_regridder(key_hash.hexdigest(), ConservativeRegridder,
+                                 lambda: ConservativeRegridder.from_coords(source_coords, target_coords))
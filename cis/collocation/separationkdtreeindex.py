@@ -0,0 +1,91 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from cis.data_io.hyperpoint import HyperPoint
+from cis.collocation.haversinedistancekdtreeindex import _lat_lon_to_unit_cartesian, _distance_to_chord
+
+
+class SeparationKDTreeIndex(object):
+    """k-D tree index over the horizontal position, altitude, pressure and time of points, with each dimension scaled by
+    the corresponding separation so that the points within all of the separations of a reference point lie within a
+    unit box around it.
+
+    The horizontal position is represented by Cartesian coordinates on the unit sphere, scaled by the chord length
+    corresponding to the horizontal separation, and the pressure by its logarithm, scaled by the logarithm of the
+    pressure ratio. The box contains every point satisfying the separations, but may contain others as well, so the
+    candidates returned should be checked against the separations themselves.
+    """
+    def __init__(self, h_sep=None, a_sep=None, p_sep=None, t_sep=None):
+        """
+        :param h_sep: horizontal separation in kilometres (or None)
+        :param a_sep: altitude separation in metres (or None)
+        :param p_sep: pressure ratio separation, greater than one (or None)
+        :param t_sep: time separation in days (or None)
+        """
+        self.h_sep = h_sep
+        self.a_sep = a_sep
+        self.p_sep = p_sep
+        self.t_sep = t_sep
+        self.index = None
+        # Indices in the data of the points in the k-D tree
+        self.data_indices = None
+
+    def _get_scaled_coords(self, coords):
+        """
+        Converts coordinates to the scaled coordinates of the k-D tree.
+
+        :param coords: List of flattened coordinate arrays in HyperPoint order
+        :return: array of shape (number of points, number of dimensions)
+        """
+        columns = []
+        if self.h_sep is not None:
+            chord = _distance_to_chord(self.h_sep)
+            columns.append(_lat_lon_to_unit_cartesian(coords[HyperPoint.LATITUDE], coords[HyperPoint.LONGITUDE]) /
+                           chord)
+        if self.a_sep is not None:
+            columns.append(_as_float_column(coords[HyperPoint.ALTITUDE]) / self.a_sep)
+        if self.p_sep is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                columns.append(np.log(_as_float_column(coords[HyperPoint.AIR_PRESSURE])) / np.log(self.p_sep))
+        if self.t_sep is not None:
+            columns.append(_as_float_column(coords[HyperPoint.TIME]) / self.t_sep)
+        return np.hstack(columns)
+
+    def index_data(self, data_coords, data_indices, leafsize=10):
+        """
+        Creates the k-D tree index.
+
+        :param data_coords: List of flattened coordinate arrays (in HyperPoint order) for all of the data points
+        :param data_indices: Indices of the data points to index
+        """
+        scaled_coords = self._get_scaled_coords([(c[data_indices] if c is not None else None) for c in data_coords])
+        # Points with invalid coordinates can never satisfy the separations.
+        valid = np.all(np.isfinite(scaled_coords), axis=1)
+        self.data_indices = np.asarray(data_indices)[valid]
+        self.index = cKDTree(scaled_coords[valid], leafsize=leafsize)
+
+    def find_candidate_points_in_batch(self, sample_coords):
+        """Finds the points which may be within the separations of each of a set of points.
+
+        :param sample_coords: List of flattened coordinate arrays (in HyperPoint order) for the reference points
+        :return: tuple of (offsets, indices) - the indices in data of the candidate points for reference point i are
+                 indices[offsets[i]:offsets[i + 1]], in increasing order
+        """
+        scaled_coords = self._get_scaled_coords(sample_coords)
+        valid = np.flatnonzero(np.all(np.isfinite(scaled_coords), axis=1))
+        counts = np.zeros(len(scaled_coords), dtype=int)
+        positions = np.zeros(0, dtype=int)
+        if len(valid) > 0:
+            # Allow a little extra in the search so that no points are lost to rounding.
+            candidates = self.index.query_ball_point(scaled_coords[valid], 1 + 1e-6, p=np.inf, return_sorted=True)
+            counts[valid] = [len(c) for c in candidates]
+            positions = np.concatenate([positions] + [np.asarray(c, dtype=int) for c in candidates])
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(int)
+        return offsets, self.data_indices[positions]
+
+
+def _as_float_column(values):
+    """
+    Converts an array, which may be masked, to a column of floats with NaN for masked values.
+    """
+    return np.ma.filled(np.ma.asarray(values, dtype=np.float64), np.nan).reshape(-1, 1)
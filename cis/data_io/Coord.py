@@ -31,6 +31,9 @@ class Coord(LazyData):
         """
         super(Coord, self).__init__(data, metadata, data_retrieval_callback)
         self.axis = axis.upper()
+        # The start of the longitude range to which the data was last confined, and the data it was confined in
+        self._longitude_range_start = None
+        self._longitude_range_data = None
         # Fix an issue where cf_units cannot parse units 'deg' (should be degrees).
         if isinstance(self.units, str) and self.units == 'deg':
             self.units = 'degrees'
@@ -91,10 +94,18 @@ class Coord(LazyData):
         """
         Confine the coordinate longitude range to 360 degrees from the :attr:`range_start` value.
 
+        The values are changed in place where the data allows it, and are left alone if they already lie in the
+        range. The range is remembered so that confining the coordinate to it again does nothing, until the data is
+        replaced.
+
         :param float range_start: Start of the longitude range
         """
-        self._data = fix_longitude_range(self._data, range_start)
+        if self._longitude_range_start == range_start and self._longitude_range_data is self._data:
+            return
+        self._data = fix_longitude_range(self.data, range_start, in_place=True)
         self._data_flattened = None
+        self._longitude_range_start = range_start
+        self._longitude_range_data = self._data
 
     def copy(self):
         """
@@ -1,8 +1,10 @@
 from abc import ABCMeta, abstractmethod
+import datetime
 
 import numpy as np
 
-from cis.data_io.hyperpoint import HyperPoint
+from cis.data_io.hyperpoint import HyperPoint, HyperPointList
+from cis.time_util import convert_datetime_to_std_time
 import cis.utils
 
 
@@ -55,6 +57,42 @@ class HyperPointView(object):
     def __setitem__(self, key, value):
         pass
 
+    @abstractmethod
+    def get_coord_arrays(self):
+        """Gets the coordinates of all of the points as flattened arrays, so that they can be used together without
+        creating a HyperPoint for each point. Times are converted to standard time. The list is kept by the view and
+        should not be modified.
+        :return: list of 1D coordinate arrays in HyperPoint order, with None for any coordinate not present
+        """
+        pass
+
+    def get_value_array(self):
+        """Gets the data values of all of the points as a flattened array, which is a view of the data where possible.
+        :return: 1D masked array of values, or None if there are no values
+        """
+        return np.ma.ravel(self.data) if self.data is not None else None
+
+    def get_non_masked_indices(self):
+        """Gets the indices of the non-masked points in the flattened arrays.
+        :return: 1D integer array of indices
+        """
+        if self.data is None:
+            return np.arange(len(self))
+        return np.flatnonzero(~np.ma.getmaskarray(self.data).ravel())
+
+    def get_points(self, indices):
+        """Gets the points at a set of indices in the flattened arrays, taking the coordinates and values of all of them
+        from the coordinate and value arrays at once rather than looking up each point in turn.
+        :param indices: 1D integer array of indices
+        :return: HyperPointList of the points
+        """
+        num_points = len(indices)
+        columns = [(_to_list(coord[indices]) if coord is not None else [None] * num_points)
+                   for coord in self.get_coord_arrays()]
+        values = self.get_value_array()
+        columns.append(_to_list(values[indices]) if values is not None else [None] * num_points)
+        return HyperPointList(HyperPoint(*point) for point in zip(*columns))
+
 
 class UngriddedHyperPointView(HyperPointView):
     """
@@ -73,6 +111,11 @@ class UngriddedHyperPointView(HyperPointView):
         # Data and all coordinates should have the same size.
         self.length = coords[0].size
         self.non_masked_iteration = non_masked_iteration
+        self._coord_arrays = None
+        # The start of the longitude range to which the longitudes were last confined, and whether the view has its
+        # own copy of the longitudes rather than sharing those of the data
+        self._longitude_range_start = None
+        self._owns_longitudes = False
 
     def __getitem__(self, item):
         if isinstance(item, slice):
@@ -145,24 +188,41 @@ class UngriddedHyperPointView(HyperPointView):
                 if coord is not None:
                     coord[key] = val
             self.data[key] = value[HyperPoint.number_standard_names][0]
+            self._coord_arrays = None
+            self._longitude_range_start = None
         else:
             self.data[key] = value
 
+    def get_coord_arrays(self):
+        """Gets the coordinates of all of the points as flattened arrays, so that they can be used together without
+        creating a HyperPoint for each point. The coordinate arrays are returned as they are unless they hold
+        datetimes, which are converted to standard time. The list is kept by the view and should not be modified.
+        :return: list of 1D coordinate arrays in HyperPoint order, with None for any coordinate not present
+        """
+        if self._coord_arrays is None:
+            self._coord_arrays = [_convert_datetimes(coord) for coord in self.coords]
+        return self._coord_arrays
+
     def set_longitude_range(self, range_start):
         """Changes the longitude coordinate values by 360 as necessary to
         force the values to be within a 360 range starting at the specified value,
         i.e., range_start <= longitude < range_start + 360
 
+        The longitudes are shared with the data the view was created from, so they are only copied the first time
+        any of them need to change, and are changed in place after that. Once the view has its own copy, confining
+        them to the same range again does nothing.
+
         :param range_start: starting value of required longitude range
         """
-        if self.longitudes is None:
+        if self.longitudes is None or (self._owns_longitudes and self._longitude_range_start == range_start):
             return
 
-        range_end = range_start + 360.0
-
-        longitudes = self.coords[HyperPoint.LONGITUDE]
-        longitudes = np.where(longitudes < range_start, longitudes + 360, longitudes)
-        self.coords[HyperPoint.LONGITUDE] = np.where(longitudes >= range_end, longitudes - 360, longitudes)
+        longitudes = cis.utils.fix_longitude_range(self.longitudes, range_start, in_place=self._owns_longitudes)
+        if longitudes is not self.longitudes:
+            self.coords[HyperPoint.LONGITUDE] = longitudes
+            self._owns_longitudes = True
+            self._coord_arrays = None
+        self._longitude_range_start = range_start
 
     @property
     def vals(self):
@@ -215,6 +275,7 @@ class GriddedHyperPointView(HyperPointView):
         self.length = data.size
         self.non_masked_iteration = non_masked_iteration
         self._verify_no_coord_change_on_setting = False
+        self._coord_arrays = None
 
     def __getitem__(self, item):
         """Get HyperPoint specified by index.
@@ -332,6 +393,25 @@ class GriddedHyperPointView(HyperPointView):
             # Since only the data value can be changed, allow the value to be passed in directly.
             self.data[indices] = value
 
+    def get_coord_arrays(self):
+        """Gets the coordinates of all of the points as flattened arrays, so that they can be used together without
+        creating a HyperPoint for each point. The coordinate of each dimension is broadcast over the other dimensions
+        and flattened, which copies it to the size of the data, but only once: the arrays are kept for as long as the
+        coordinates are unchanged. Times are converted to standard time. The list is kept by the view and should not
+        be modified.
+        :return: list of 1D coordinate arrays in HyperPoint order, with None for any coordinate not present
+        """
+        if self._coord_arrays is None:
+            coord_arrays = [None] * HyperPoint.number_standard_names
+            shape = self.data.shape
+            for dim_idx, hp_idx in self.dims_to_std_coords_map.items():
+                dim_shape = [1] * len(shape)
+                dim_shape[dim_idx] = shape[dim_idx]
+                coord = np.reshape(_convert_datetimes(self.coords[dim_idx]), dim_shape)
+                coord_arrays[hp_idx] = np.broadcast_to(coord, shape).ravel()
+            self._coord_arrays = coord_arrays
+        return self._coord_arrays
+
     def set_longitude_range(self, range_start):
         """Changes the longitude coordinate values by 360 as necessary to
         force the values to be within a 360 range starting at the specified value,
@@ -343,17 +423,9 @@ class GriddedHyperPointView(HyperPointView):
         if coord is None:
             return
 
-        range_end = range_start + 360.0
-        if coord is not None:
-            new_coord = np.empty_like(coord)
-            for i, lon in enumerate(coord):
-                if lon < range_start:
-                    new_lon = lon + 360.0
-                elif lon >= range_end:
-                    new_lon = lon - 360.0
-                else:
-                    new_lon = lon
-                new_coord[i] = new_lon
+        # The coordinate belongs to the cube, so it is copied rather than changed in place if it needs to change.
+        new_coord = cis.utils.fix_longitude_range(coord, range_start)
+        if new_coord is not coord:
             self.longitudes = new_coord
 
     def _dimension_index_for_hyperpoint_index(self, hp_index):
@@ -379,6 +451,7 @@ class GriddedHyperPointView(HyperPointView):
             raise ValueError("Attempt to set latitude coordinate for GriddedData without latitudes")
         else:
             self.coords[dim_idx] = coord
+            self._coord_arrays = None
 
     @property
     def longitudes(self):
@@ -392,6 +465,7 @@ class GriddedHyperPointView(HyperPointView):
             raise ValueError("Attempt to set longitude coordinate for GriddedData without longitudes")
         else:
             self.coords[dim_idx] = coord
+            self._coord_arrays = None
 
     @property
     def altitudes(self):
@@ -405,6 +479,7 @@ class GriddedHyperPointView(HyperPointView):
             raise ValueError("Attempt to set altitude coordinate for GriddedData without altitudes")
         else:
             self.coords[dim_idx] = coord
+            self._coord_arrays = None
 
     @property
     def air_pressures(self):
@@ -418,6 +493,7 @@ class GriddedHyperPointView(HyperPointView):
             raise ValueError("Attempt to set air_pressure coordinate for GriddedData without air_pressures")
         else:
             self.coords[dim_idx] = coord
+            self._coord_arrays = None
 
     @property
     def times(self):
@@ -431,3 +507,22 @@ class GriddedHyperPointView(HyperPointView):
             raise ValueError("Attempt to set time coordinate for GriddedData without times")
         else:
             self.coords[dim_idx] = coord
+            self._coord_arrays = None
+
+
+def _to_list(array):
+    """Converts an array to a list of its values, with masked values as numpy.ma.masked.
+    """
+    values = np.ma.getdata(array).tolist()
+    if np.ma.is_masked(array):
+        mask = np.ma.getmaskarray(array).tolist()
+        values = [np.ma.masked if masked else value for value, masked in zip(values, mask)]
+    return values
+
+
+def _convert_datetimes(coord):
+    """Converts an array of datetimes to standard time, returning any other array (or None) unchanged.
+    """
+    if coord is not None and coord.size > 0 and isinstance(coord.flat[0], datetime.datetime):
+        return convert_datetime_to_std_time(coord)
+    return coord
@@ -250,11 +250,12 @@ def find_missing_value(var):
     return missing_value
 
 
-def get_data(var):
+def get_data(var, index=slice(None)):
     """
     Reads raw data from a NetCDF.Variable instance. Also applies CF-compliant valid max, min and ranges.
 
     :param var: The specific Variable instance to read
+    :param index: The index of the part of the variable to read, by default all of it
     :return:  A numpy maskedarray. Missing values are False in the mask.
     """
     import numpy as np
@@ -262,7 +263,7 @@ def get_data(var):
     # Turn off scaling as we need to apply the valid_min, max and range masks first
     var.set_auto_scale(False)
     # This will still automatically return a masked array based on _FillValue and missing_value
-    data = var[:]
+    data = var[index]
 
     if hasattr(var, 'valid_max'):
         try:
@@ -264,6 +264,47 @@ class LazyData(object):
             self._data_flattened = data.ravel()
         return self._data_flattened
 
+    def get_number_of_points(self):
+        """
+        Gets the number of (flattened) points, without reading the data if it is held in NetCDF variables which have
+        not been read yet.
+
+        :return: number of points
+        """
+        if self._reads_netcdf_rows():
+            return sum(int(numpy.prod(var.shape)) for var in self._data_manager)
+        return self.data_flattened.size
+
+    def _reads_netcdf_rows(self):
+        """
+        :return: True if the data has not been read yet and is held in NetCDF variables, so can be read in ranges of
+         rows
+        """
+        return self._data is None and self.retrieve_raw_data is netcdf_get_data and \
+            all(len(var.shape) > 0 for var in self._data_manager)
+
+    def _get_points_range(self, start, stop):
+        """
+        Gets a range of the (flattened) points of the data. If the data has not been read yet and is held in NetCDF
+        variables, only the rows of the variables containing the range are read, and only when the data is needed.
+
+        :param start: index of the first point
+        :param stop: index after the last point
+        :return: tuple of (numpy array or list of data managers, data retrieval callback or None), from which to create
+         a LazyData object of the points
+        """
+        if self._reads_netcdf_rows():
+            point_ranges = []
+            offset = 0
+            for var in self._data_manager:
+                size = int(numpy.prod(var.shape))
+                if max(start - offset, 0) < min(stop - offset, size):
+                    point_ranges.append(_NetCDFPointRange(var, max(start - offset, 0), min(stop - offset, size)))
+                offset += size
+            if point_ranges:
+                return point_ranges, _read_netcdf_point_range
+        return self.data_flattened[start:stop], None
+
     def copy_metadata_from(self, other_data):
         """
         Method to copy the metadata from one UngriddedData/Cube object to another
@@ -457,6 +498,25 @@ class UngriddedData(LazyData, CommonData):
         coords = self.coords().copy()
         return UngriddedData(data=data, metadata=self.metadata, coords=coords)
 
+    def slice_points(self, start, stop):
+        """
+        Create a new UngriddedData object containing a range of the (flattened) points of this one. Data and
+        coordinates which have already been read are views of those of this object where possible; those which have not
+        are read only for the range of points, when they are needed.
+
+        :param start: index of the first point
+        :param stop: index after the last point
+        :return: UngriddedData instance
+        """
+        from copy import copy
+        points, data_retrieval_callback = self._get_points_range(start, stop)
+        metadata = copy(self.metadata)
+        metadata.shape = (len(range(start, min(stop, self.get_number_of_points()))),)
+        data = UngriddedData(data=points, metadata=metadata, coords=_slice_coords(self._coords, start, stop),
+                             data_retrieval_callback=data_retrieval_callback)
+        data.filenames = self.filenames
+        return data
+
     @property
     def size(self):
         return self.data.size
@@ -638,8 +698,7 @@ class UngriddedData(LazyData, CommonData):
         at the specified value.
         :param range_start: starting value of required longitude range
         """
-        from cis.utils import fix_longitude_range
-        self.coord(standard_name='longitude').data = fix_longitude_range(self.lon.points, range_start)
+        self.coord(standard_name='longitude').set_longitude_range(range_start)
 
 
 class UngriddedCoordinates(CommonData):
@@ -691,6 +750,24 @@ class UngriddedCoordinates(CommonData):
         all_coords = self.coords().find_standard_coords()
         return [(c.data_flattened if c is not None else None) for c in all_coords]
 
+    def slice_points(self, start, stop):
+        """
+        Create a new UngriddedCoordinates object containing a range of the (flattened) points of this one.
+
+        :param start: index of the first point
+        :param stop: index after the last point
+        :return: UngriddedCoordinates instance
+        """
+        coords = UngriddedCoordinates(_slice_coords(self._coords, start, stop))
+        coords.filenames = self.filenames
+        return coords
+
+    def get_number_of_points(self):
+        """
+        :return: the number of (flattened) points
+        """
+        return self._coords[0].get_number_of_points() if len(self._coords) > 0 else 0
+
     @property
     def history(self):
         return "UngriddedCoordinates have no history"
@@ -792,8 +869,7 @@ class UngriddedCoordinates(CommonData):
         at the specified value.
         :param range_start: starting value of required longitude range
         """
-        from cis.utils import fix_longitude_range
-        self.coord(standard_name='longitude').data = fix_longitude_range(self.lon.points, range_start)
+        self.coord(standard_name='longitude').set_longitude_range(range_start)
 
 
 class UngriddedDataList(CommonDataList):
@@ -887,6 +963,57 @@ class UngriddedDataList(CommonDataList):
         return df
 
 
+def _slice_coords(coord_list, start, stop):
+    """
+    Create new coordinates containing a range of the (flattened) points of a list of coordinates.
+
+    :param coord_list: list of Coord objects
+    :param start: index of the first point
+    :param stop: index after the last point
+    :return: list of Coord objects
+    """
+    from copy import copy
+    from cis.data_io.Coord import Coord
+    coords = []
+    for coord in coord_list:
+        points, data_retrieval_callback = coord._get_points_range(start, stop)
+        new_coord = Coord(points, copy(coord.metadata), coord.axis, data_retrieval_callback)
+        new_coord.update_shape((len(range(start, min(stop, coord.get_number_of_points()))),))
+        coords.append(new_coord)
+    return coords
+
+
+class _NetCDFPointRange(object):
+    """
+    A range of the flattened points of a NetCDF variable, of which only the rows containing the range are read
+    """
+
+    def __init__(self, variable, start, stop):
+        """
+        :param variable: NetCDF Variable instance
+        :param start: index of the first point
+        :param stop: index after the last point
+        """
+        self.variable = variable
+        self.start = start
+        self.stop = stop
+
+
+def _read_netcdf_point_range(point_range):
+    """
+    Reads a range of the flattened points of a NetCDF variable, reading only the rows which contain it.
+
+    :param point_range: _NetCDFPointRange to read
+    :return: 1D numpy array of the points
+    """
+    row_size = int(numpy.prod(point_range.variable.shape[1:]))
+    first_row = point_range.start // row_size
+    last_row = -(-point_range.stop // row_size)
+    data = netcdf_get_data(point_range.variable, slice(first_row, last_row)).ravel()
+    offset = first_row * row_size
+    return data[point_range.start - offset:point_range.stop - offset]
+
+
 def _coords_as_data_frame(coord_list, copy=True):
     """
     Convert a CoordList object to a Pandas DataFrame.
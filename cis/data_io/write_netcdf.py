@@ -82,22 +82,33 @@ def __check_disk_space(filepath, data):
                             .format(path=filepath, free=sizeof_fmt(available), size=sizeof_fmt(data.data.nbytes)))
 
 
-def __create_variable(nc_file, data, prefer_standard_name=False):
-    """Creates and writes a variable to a netCDF file.
-    :param nc_file: netCDF file to which to write
+def __get_variable_name(data, prefer_standard_name=False):
+    """Gets the name under which to write a variable to a netCDF file.
     :param data: LazyData for variable to write
     :param prefer_standard_name: if True, use the standard name of the variable if defined,
            otherwise use the variable name
-    :return: created netCDF variable
+    :return: variable name
     """
-    from cis.exceptions import InconsistentDimensionsError
-
     name = None
     if (data.metadata._name is not None) and (len(data.metadata._name) > 0):
         name = data.metadata._name
     if (name is None) or prefer_standard_name:
         if (data.metadata.standard_name is not None) and (len(data.metadata.standard_name) > 0):
             name = data.metadata.standard_name
+    return name
+
+
+def __create_variable(nc_file, data, prefer_standard_name=False):
+    """Creates and writes a variable to a netCDF file.
+    :param nc_file: netCDF file to which to write
+    :param data: LazyData for variable to write
+    :param prefer_standard_name: if True, use the standard name of the variable if defined,
+           otherwise use the variable name
+    :return: created netCDF variable
+    """
+    from cis.exceptions import InconsistentDimensionsError
+
+    name = __get_variable_name(data, prefer_standard_name)
     out_type = types[str(data.data.dtype)]
     logging.info("Creating variable: {name}({index}) {type}".format(name=name, index=index_name, type=out_type))
     if name not in nc_file.variables:
@@ -169,3 +180,49 @@ def add_data_to_file(data_object, filename):
     var = __create_variable(netcdf_file, data_object, prefer_standard_name=False)
     netcdf_file.source = "CIS" + __version__
     netcdf_file.close()
+
+
+def append_data(data_list, filename, create=False):
+    """Appends ungridded data, and the coordinates of its points, to a netCDF file along an unlimited dimension, so
+    that data collocated in chunks can be written one chunk at a time.
+
+    :param data_list: list of UngriddedData objects (or a single UngriddedData or UngriddedCoordinates object) with
+     the same coordinates, the first of which supplies the coordinates to write
+    :param filename: file to which to write
+    :param create: if True, create a new file (overwriting any existing file), otherwise append to an existing file
+     created by an earlier call
+    """
+    from cis import __version__
+    from cis.data_io.ungridded_data import UngriddedCoordinates
+    from cis.utils import listify
+
+    data_list = listify(data_list)
+    if create:
+        netcdf_file = Dataset(filename, 'w', format="NETCDF4")
+        _ = netcdf_file.createDimension(index_name, None)
+    else:
+        netcdf_file = Dataset(filename, 'a', format="NETCDF4")
+    try:
+        start = len(netcdf_file.dimensions[index_name])
+        variables = [(coord, True) for coord in data_list[0].coords()]
+        variables.extend((data, False) for data in data_list if not isinstance(data, UngriddedCoordinates))
+        written = set()
+        for data, prefer_standard_name in variables:
+            name = __get_variable_name(data, prefer_standard_name)
+            if name in written:
+                continue
+            written.add(name)
+            if name in netcdf_file.variables:
+                var = netcdf_file.variables[name]
+            else:
+                out_type = types[str(data.data.dtype)]
+                logging.info("Creating variable: {name}({index}) {type}".format(name=name, index=index_name,
+                                                                               type=out_type))
+                var = netcdf_file.createVariable(name, datatype=out_type, dimensions=index_name,
+                                                 fill_value=__get_missing_value(data))
+                __add_metadata(var, data)
+            values = data.data_flattened
+            var[start:start + len(values)] = values
+        netcdf_file.source = "CIS" + __version__
+    finally:
+        netcdf_file.close()
@@ -154,6 +154,16 @@ def add_col_parser_arguments(parser):
     parser.add_argument("-o", "--output", metavar="Output filename", default="out", nargs="?",
                         help="The filename of the output file containing the collocated data. The name specified will"
                              " be suffixed with \".nc\".")
+    parser.add_argument("--workers", metavar="N", type=int, default=1,
+                        help="The number of worker processes to collocate with. Only some collocators, such as the "
+                             "default collocator for ungridded sample points, can use more than one.")
+    parser.add_argument("--chunk-size", metavar="N", type=int, default=None,
+                        help="Collocate the sample points in chunks of at most N points, reading the sample files one "
+                             "at a time and appending the output for each chunk to the output file, so that the memory "
+                             "used does not grow with the number of sample points. Only for ungridded sample points.")
+    parser.add_argument("--index-cache", action="store_true",
+                        help="Store the indexes over the data (and the weights for regridding gridded data) on disk "
+                             "and reuse them in later runs, rather than always building them.")
     return parser
 
 
@@ -168,6 +178,9 @@ def add_aggregate_parser_arguments(parser):
                              "degree increments up to 90")
     parser.add_argument("-o", "--output", metavar="Output filename", default="out", nargs="?",
                         help="The filename of the output file")
+    parser.add_argument("--no-index-cache", action="store_true",
+                        help="Always build the indexes over the data rather than reusing those stored on disk by "
+                             "earlier runs.")
     return parser
 
 
@@ -941,6 +954,10 @@ def validate_col_args(arguments, parser):
                                                                         "variable"] is not "" else None
     arguments.sampleproduct = arguments.samplegroup["product"]
     arguments.datagroups = get_basic_datagroups(arguments.datagroups, parser)
+    if arguments.workers < 1:
+        parser.error("The number of workers must be at least one")
+    if arguments.chunk_size is not None and arguments.chunk_size < 1:
+        parser.error("The chunk size must be at least one")
     _validate_output_file(arguments, parser)
 
     return arguments
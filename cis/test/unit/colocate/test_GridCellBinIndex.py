@@ -66,3 +66,51 @@ class TestGridCellBinIndex(unittest.TestCase):
 
         final_points_index = [(out_index, hp, points) for out_index, hp, points in iterator]
         assert_that(len(final_points_index), is_(0), "Masked points should not be iterated over")
+
+    def test_GIVEN_points_in_each_cell_WHEN_index_THEN_each_cell_contains_its_point(self):
+        from cis.collocation.col_implementations import BinningCubeCellConstraint
+
+        sample_cube = make_square_5x3_2d_cube()
+        data = make_regular_2d_ungridded_data()
+        coord_map = make_coord_map(sample_cube, data)
+        coords = sample_cube.coords()
+        for (hpi, ci, shi) in coord_map:
+            if not coords[ci].has_bounds():
+                coords[ci].guess_bounds()
+
+        constraint = BinningCubeCellConstraint()
+        data_index.create_indexes(constraint, coords, data.get_non_masked_points(), coord_map)
+        index = constraint.grid_cell_bin_index
+
+        assert_that(index.shape, is_((5, 3)))
+        assert_that(index.offsets.tolist(), is_(list(range(16))))
+        for out_indices, cell_slice in index.get_iterator():
+            assert_that(index.indices[cell_slice].tolist(), is_([out_indices[0] * 3 + out_indices[1]]))
+
+    def test_GIVEN_points_inside_and_outside_grid_WHEN_get_groups_THEN_groups_match_iterator(self):
+        from cis.data_io.ungridded_data import UngriddedData
+        from cis.data_io.Coord import CoordList, Coord
+        from cis.data_io.ungridded_data import Metadata
+
+        sample_cube = make_square_5x3_2d_cube()
+        lat = np.array([0.1, 0.2, 50.0, -9.0, 0.3, -9.5])
+        lon = np.array([0.1, 0.2, 0.0, -4.0, 0.3, -4.5])
+        data = UngriddedData(np.ma.arange(6.0), Metadata(name='rain', units='mm'),
+                             CoordList([Coord(lat, Metadata(standard_name='latitude', units='degrees')),
+                                        Coord(lon, Metadata(standard_name='longitude', units='degrees'))]))
+        coord_map = make_coord_map(sample_cube, data)
+        coords = sample_cube.coords()
+        for (hpi, ci, shi) in coord_map:
+            if not coords[ci].has_bounds():
+                coords[ci].guess_bounds()
+
+        constraint = BinnedCubeCellOnlyConstraint()
+        data_index.create_indexes(constraint, coords, data.get_non_masked_points(), coord_map)
+        out_indices, offsets = constraint.grid_cell_bin_index_slices.get_groups()
+
+        iterated = [(indices, tuple(start_end)) for indices, start_end in
+                    constraint.grid_cell_bin_index_slices.get_iterator()]
+        grouped = [(tuple(i[group] for i in out_indices), (offsets[group], offsets[group + 1]))
+                   for group in range(len(offsets) - 1)]
+        assert_that(grouped, is_(iterated))
+        assert_that(offsets.tolist(), is_([1, 3, 6]))
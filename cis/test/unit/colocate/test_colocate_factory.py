@@ -22,6 +22,26 @@ class TestCollocateFactory(unittest.TestCase):
         assert_that(kernel, instance_of(mean), "Kernel")
         assert_that(constraint.h_sep, is_(10), "h_sep")
 
+    def test_GIVEN_Factory_WHEN_request_ungridded_ungridded_nn_k_mean_with_con_options_THEN_correct_objects_returned(
+            self):
+        collocator, constraint, kernel = self.factory.get_collocator_instances_for_method(
+            "nn_k", "mean", {'missing_data_for_missing_sample': "false", "k": "5", "h_sep": "10"}, {}, False, False)
+        assert_that(collocator, instance_of(GeneralUngriddedCollocator), "Collocator's class")
+        assert_that(constraint, instance_of(NNKConstraint), "Constraint")
+        assert_that(kernel, instance_of(mean), "Kernel")
+        assert_that(constraint.k, is_(5), "k")
+        assert_that(constraint.h_sep, is_(10), "h_sep")
+
+    def test_GIVEN_Factory_WHEN_request_ungridded_ungridded_box_t_mean_with_con_options_THEN_correct_objects_returned(
+            self):
+        collocator, constraint, kernel = self.factory.get_collocator_instances_for_method(
+            "box_t", "mean", {'missing_data_for_missing_sample': "false", "h_sep": "10", "t_sep": "P1D"}, {}, False,
+            False)
+        assert_that(collocator, instance_of(GeneralUngriddedCollocator), "Collocator's class")
+        assert_that(constraint, instance_of(SepConstraintTimeWindow), "Constraint")
+        assert_that(kernel, instance_of(mean), "Kernel")
+        assert_that(constraint.t_sep, is_(1), "t_sep")
+
     def test_GIVEN_no_collocator_WHEN_get_col_instances_for_gridded_to_gridded_THEN_defaults_to_lin(self):
         collocator, constraint, kernel = self.factory.get_collocator_instances_for_method(
             None, None, {'missing_data_for_missing_sample': "false"}, {}, True, True)
@@ -29,6 +49,14 @@ class TestCollocateFactory(unittest.TestCase):
         assert_that(constraint, is_(None))
         assert_that(kernel, instance_of(gridded_gridded_li))
 
+    def test_GIVEN_Factory_WHEN_request_gridded_gridded_con_with_mdtol_THEN_correct_objects_returned(self):
+        collocator, constraint, kernel = self.factory.get_collocator_instances_for_method(
+            "con", None, {'missing_data_for_missing_sample': "false", "mdtol": "0.5"}, {}, True, True)
+        assert_that(collocator, instance_of(GriddedCollocator))
+        assert_that(constraint, is_(None))
+        assert_that(kernel, instance_of(gridded_gridded_con))
+        assert_that(collocator.mdtol, is_(0.5))
+
     def test_GIVEN_no_collocator_WHEN_get_col_instances_for_ungridded_to_ungridded_THEN_defaults_to_box(self):
         collocator, constraint, kernel = self.factory.get_collocator_instances_for_method(
             None, None, {'missing_data_for_missing_sample': "false"}, {}, False, False)
@@ -7,6 +7,7 @@ from nose.tools import eq_
 
 from cis.test.util import mock
 from cis.data_io.hyperpoint import HyperPoint
+from cis.data_io.ungridded_data import UngriddedData
 
 
 class TestSepConstraint(unittest.TestCase):
@@ -136,5 +137,118 @@ class TestSepConstraint(unittest.TestCase):
         assert (np.equal(ref_vals, new_vals).all())
 
 
+    def test_all_constraint_in_4d_for_block_of_sample_points(self):
+        from cis.collocation.col_implementations import SepConstraint
+        import datetime as dt
+        import numpy as np
+
+        ug_data = mock.make_regular_4d_ungridded_data()
+        ug_data_points = ug_data.get_non_masked_points()
+        sample_points = [HyperPoint(lat=0.0, lon=0.0, alt=50.0, pres=50.0, t=dt.datetime(1984, 8, 29)),
+                         HyperPoint(lat=0.0, lon=0.0, alt=50.0, pres=24.0, t=dt.datetime(1984, 8, 29)),
+                         HyperPoint(lat=80.0, lon=0.0, alt=50.0, pres=50.0, t=dt.datetime(1984, 8, 29))]
+        sample_coords = [np.array([p[i] for p in sample_points]) for i in range(HyperPoint.number_standard_names)]
+
+        constraint = SepConstraint(h_sep=1000, a_sep=15, p_sep=1.22, t_sep='P1DT1M')
+        # Make sure the comparison is split up
+        constraint.max_comparisons = 20
+
+        data_coords = ug_data_points.get_coord_arrays()
+        data_indices = np.arange(len(ug_data_points))
+        offsets, indices = constraint.constrain_points_in_batch(sample_coords, data_coords, data_indices)
+
+        eq_(len(offsets), 4)
+        for i, sample_point in enumerate(sample_points):
+            ref_vals = constraint.constrain_points(sample_point, ug_data_points).vals
+            assert np.array_equal(ug_data_points.data[indices[offsets[i]:offsets[i + 1]]], ref_vals)
+        assert np.array_equal(ug_data_points.data[indices[offsets[0]:offsets[1]]], [27., 28., 29., 32., 33., 34.])
+        eq_(offsets[3] - offsets[2], 0)
+
+
+class TestSepConstraintTimeWindow(unittest.TestCase):
+
+    def test_GIVEN_block_of_sample_points_in_any_order_WHEN_constrain_THEN_same_as_exhaustive_search(self):
+        from cis.collocation.col_implementations import SepConstraint, SepConstraintTimeWindow
+        import datetime as dt
+        import numpy as np
+
+        ug_data = mock.make_regular_4d_ungridded_data()
+        ug_data_points = ug_data.get_non_masked_points()
+        sample_points = [HyperPoint(lat=0.0, lon=0.0, alt=50.0, pres=50.0, t=dt.datetime(1984, 9, 2)),
+                         HyperPoint(lat=0.0, lon=0.0, alt=50.0, pres=50.0, t=dt.datetime(1984, 8, 29)),
+                         HyperPoint(lat=5.0, lon=5.0, alt=50.0, pres=50.0, t=dt.datetime(1984, 8, 31)),
+                         HyperPoint(lat=80.0, lon=0.0, alt=50.0, pres=50.0, t=dt.datetime(1984, 8, 29))]
+        sample_coords = UngriddedData.from_points_array(sample_points).get_all_points().get_coord_arrays()
+
+        constraint = SepConstraintTimeWindow(h_sep=1000, a_sep=15, t_sep='P1DT1M')
+        # Make sure the sample points are split between several windows
+        constraint.window_length = 1
+        data_coords = ug_data_points.get_coord_arrays()
+        data_indices = np.arange(len(ug_data_points))
+        offsets, indices = constraint.constrain_points_in_batch(sample_coords, data_coords, data_indices)
+
+        expected_offsets, expected_indices = SepConstraint(h_sep=1000, a_sep=15, t_sep='P1DT1M').\
+            constrain_points_in_batch(sample_coords, data_coords, data_indices)
+        assert np.array_equal(offsets, expected_offsets)
+        assert np.array_equal(indices, expected_indices)
+        eq_(offsets[1], 0)
+        assert offsets[2] > offsets[1] and offsets[3] > offsets[2]
+
+    def test_GIVEN_no_time_separation_WHEN_create_THEN_raises_error(self):
+        from cis.collocation.col_implementations import SepConstraintTimeWindow
+        from cis.exceptions import InvalidCommandLineOptionError
+        with self.assertRaises(InvalidCommandLineOptionError):
+            SepConstraintTimeWindow(h_sep=1000)
+
+
+class TestNNKConstraint(unittest.TestCase):
+
+    def setUp(self):
+        import numpy as np
+        from cis.collocation import data_index
+        self.data_points = mock.make_regular_2d_ungridded_data().get_non_masked_points()
+        self.data_coords = self.data_points.get_coord_arrays()
+        self.sample_coords = [np.array([0.5, 9.0, 60.0]), np.array([0.5, 4.0, 0.0]), None, None, None]
+        self.create_indexes = data_index.create_indexes
+
+    def _constrain(self, k, h_sep=None):
+        from cis.collocation.col_implementations import NNKConstraint
+        constraint = NNKConstraint(k, h_sep)
+        self.create_indexes(constraint, None, self.data_points, None)
+        return constraint, constraint.constrain_points_in_batch(self.sample_coords, self.data_coords, None)
+
+    def test_GIVEN_k_WHEN_constrain_block_of_sample_points_THEN_k_nearest_points_found_in_order_of_distance(self):
+        import numpy as np
+        from cis.utils import haversine_for_arrays
+        constraint, (offsets, indices) = self._constrain(4)
+        assert np.array_equal(offsets, [0, 4, 8, 12])
+        for i in range(3):
+            distances = haversine_for_arrays(self.data_coords[0], self.data_coords[1],
+                                             self.sample_coords[0][i], self.sample_coords[1][i])
+            found_distances = distances[indices[offsets[i]:offsets[i + 1]]]
+            assert np.all(np.diff(found_distances) >= 0)
+            assert np.allclose(found_distances, np.sort(distances)[:4])
+
+    def test_GIVEN_h_sep_WHEN_constrain_block_of_sample_points_THEN_only_points_within_h_sep_found(self):
+        import numpy as np
+        from cis.utils import haversine_for_arrays
+        constraint, (offsets, indices) = self._constrain(4, '600km')
+        # Only the points at (0, 0), (0, 5) and (5, 0) are within 600km of the first sample point
+        assert np.array_equal(np.sort(self.data_points.data[indices[offsets[0]:offsets[1]]]), [8, 9, 11])
+        for i in range(3):
+            distances = haversine_for_arrays(self.data_coords[0], self.data_coords[1],
+                                             self.sample_coords[0][i], self.sample_coords[1][i])
+            eq_(offsets[i + 1] - offsets[i], np.minimum(np.sum(distances <= 600), 4))
+        eq_(offsets[3] - offsets[2], 0)
+
+    def test_GIVEN_k_WHEN_constrain_single_point_THEN_same_as_block(self):
+        import numpy as np
+        constraint, (offsets, indices) = self._constrain(3, '400km')
+        for i in range(3):
+            point = HyperPoint(lat=self.sample_coords[0][i], lon=self.sample_coords[1][i])
+            eq_(constraint.constrain_points(point, self.data_points).vals.tolist(),
+                self.data_points.data[indices[offsets[i]:offsets[i + 1]]].tolist())
+
+
 if __name__ == '__main__':
     unittest.main()
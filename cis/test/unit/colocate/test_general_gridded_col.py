@@ -8,13 +8,14 @@ from cis.exceptions import UserPrintableException
 from cis.data_io.gridded_data import GriddedDataList
 from cis.data_io.ungridded_data import UngriddedDataList
 from cis.collocation.col_implementations import GeneralGriddedCollocator, mean, CubeCellConstraint, \
-    BinningCubeCellConstraint, moments, BinnedCubeCellOnlyConstraint
+    BinningCubeCellConstraint, moments, BinnedCubeCellOnlyConstraint, GeneralUngriddedCollocator, SepConstraintKdtree
 from cis.test.util.mock import make_mock_cube, make_dummy_ungridded_data_single_point, \
     make_dummy_ungridded_data_two_points_with_different_values, make_dummy_1d_ungridded_data, \
     make_dummy_1d_ungridded_data_with_invalid_standard_name, make_square_5x3_2d_cube_with_time, \
     make_square_5x3_2d_cube_with_altitude, make_square_5x3_2d_cube_with_pressure, \
     make_square_5x3_2d_cube_with_decreasing_latitude, make_square_5x3_2d_cube, make_regular_2d_ungridded_data, \
-    make_square_NxM_2d_cube_with_time, make_square_5x3_2d_cube_with_extra_dim
+    make_square_NxM_2d_cube_with_time, make_square_5x3_2d_cube_with_extra_dim, \
+    make_square_5x3_2d_cube_with_missing_data
 from cis.test.utils_for_testing import assert_arrays_equal, assert_arrays_almost_equal
 
 
@@ -1061,3 +1062,30 @@ class TestGeneralGriddedCollocator(unittest.TestCase):
         kernel = mean()
         out_cube = col.collocate(points=sample, data=data, constraint=constraint, kernel=kernel)
         assert out_cube[0].shape == (5, 3)
+
+
+class TestGeneralGriddedCollocatorInBatch(unittest.TestCase):
+
+    def _collocate(self, sample, constraint, kernel, in_batch, missing_data_for_missing_sample=False):
+        from mock import patch
+        col = GeneralGriddedCollocator(missing_data_for_missing_sample=missing_data_for_missing_sample)
+        data = make_regular_2d_ungridded_data()
+        with patch.object(GeneralUngriddedCollocator, '_can_collocate_in_batch', return_value=in_batch):
+            return col.collocate(points=sample, data=data, constraint=constraint, kernel=kernel)
+
+    def test_GIVEN_separation_constraint_WHEN_collocated_in_batch_THEN_same_as_each_cell_in_turn(self):
+        sample = make_mock_cube(lat_dim_length=9, lon_dim_length=7, dim_order=['lon', 'lat'])
+        expected = self._collocate(sample, SepConstraintKdtree('400km'), moments(), False)
+        output = self._collocate(sample, SepConstraintKdtree('400km'), moments(), True)
+        assert_that(len(output), is_(3))
+        for out_cube, expected_cube in zip(output, expected):
+            assert_that(out_cube.shape, is_(sample.shape))
+            assert numpy.array_equal(out_cube.data.mask, expected_cube.data.mask)
+            assert_arrays_almost_equal(out_cube.data.compressed(), expected_cube.data.compressed())
+
+    def test_GIVEN_missing_sample_values_WHEN_collocated_in_batch_THEN_those_cells_masked(self):
+        sample = make_square_5x3_2d_cube_with_missing_data()
+        expected = self._collocate(sample, SepConstraintKdtree('400km'), mean(), False)
+        output = self._collocate(sample, SepConstraintKdtree('400km'), mean(), True, True)
+        assert numpy.array_equal(output[0].data.mask, sample.data.mask)
+        assert_arrays_almost_equal(output[0].data.compressed(), expected[0].data[~sample.data.mask])
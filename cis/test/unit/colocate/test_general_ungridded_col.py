@@ -99,6 +99,46 @@ class TestGeneralUngriddedCollocator(unittest.TestCase):
         assert not any(output[1].data.mask)
         assert not any(output[2].data.mask)
 
+    def test_ungridded_ungridded_box_mean_in_blocks_matches_point_by_point(self):
+        from cis.collocation.col_implementations import mean
+        data = mock.make_regular_2d_ungridded_data()
+        sample = UngriddedData.from_points_array(
+            [HyperPoint(lat=1.0, lon=1.0, alt=12.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=3.0, lon=3.0, alt=7.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=-1.0, lon=-1.0, alt=5.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=40.0, lon=40.0, alt=5.0, t=dt.datetime(1984, 8, 29, 8, 34))])
+
+        col = GeneralUngriddedCollocator()
+        col.sample_block_size = 3
+        batch_output = col.collocate(sample, data, SepConstraintKdtree('500km'), mean())
+
+        col._can_collocate_in_batch = lambda constraint, kernel: False
+        point_output = col.collocate(sample, data, SepConstraintKdtree('500km'), mean())
+
+        expected_result = np.ma.array([28.0/3, 10.0, 20.0/3, 0], mask=[False, False, False, True])
+        assert np.array_equal(batch_output[0].data.mask, expected_result.mask)
+        assert np.allclose(batch_output[0].data.compressed(), expected_result.compressed())
+        assert np.array_equal(batch_output[0].data.mask, point_output[0].data.mask)
+        assert np.allclose(batch_output[0].data.compressed(), point_output[0].data.compressed())
+
+    def test_ungridded_ungridded_box_mean_with_workers_matches_single_process(self):
+        from cis.collocation.col_implementations import mean
+        data = mock.make_regular_2d_ungridded_data()
+        sample = UngriddedData.from_points_array(
+            [HyperPoint(lat=1.0, lon=1.0, alt=12.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=3.0, lon=3.0, alt=7.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=-1.0, lon=-1.0, alt=5.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=40.0, lon=40.0, alt=5.0, t=dt.datetime(1984, 8, 29, 8, 34))])
+
+        col = GeneralUngriddedCollocator()
+        single_output = col.collocate(sample, data, SepConstraintKdtree('500km'), mean())
+
+        col.workers = 2
+        parallel_output = col.collocate(sample, data, SepConstraintKdtree('500km'), mean())
+
+        assert np.array_equal(parallel_output[0].data.mask, single_output[0].data.mask)
+        assert np.allclose(parallel_output[0].data.compressed(), single_output[0].data.compressed())
+
     def test_list_ungridded_ungridded_box_mean(self):
         ug_data_1 = mock.make_regular_2d_ungridded_data()
         ug_data_2 = mock.make_regular_2d_ungridded_data(data_offset=3)
@@ -127,6 +167,54 @@ class TestGeneralUngriddedCollocator(unittest.TestCase):
         assert all(output[4].data.mask)
         assert np.allclose(output[5].data, expected_n)
 
+    def test_list_with_different_masks_collocated_together_matches_each_variable_alone(self):
+        from cis.collocation.col_implementations import mean
+        ug_data_1 = mock.make_regular_2d_ungridded_data_with_missing_values()
+        ug_data_2 = mock.make_regular_2d_ungridded_data(data_offset=3)
+        ug_data_2.metadata._name = 'snow'
+        sample_points = mock.make_regular_2d_ungridded_data()
+
+        col = GeneralUngriddedCollocator()
+        output = col.collocate(sample_points, UngriddedDataList([ug_data_1, ug_data_2]), SepConstraintKdtree('800km'),
+                               mean())
+
+        assert len(output) == 2
+        assert output[1].var_name == 'snow'
+        for data, var_output in zip([ug_data_1, ug_data_2], output):
+            expected = col.collocate(sample_points, data, SepConstraintKdtree('800km'), mean())[0]
+            assert np.array_equal(var_output.data.mask, expected.data.mask)
+            assert np.allclose(var_output.data.compressed(), expected.data.compressed())
+
+    def test_ungridded_ungridded_nn_k_mean_in_blocks_matches_point_by_point(self):
+        from cis.collocation.col_implementations import mean, NNKConstraint
+        data = mock.make_regular_2d_ungridded_data_with_missing_values()
+        sample_points = mock.make_regular_2d_ungridded_data(lat_min=-8, lon_min=-3)
+
+        col = GeneralUngriddedCollocator()
+        col.sample_block_size = 4
+        batch_output = col.collocate(sample_points, data, NNKConstraint(3, '600km'), mean())
+
+        col._can_collocate_in_batch = lambda constraint, kernel: False
+        point_output = col.collocate(sample_points, data, NNKConstraint(3, '600km'), mean())
+
+        assert np.array_equal(batch_output[0].data.mask, point_output[0].data.mask)
+        assert np.allclose(batch_output[0].data.compressed(), point_output[0].data.compressed())
+
+    def test_list_with_different_masks_nn_k_matches_each_variable_alone(self):
+        from cis.collocation.col_implementations import mean, NNKConstraint
+        ug_data_1 = mock.make_regular_2d_ungridded_data_with_missing_values()
+        ug_data_2 = mock.make_regular_2d_ungridded_data(data_offset=3)
+        ug_data_2.metadata._name = 'snow'
+        sample_points = mock.make_regular_2d_ungridded_data(lat_min=-8, lon_min=-3)
+
+        col = GeneralUngriddedCollocator()
+        output = col.collocate(sample_points, UngriddedDataList([ug_data_1, ug_data_2]), NNKConstraint(2), mean())
+
+        for data, var_output in zip([ug_data_1, ug_data_2], output):
+            expected = col.collocate(sample_points, data, NNKConstraint(2), mean())[0]
+            assert np.array_equal(var_output.data.mask, expected.data.mask)
+            assert np.allclose(var_output.data.compressed(), expected.data.compressed())
+
     def test_list_gridded_ungridded_box_moments(self):
         data1 = make_from_cube(mock.make_mock_cube())
         data1.name = lambda: 'Name1'
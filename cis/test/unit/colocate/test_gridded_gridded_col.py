@@ -8,7 +8,8 @@ from iris.exceptions import CoordinateNotFoundError
 import numpy
 
 from cis.exceptions import ClassNotFoundError
-from cis.collocation.col_implementations import GriddedCollocator, gridded_gridded_nn, gridded_gridded_li, nn_p
+from cis.collocation.col_implementations import GriddedCollocator, gridded_gridded_nn, gridded_gridded_li, \
+    gridded_gridded_con, nn_p
 import cis.data_io.gridded_data as gridded_data
 from cis.test.util.mock import make_dummy_2d_cube, make_dummy_2d_cube_with_small_offset_in_lat_and_lon, \
     make_dummy_2d_cube_with_small_offset_in_lat, make_dummy_2d_cube_with_small_offset_in_lon, \
@@ -1380,3 +1381,15 @@ class TestGriddedGriddedCollocator(GriddedGriddedCollocatorTests, TestCase):
         col = self.collocator
         out_cube = col.collocate(points=sample, data=data, constraint=None, kernel=gridded_gridded_nn())
         assert out_cube[0].shape == sample.shape
+
+    def test_gridded_gridded_con_for_same_grids_with_time_check_returns_original_data(self):
+        sample_cube = gridded_data.make_from_cube(make_mock_cube(time_dim_length=7, data_offset=1.0))
+        data_cube = gridded_data.make_from_cube(make_mock_cube(time_dim_length=7, dim_order=['time', 'lon', 'lat']))
+
+        col = self.collocator
+        out_cube = col.collocate(points=sample_cube, data=data_cube, constraint=None, kernel=gridded_gridded_con())[0]
+
+        assert numpy.allclose(data_cube.data.transpose((2, 1, 0)), out_cube.data)
+        assert numpy.array_equal(sample_cube.coord('latitude').points, out_cube.coord('latitude').points)
+        assert numpy.array_equal(sample_cube.coord('longitude').points, out_cube.coord('longitude').points)
+        assert numpy.array_equal(sample_cube.coord('time').points, out_cube.coord('time').points)
@@ -97,6 +97,24 @@ class TestRegularGridInterpolator(TestCase):
         interp = _RegularGridInterpolator(points, sample.T)
         assert_array_almost_equal(interp(values), wanted)
 
+    def test_linear_in_chunks(self):
+        points, values = self._get_sample_4d()
+        sample = np.asarray([[0.1, 0.1, 1., .9], [0.2, 0.1, .45, .8],
+                                                     [0.5, 0.5, .5, .5]])
+        wanted = np.asarray([1001.1, 846.2, 555.5])
+        interp = _RegularGridInterpolator(points, sample.T, chunk_size=2)
+        assert_array_almost_equal(interp(values), wanted)
+
+    def test_linear_in_single_precision(self):
+        points, values = self._get_sample_4d()
+        sample = np.asarray([[0.1, 0.1, 1., .9], [0.2, 0.1, .45, .8],
+                                                     [0.5, 0.5, .5, .5]])
+        wanted = np.asarray([1001.1, 846.2, 555.5])
+        interp = _RegularGridInterpolator(points, sample.T, dtype=np.float32)
+        result = interp(values)
+        assert result.dtype == np.float32
+        assert_allclose(result, wanted, rtol=1e-6)
+
     def test_nearest(self):
         points, values = self._get_sample_4d()
         sample = np.asarray([0.1, 0.1, .9, .9])
@@ -227,6 +245,52 @@ class TestRegularGridInterpolator(TestCase):
         wanted = np.asarray([8.8, 11.2, 4.8])
         assert_array_almost_equal(values, wanted)
 
+    def test_only_window_of_cube_around_points_read(self):
+        from cis.test.util.mock import make_mock_cube
+        from cis.data_io.ungridded_data import UngriddedData
+        from cis.data_io.hyperpoint import HyperPoint
+
+        cube = make_mock_cube(lat_dim_length=19, lon_dim_length=36, lon_range=(0., 350.))
+        cube.coord('longitude').circular = True
+        sample_points = UngriddedData.from_points_array(
+            [HyperPoint(lat=1.5, lon=352.0), HyperPoint(lat=3.0, lon=358.0), HyperPoint(lat=2.0, lon=355.0)])
+
+        interpolator = GriddedUngriddedInterpolator(cube, sample_points, 'linear')
+        window = interpolator._read_window(cube)
+        assert_allclose(window.shape, (3, 2))
+        assert_allclose(interpolator(cube), interpolator._interp(np.hstack((cube.data, cube.data[:, :1]))))
+
+    def test_empty_window_does_not_read_cube_data(self):
+        import dask.array as da
+        from cis.test.util.mock import make_mock_cube
+        from cis.data_io.ungridded_data import UngriddedData
+        from cis.data_io.hyperpoint import HyperPoint
+
+        cube = make_mock_cube(lat_dim_length=19, lon_dim_length=36, lon_range=(0., 350.))
+        sample_points = UngriddedData.from_points_array([HyperPoint(lat=1.5, lon=12.0)])
+
+        interpolator = GriddedUngriddedInterpolator(cube, sample_points, 'linear')
+        interpolator._interp.indices = [np.array([], dtype=int) for _ in interpolator._interp.indices]
+        lazy_cube = cube.copy(data=da.from_array(cube.data, chunks=cube.shape))
+        window = interpolator._read_window(lazy_cube)
+        assert_allclose(window.shape, (0, 0))
+        assert window.dtype == cube.dtype
+        assert lazy_cube.has_lazy_data()
+
+    def test_2d_cube_with_decreasing_latitude(self):
+        from cis.test.util.mock import make_mock_cube
+        from cis.data_io.ungridded_data import UngriddedData
+        from cis.data_io.hyperpoint import HyperPoint
+
+        cube = make_mock_cube(lat_dim_length=19, lon_dim_length=36, lon_range=(0., 350.))
+        sample_points = UngriddedData.from_points_array(
+            [HyperPoint(lat=1.0, lon=12.0), HyperPoint(lat=6.0, lon=8.0), HyperPoint(lat=-4.0, lon=305.0)])
+
+        for method in ['linear', 'nearest']:
+            wanted = GriddedUngriddedInterpolator(cube, sample_points, method)(cube)
+            interpolator = GriddedUngriddedInterpolator(cube[::-1], sample_points, method)
+            assert_array_almost_equal(interpolator(cube[::-1]), wanted)
+
     def test_hybrid_Coord_nn(self):
         from cis.test.util.mock import make_mock_cube
         from cis.data_io.ungridded_data import UngriddedData
@@ -323,6 +387,33 @@ class TestRegularGridInterpolator(TestCase):
         wanted = np.asarray([221.0, 345.0, 100.0])
         assert_array_almost_equal(values, wanted)
 
+    def test_vertical_indices_match_search_of_each_increasing_column(self):
+        np.random.seed(1234)
+        columns = np.cumsum(np.random.rand(50, 8) + 0.1, axis=1)
+        points = np.random.rand(50) * 10 - 1
+
+        indices, norm_distances, out_of_bounds = _RegularGridInterpolator._find_vertical_indices(points, columns)
+
+        for point, column, index, norm_distance, oob in zip(points, columns, indices, norm_distances, out_of_bounds):
+            expected_index = np.clip(np.searchsorted(column, point) - 1, 0, column.size - 2)
+            assert index == expected_index
+            assert_allclose(norm_distance, (point - column[index]) / (column[index + 1] - column[index]))
+            assert oob == (point < column[0] or point > column[-1])
+
+    def test_vertical_indices_in_decreasing_columns_match_reversed_columns(self):
+        np.random.seed(1234)
+        columns = np.cumsum(np.random.rand(50, 8) + 0.1, axis=1)
+        points = np.random.rand(50) * 10 - 1
+        size = columns.shape[1]
+
+        indices, norm_distances, out_of_bounds = _RegularGridInterpolator._find_vertical_indices(points, columns)
+        rev_indices, rev_norm_distances, rev_out_of_bounds = \
+            _RegularGridInterpolator._find_vertical_indices(points, columns[:, ::-1])
+
+        assert_array_almost_equal(rev_indices, size - 2 - indices)
+        assert_array_almost_equal(rev_norm_distances, 1 - norm_distances)
+        assert_array_almost_equal(rev_out_of_bounds, out_of_bounds)
+
     def test_invalid_fill_value(self):
         np.random.seed(1234)
         x = np.linspace(0, 2, 5)
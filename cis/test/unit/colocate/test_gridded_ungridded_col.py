@@ -74,6 +74,27 @@ class TestGriddedUngriddedCollocator(unittest.TestCase):
         assert isinstance(output, UngriddedDataList)
         assert np.array_equal(output[0].data.mask, sample_mask)
 
+    def test_variables_on_same_grid_collocated_together_match_each_variable_alone(self):
+        data_list = [make_from_cube(mock.make_mock_cube(time_dim_length=3)),
+                     make_from_cube(mock.make_mock_cube(time_dim_length=3, data_offset=100))]
+        sample = UngriddedData.from_points_array(
+            [HyperPoint(lat=1.0, lon=1.0, t=dt.datetime(1984, 8, 28, 8, 34)),
+             HyperPoint(lat=3.0, lon=3.0, t=dt.datetime(1984, 8, 28, 8, 34)),
+             HyperPoint(lat=-1.0, lon=-1.0, t=dt.datetime(1984, 8, 28, 0, 0)),
+             HyperPoint(lat=40.0, lon=-1.0, t=dt.datetime(1984, 8, 28, 8, 34))])
+        sample.data = np.ma.array([0, 0, 0, 0], mask=[False, True, False, False])
+
+        output = GriddedUngriddedCollocator(missing_data_for_missing_sample=True).collocate(sample, data_list, None,
+                                                                                           'linear')
+
+        assert len(output) == 2
+        for data, together in zip(data_list, output):
+            alone = GriddedUngriddedCollocator(missing_data_for_missing_sample=True).collocate(sample, data, None,
+                                                                                              'linear')[0]
+            assert_equal(together.data.mask, [False, True, False, True])
+            assert_equal(together.data.mask, alone.data.mask)
+            assert_almost_equal(together.data.compressed(), alone.data.compressed())
+
     def test_no_missing_data_for_missing_sample(self):
         data = make_from_cube(mock.make_mock_cube())
         data.name = lambda: 'Name'
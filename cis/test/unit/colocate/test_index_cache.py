@@ -0,0 +1,77 @@
+"""
+Tests the persistent cache of indexes
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from hamcrest import assert_that, is_
+
+from cis.collocation import data_index
+from cis.collocation.col_implementations import make_coord_map, BinnedCubeCellOnlyConstraint, nn_horizontal_kdtree
+from cis.data_io.hyperpoint import HyperPoint
+from cis.test.util import mock
+
+
+class TestIndexCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        data_index.enable_index_cache(self.directory)
+
+    def tearDown(self):
+        data_index.disable_index_cache()
+        shutil.rmtree(self.directory)
+
+    def _index_binned_data(self, data):
+        sample_cube = mock.make_square_5x3_2d_cube()
+        coord_map = make_coord_map(sample_cube, data)
+        coords = sample_cube.coords()
+        for (hpi, ci, shi) in coord_map:
+            if not coords[ci].has_bounds():
+                coords[ci].guess_bounds()
+        constraint = BinnedCubeCellOnlyConstraint()
+        data_index.create_indexes(constraint, coords, data.get_non_masked_points(), coord_map)
+        return constraint.grid_cell_bin_index_slices
+
+    def test_GIVEN_index_created_WHEN_same_data_indexed_again_THEN_index_loaded_from_cache(self):
+        data = mock.make_regular_2d_ungridded_data()
+        built_index = self._index_binned_data(data)
+        assert_that(len(os.listdir(self.directory)), is_(1))
+
+        original_index_data = data_index.GridCellBinIndexInSlices.index_data
+        try:
+            data_index.GridCellBinIndexInSlices.index_data = None
+            cached_index = self._index_binned_data(data)
+        finally:
+            data_index.GridCellBinIndexInSlices.index_data = original_index_data
+
+        assert_that(cached_index.sort_order.tolist(), is_(built_index.sort_order.tolist()))
+        assert_that(cached_index.cell_numbers.tolist(), is_(built_index.cell_numbers.tolist()))
+        assert_that(list(cached_index.get_iterator())[0][0], is_(list(built_index.get_iterator())[0][0]))
+
+    def test_GIVEN_different_data_WHEN_indexed_THEN_new_index_created(self):
+        self._index_binned_data(mock.make_regular_2d_ungridded_data())
+        self._index_binned_data(mock.make_regular_2d_ungridded_data(lat_min=-5))
+        assert_that(len(os.listdir(self.directory)), is_(2))
+
+    def test_GIVEN_cache_too_large_WHEN_index_saved_THEN_least_recently_used_removed(self):
+        data_index.enable_index_cache(self.directory, max_size=1)
+        self._index_binned_data(mock.make_regular_2d_ungridded_data())
+        self._index_binned_data(mock.make_regular_2d_ungridded_data(lat_min=-5))
+        assert_that(len(os.listdir(self.directory)), is_(0))
+
+    def test_GIVEN_haversine_index_WHEN_indexed_THEN_not_cached(self):
+        # Building the k-D tree is as quick as loading it, so it is not worth caching.
+        data = mock.make_regular_2d_ungridded_data().get_non_masked_points()
+        kernel = nn_horizontal_kdtree()
+        data_index.create_indexes(kernel, None, data, None)
+        assert_that(kernel.haversine_distance_kd_tree_index.find_nearest_point(HyperPoint(lat=4.0, lon=4.0)),
+                    is_(11))
+        assert_that(len(os.listdir(self.directory)), is_(0))
+
+    def test_GIVEN_cache_disabled_WHEN_indexed_THEN_nothing_stored(self):
+        data_index.disable_index_cache()
+        self._index_binned_data(mock.make_regular_2d_ungridded_data())
+        assert_that(len(os.listdir(self.directory)), is_(0))
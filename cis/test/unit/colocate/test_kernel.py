@@ -284,6 +284,23 @@ class TestNNAltitude(unittest.TestCase):
         eq_(new_data.data[2], 46.0)
 
 
+    def test_masked_data_and_altitude_separation_in_col_ungridded_to_ungridded(self):
+        from cis.collocation.col_implementations import GeneralUngriddedCollocator, nn_altitude, SepConstraintKdtree
+
+        ug_data = UngriddedData.from_points_array(
+            [HyperPoint(lat=0.0, lon=0.0, alt=10.0, val=1.0), HyperPoint(lat=0.0, lon=0.0, alt=20.0, val=2.0),
+             HyperPoint(lat=0.0, lon=0.0, alt=20.0, val=3.0), HyperPoint(lat=0.0, lon=0.0, alt=40.0, val=4.0)])
+        ug_data.data = np.ma.array(ug_data.data, mask=[False, True, False, False])
+        sample_points = UngriddedData.from_points_array(
+            [HyperPoint(lat=0.0, lon=0.0, alt=19.0), HyperPoint(lat=0.0, lon=0.0, alt=30.0),
+             HyperPoint(lat=0.0, lon=0.0, alt=100.0)])
+        col = GeneralUngriddedCollocator()
+        new_data = col.collocate(sample_points, ug_data, SepConstraintKdtree(a_sep=15), nn_altitude())[0]
+        # The masked point is ignored and the first of equally near points is used
+        eq_(new_data.data[0], 3.0)
+        eq_(new_data.data[1], 3.0)
+        assert new_data.data.mask[2]
+
 class TestNNPressure(unittest.TestCase):
     def test_basic_col_with_incompatible_points_throws_a_TypeError(self):
         from cis.collocation.col_implementations import GeneralUngriddedCollocator, nn_pressure, DummyConstraint
@@ -373,5 +390,88 @@ class TestMean(unittest.TestCase):
         eq_(new_data.data[0], 25.5)
 
 
+class TestDataOnlyKernelsInGroups(unittest.TestCase):
+    def setUp(self):
+        self.values = np.array([1.0, 2.0, 3.0, 4.0, 10.0])
+        # Groups: [1, 2, 3], [], [4], [10]
+        self.offsets = np.array([0, 3, 3, 4, 5])
+
+    def test_mean_in_groups(self):
+        from cis.collocation.col_implementations import mean
+        result = mean().get_value_for_data_only_in_groups(self.values, self.offsets)
+        assert_equal(result.mask, [[False, True, False, False]])
+        assert_almost_equal(result[0].compressed(), [2.0, 4.0, 10.0])
+
+    def test_min_max_sum_in_groups(self):
+        from cis.collocation.col_implementations import min, max, sum
+        assert_almost_equal(min().get_value_for_data_only_in_groups(self.values, self.offsets)[0].compressed(),
+                            [1.0, 4.0, 10.0])
+        assert_almost_equal(max().get_value_for_data_only_in_groups(self.values, self.offsets)[0].compressed(),
+                            [3.0, 4.0, 10.0])
+        assert_almost_equal(sum().get_value_for_data_only_in_groups(self.values, self.offsets)[0].compressed(),
+                            [6.0, 4.0, 10.0])
+
+    def test_moments_in_groups_matches_point_by_point(self):
+        from cis.collocation.col_implementations import moments
+        kernel = moments()
+        result = kernel.get_value_for_data_only_in_groups(self.values, self.offsets)
+        expected_mean, expected_stddev, expected_num = kernel.get_value_for_data_only(self.values[0:3])
+        assert_almost_equal(result[:, 0], [expected_mean, expected_stddev, expected_num])
+        # Groups with a single point have no standard deviation, empty groups are masked completely
+        assert_equal(result.mask[:, 1], [True, True, True])
+        assert_equal(result.mask[:, 2], [False, True, False])
+        assert_almost_equal(result[2].compressed(), [3, 1, 1])
+
+
+class TestDistanceWeightedKernels(unittest.TestCase):
+    def setUp(self):
+        import datetime as dt
+        self.data = mock.make_regular_2d_ungridded_data()
+        self.sample = UngriddedData.from_points_array(
+            [HyperPoint(lat=1.0, lon=1.0, alt=12.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=3.0, lon=3.0, alt=7.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=-5.0, lon=0.0, alt=5.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=40.0, lon=40.0, alt=5.0, t=dt.datetime(1984, 8, 29, 8, 34))])
+
+    def test_idw_in_groups(self):
+        from cis.collocation.col_implementations import idw
+        values = np.array([1.0, 3.0, 4.0, 10.0])
+        distances = np.array([1.0, 2.0, 5.0, 0.0])
+        result = idw().get_value_for_distances_in_groups(values, distances, np.array([0, 2, 2, 3, 4]))
+        assert_equal(result.mask, [[False, True, False, False]])
+        assert_almost_equal(result[0].compressed(), [(1.0 + 3.0 / 4) / (1 + 1.0 / 4), 4.0, 10.0])
+
+    def test_gaussian_in_groups(self):
+        from cis.collocation.col_implementations import gaussian
+        values = np.array([1.0, 3.0])
+        distances = np.array([0.0, 10.0])
+        result = gaussian('10km').get_value_for_distances_in_groups(values, distances, np.array([0, 2]))
+        weight = np.exp(-0.5)
+        assert_almost_equal(result[0], [(1.0 + 3.0 * weight) / (1.0 + weight)])
+
+    def test_idw_at_data_point_gives_data_value(self):
+        from cis.collocation.col_implementations import GeneralUngriddedCollocator, idw, SepConstraintKdtree
+        output = GeneralUngriddedCollocator().collocate(self.sample, self.data, SepConstraintKdtree('500km'), idw())
+        assert_almost_equal(output[0].data[2], 5.0)
+
+    def test_distance_weighted_kernels_in_batch_match_point_by_point(self):
+        from cis.collocation.col_implementations import GeneralUngriddedCollocator, idw, gaussian, \
+            SepConstraintKdtree, DummyConstraint
+        for kernel in [idw(), idw(power=1), gaussian('300km')]:
+            for constraint in [SepConstraintKdtree('500km'), DummyConstraint()]:
+                col = GeneralUngriddedCollocator()
+                batch_output = col.collocate(self.sample, self.data, constraint, kernel)
+                col._can_collocate_in_batch = lambda constraint, kernel: False
+                point_output = col.collocate(self.sample, self.data, constraint, kernel)
+                assert_equal(batch_output[0].data.mask, point_output[0].data.mask)
+                assert_almost_equal(batch_output[0].data.compressed(), point_output[0].data.compressed())
+
+    def test_gaussian_without_sigma_raises_error(self):
+        from cis.collocation.col_implementations import gaussian
+        from cis.exceptions import InvalidCommandLineOptionError
+        with self.assertRaises(InvalidCommandLineOptionError):
+            gaussian()
+
+
 if __name__ == '__main__':
     unittest.main()
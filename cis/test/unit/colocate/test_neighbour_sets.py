@@ -0,0 +1,117 @@
+"""
+Tests the sets of data points found for each sample point
+"""
+import datetime as dt
+import unittest
+
+from hamcrest import assert_that, is_
+from mock import MagicMock
+import numpy as np
+
+from cis.collocation import neighbour_sets
+from cis.collocation.col_implementations import GeneralUngriddedCollocator, SepConstraintKdtree, mean, moments
+from cis.collocation.neighbour_sets import NeighbourSets, NeighbourSetStore
+from cis.data_io.hyperpoint import HyperPoint
+from cis.data_io.ungridded_data import UngriddedData
+from cis.test.util import mock
+
+
+def _make_blocks():
+    blocks = [np.array([0, 2]), np.array([3])]
+    results = [(np.array([0, 2, 3]), np.array([5, 7, 1])), (np.array([0, 2]), np.array([4, 6]))]
+    return blocks, results
+
+
+class TestNeighbourSets(unittest.TestCase):
+
+    def test_GIVEN_sets_for_blocks_WHEN_groups_requested_THEN_sets_for_sample_points_returned(self):
+        blocks, results = _make_blocks()
+        sets = NeighbourSets.from_blocks(4, blocks, results)
+        offsets, indices = sets.get_groups(np.array([3, 1, 0]))
+        assert_that(offsets.tolist(), is_([0, 2, 2, 4]))
+        assert_that(indices.tolist(), is_([4, 6, 5, 7]))
+        assert_that(sets.spilled, is_(False))
+
+    def test_GIVEN_sets_larger_than_memory_WHEN_created_THEN_spilled_to_disk_with_same_sets(self):
+        blocks, results = _make_blocks()
+        sets = NeighbourSets.from_blocks(4, blocks, results, max_memory=8)
+        try:
+            assert_that(sets.spilled, is_(True))
+            offsets, indices = sets.get_groups(np.array([0, 2, 3]))
+            assert_that(offsets.tolist(), is_([0, 2, 3, 5]))
+            assert_that(indices.tolist(), is_([5, 7, 1, 4, 6]))
+        finally:
+            sets.close()
+
+
+class TestNeighbourSetStoreLimits(unittest.TestCase):
+
+    def test_GIVEN_more_sets_than_maximum_WHEN_added_THEN_least_recently_used_removed(self):
+        store = NeighbourSetStore(max_sets=2)
+        sets = [NeighbourSets.from_blocks(4, *_make_blocks()) for _ in range(3)]
+        sets[1].close = MagicMock()
+        store.add('a', sets[0])
+        store.add('b', sets[1])
+        assert_that(store.get('a'), is_(sets[0]))
+        store.add('c', sets[2])
+        assert_that(store.get('b'), is_(None))
+        sets[1].close.assert_called_once_with()
+        assert_that(store.get('a'), is_(sets[0]))
+        assert_that(store.get('c'), is_(sets[2]))
+
+    def test_GIVEN_sets_larger_than_memory_WHEN_added_THEN_older_sets_removed(self):
+        sets = [NeighbourSets.from_blocks(4, *_make_blocks()) for _ in range(2)]
+        store = NeighbourSetStore(max_memory=sets[0].nbytes + 1)
+        store.add('a', sets[0])
+        store.add('b', sets[1])
+        assert_that(store.get('a'), is_(None))
+        assert_that(store.get('b'), is_(sets[1]))
+        assert_that(store.memory_used, is_(sets[1].nbytes))
+
+
+class TestNeighbourSetsWithoutStore(unittest.TestCase):
+
+    def test_GIVEN_no_store_WHEN_collocated_THEN_sets_found_a_block_at_a_time(self):
+        data = mock.make_regular_2d_ungridded_data()
+        sample = UngriddedData.from_points_array(
+            [HyperPoint(lat=1.0, lon=1.0, alt=12.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=3.0, lon=3.0, alt=7.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=40.0, lon=40.0, alt=5.0, t=dt.datetime(1984, 8, 29, 8, 34))])
+        neighbour_sets.enable_neighbour_set_store()
+        try:
+            expected = GeneralUngriddedCollocator().collocate(sample, data, SepConstraintKdtree('500km'), mean())
+        finally:
+            neighbour_sets.disable_neighbour_set_store()
+
+        col = GeneralUngriddedCollocator()
+        col._get_neighbour_sets = None
+        output = col.collocate(sample, data, SepConstraintKdtree('500km'), mean())
+        assert np.array_equal(expected[0].data.mask, output[0].data.mask)
+        assert np.allclose(expected[0].data.compressed(), output[0].data.compressed())
+
+
+class TestNeighbourSetStore(unittest.TestCase):
+
+    def setUp(self):
+        neighbour_sets.enable_neighbour_set_store()
+
+    def tearDown(self):
+        neighbour_sets.disable_neighbour_set_store()
+
+    def test_GIVEN_store_enabled_WHEN_collocated_with_different_kernels_THEN_sets_found_once(self):
+        data = mock.make_regular_2d_ungridded_data()
+        sample = UngriddedData.from_points_array(
+            [HyperPoint(lat=1.0, lon=1.0, alt=12.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=3.0, lon=3.0, alt=7.0, t=dt.datetime(1984, 8, 29, 8, 34)),
+             HyperPoint(lat=40.0, lon=40.0, alt=5.0, t=dt.datetime(1984, 8, 29, 8, 34))])
+        col = GeneralUngriddedCollocator()
+        mean_output = col.collocate(sample, data, SepConstraintKdtree('500km'), mean())
+
+        constraint = SepConstraintKdtree('500km')
+        constraint.constrain_points_in_batch = None
+        moments_output = col.collocate(sample, data, constraint, moments())
+
+        store = neighbour_sets.get_neighbour_set_store()
+        assert_that(len(store._sets), is_(1))
+        assert np.array_equal(mean_output[0].data.mask, moments_output[0].data.mask)
+        assert np.allclose(mean_output[0].data.compressed(), moments_output[0].data.compressed())
@@ -0,0 +1,125 @@
+"""
+Tests the regridding of gridded data between rectilinear grids
+"""
+import shutil
+import tempfile
+import unittest
+
+from hamcrest import assert_that, is_
+import iris.analysis
+from mock import patch
+import numpy as np
+
+from cis.collocation import data_index, regrid
+from cis.collocation.regrid import RectilinearRegridder, ConservativeRegridder, get_regridder
+from cis.test.util import mock
+
+
+def _make_masked_cube():
+    cube = mock.make_mock_cube(lat_dim_length=7, lon_dim_length=12, lon_range=(0., 330.), time_dim_length=3)
+    cube.data = np.ma.masked_array(np.random.RandomState(0).rand(*cube.shape))
+    cube.data[2, 3, 1] = np.ma.masked
+    cube.data[5, 11, 0] = np.ma.masked
+    cube.coord('longitude').circular = True
+    return cube
+
+
+def _get_sample_points():
+    return [np.linspace(-12, 12, 9), np.linspace(-40, 350, 14)]
+
+
+class TestRectilinearRegridder(unittest.TestCase):
+
+    def _assert_same_as_iris(self, cube, method, extrapolate):
+        latitudes, longitudes = _get_sample_points()
+        regridder = RectilinearRegridder.from_coords([cube.coord('latitude'), cube.coord('longitude')],
+                                                     [latitudes, longitudes], method, extrapolate)
+        result = regridder(cube.data, [0, 1])
+
+        scheme = iris.analysis.Linear if method == 'linear' else iris.analysis.Nearest
+        expected = cube.interpolate([('latitude', latitudes), ('longitude', longitudes)],
+                                    scheme(extrapolation_mode='extrapolate' if extrapolate else 'mask')).data
+        assert np.array_equal(np.ma.getmaskarray(result), np.ma.getmaskarray(expected))
+        assert np.allclose(result.compressed(), expected.compressed())
+
+    def test_GIVEN_masked_circular_data_WHEN_regridded_linearly_THEN_same_as_iris(self):
+        self._assert_same_as_iris(_make_masked_cube(), 'linear', False)
+
+    def test_GIVEN_masked_circular_data_WHEN_regridded_to_nearest_with_extrapolation_THEN_same_as_iris(self):
+        self._assert_same_as_iris(_make_masked_cube(), 'nearest', True)
+
+    def test_GIVEN_decreasing_latitude_WHEN_regridded_THEN_same_as_iris(self):
+        self._assert_same_as_iris(_make_masked_cube()[::-1], 'linear', True)
+
+
+class TestConservativeRegridder(unittest.TestCase):
+
+    def _make_grid(self, lat_cells, lon_cells, lat_range, lon_start, time_dim_length=0):
+        from iris.coords import DimCoord
+        from iris.cube import Cube
+        lat_edges = np.linspace(lat_range[0], lat_range[1], lat_cells + 1)
+        lon_edges = np.linspace(lon_start, lon_start + 360, lon_cells + 1)
+        coords = [(DimCoord((lat_edges[:-1] + lat_edges[1:]) / 2, standard_name='latitude', units='degrees',
+                            bounds=np.column_stack((lat_edges[:-1], lat_edges[1:]))), 0),
+                  (DimCoord((lon_edges[:-1] + lon_edges[1:]) / 2, standard_name='longitude', units='degrees',
+                            bounds=np.column_stack((lon_edges[:-1], lon_edges[1:])), circular=True), 1)]
+        shape = (lat_cells, lon_cells)
+        if time_dim_length:
+            coords.append((DimCoord(np.arange(time_dim_length, dtype=float), standard_name='time',
+                                    units='days since 2000-01-01'), 2))
+            shape += (time_dim_length,)
+        return Cube(np.ma.masked_less(np.random.RandomState(0).rand(*shape), 0.01), dim_coords_and_dims=coords)
+
+    def _regrid(self, source, target, mdtol):
+        horizontal = ['latitude', 'longitude']
+        regridder = ConservativeRegridder.from_coords([source.coord(c) for c in horizontal],
+                                                      [target.coord(c) for c in horizontal])
+        return regridder(source.data, [0, 1], mdtol)
+
+    def test_GIVEN_masked_data_WHEN_regridded_THEN_same_as_iris_area_weighted(self):
+        source = self._make_grid(36, 72, (-90, 90), -180, time_dim_length=3)
+        target = self._make_grid(10, 16, (-60, 80), -170)
+        for mdtol in [0, 0.5]:
+            result = self._regrid(source, target, mdtol)
+            expected = source.regrid(target, iris.analysis.AreaWeighted(mdtol=mdtol)).data
+            assert np.array_equal(np.ma.getmaskarray(result), np.ma.getmaskarray(expected))
+            assert np.allclose(result.compressed(), expected.compressed())
+
+    def test_GIVEN_global_grids_WHEN_regridded_THEN_area_weighted_total_conserved(self):
+        from iris.analysis.cartography import area_weights
+        source = self._make_grid(36, 72, (-90, 90), -180)
+        source.data = np.ma.getdata(source.data)
+        target = self._make_grid(12, 20, (-90, 90), -171)
+        result = target.copy(data=self._regrid(source, target, 0))
+        assert_that(result.data.count(), is_(result.data.size))
+        assert np.allclose((result.data * area_weights(result)).sum(), (source.data * area_weights(source)).sum())
+
+
+class TestGetRegridder(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        data_index.enable_index_cache(self.directory)
+        regrid._last_regridder = (None, None)
+
+    def tearDown(self):
+        data_index.disable_index_cache()
+        regrid._last_regridder = (None, None)
+        shutil.rmtree(self.directory)
+
+    def test_GIVEN_same_grids_WHEN_regridder_requested_again_THEN_weights_reused(self):
+        cube = _make_masked_cube()
+        coords = [cube.coord('latitude'), cube.coord('longitude')]
+        regridder = get_regridder(coords, _get_sample_points())
+        assert_that(get_regridder(coords, _get_sample_points()) is regridder, is_(True))
+
+    def test_GIVEN_weights_cached_on_disk_WHEN_regridder_requested_in_new_run_THEN_loaded_with_same_weights(self):
+        cube = _make_masked_cube()
+        coords = [cube.coord('latitude'), cube.coord('longitude')]
+        regridder = get_regridder(coords, _get_sample_points(), 'linear')
+        regrid._last_regridder = (None, None)
+
+        with patch.object(RectilinearRegridder, 'from_coords') as from_coords:
+            loaded = get_regridder(coords, _get_sample_points(), 'linear')
+        assert_that(from_coords.called, is_(False))
+        assert np.array_equal(loaded(cube.data, [0, 1]), regridder(cube.data, [0, 1]))
@@ -1,4 +1,5 @@
 from hamcrest import *
+from mock import patch
 from nose.tools import istest, raises
 import numpy
 from cis.data_io.Coord import Coord, CoordList
@@ -101,3 +102,25 @@ def can_not_convert_time_without_since_in_units_with_no_units():
     coord = Coord(times, Metadata(units=units))
 
     coord.convert_to_std_time(time_stamp_info)
+
+
+@istest
+def can_set_longitude_range_in_place_once():
+    lons = numpy.array([0., 90., 180., 270.])
+    coord = Coord(lons, Metadata(standard_name='longitude'), axis='X')
+    coord.set_longitude_range(-180.0)
+    assert coord.data is lons
+    assert numpy.array_equal(coord.data, [0, 90, -180, -90])
+
+    with patch('cis.data_io.Coord.fix_longitude_range') as fix_longitude_range:
+        coord.set_longitude_range(-180.0)
+    assert not fix_longitude_range.called
+
+
+@istest
+def can_set_longitude_range_again_after_data_replaced():
+    coord = Coord(numpy.array([0., 90., 180., 270.]), Metadata(standard_name='longitude'), axis='X')
+    coord.set_longitude_range(-180.0)
+    coord.data = numpy.array([0., 90., 180., 270.])
+    coord.set_longitude_range(-180.0)
+    assert numpy.array_equal(coord.data, [0, 90, -180, -90])
@@ -1,6 +1,7 @@
 from nose.tools import istest, nottest, raises
 import numpy as np
 
+from cis.data_io.hyperpoint import HyperPoint
 from cis.data_io.hyperpoint_view import UngriddedHyperPointView, GriddedHyperPointView
 import cis.test.util.mock as mock
 import cis.data_io.gridded_data as gridded_data
@@ -139,6 +140,36 @@ class TestUngriddedHyperPointView(object):
         assert(hpv[8].longitude == 180.0)
         assert(hpv[44].longitude == 180.0)
 
+    @istest
+    def test_setting_longitude_range_leaves_data_longitudes_unchanged(self):
+        ug = mock.make_regular_2d_ungridded_data(lon_min=0., lon_max=270.)
+        hpv = ug.get_all_points()
+        hpv.set_longitude_range(-180.0)
+        assert(np.max(hpv.longitudes) < 180.0)
+        assert(np.max(ug.lon.points) == 270.0)
+
+    @istest
+    def test_can_get_coordinate_and_value_arrays(self):
+        ug = mock.make_regular_2d_ungridded_data_with_missing_values()
+        hpv = ug.get_non_masked_points()
+        coords = hpv.get_coord_arrays()
+        assert(coords[HyperPoint.LATITUDE] is hpv.latitudes)
+        assert(coords[HyperPoint.ALTITUDE] is None)
+        assert(np.array_equal(hpv.get_non_masked_indices(), [i for i, p in hpv.enumerate_non_masked_points()]))
+        for i, p in hpv.enumerate_non_masked_points():
+            assert(coords[HyperPoint.LONGITUDE][i] == p.longitude)
+            assert(hpv.get_value_array()[i] == p.val[0])
+
+    @istest
+    def test_can_get_points_at_indices(self):
+        ug = mock.make_regular_4d_ungridded_data()
+        hpv = ug.get_all_points()
+        indices = np.array([7, 0, 12])
+        points = hpv.get_points(indices)
+        assert(len(points) == 3)
+        for i, p in zip(indices, points):
+            assert(p == hpv[i])
+
 
 class TestGriddedHyperPointView(object):
     """
@@ -329,6 +360,41 @@ class TestGriddedHyperPointView(object):
         assert(hpv[0, 8].longitude == 180.0)
         assert(hpv[4, 8].longitude == 180.0)
 
+    @istest
+    def test_can_get_coordinate_and_value_arrays(self):
+        gd = gridded_data.make_from_cube(mock.make_5x3_lon_lat_2d_cube_with_missing_data())
+        hpv = gd.get_non_masked_points()
+        coords = hpv.get_coord_arrays()
+        assert(coords[HyperPoint.TIME] is None)
+        assert(np.array_equal(hpv.get_non_masked_indices(), [0, 1, 2, 3, 5, 6, 7, 9, 10, 11, 13, 14]))
+        for i, p in hpv.enumerate_non_masked_points():
+            assert(coords[HyperPoint.LATITUDE][i] == p.latitude)
+            assert(coords[HyperPoint.LONGITUDE][i] == p.longitude)
+            assert(hpv.get_value_array()[i] == p.val[0])
+        assert(hpv.get_coord_arrays() is coords)
+
+    @istest
+    def test_can_get_points_at_indices(self):
+        gd = gridded_data.make_from_cube(mock.make_5x3_lon_lat_2d_cube_with_missing_data())
+        hpv = gd.get_all_points()
+        indices = np.array([14, 4, 0, 8])
+        points = hpv.get_points(indices)
+        assert(len(points) == 4)
+        for i, p in zip(indices, points):
+            assert(p.coord_tuple == hpv[i].coord_tuple)
+            assert(p.val[0] is np.ma.masked if hpv[i].val[0] is np.ma.masked else p.val == hpv[i].val)
+
+    @istest
+    def test_coordinate_arrays_follow_change_of_longitude_range(self):
+        gd = gridded_data.make_from_cube(mock.make_mock_cube(lat_dim_length=5, lon_dim_length=9))
+        gd.coord('longitude').points = np.array([-180., -135., -90., -45., 0., 45., 90., 135., 180.])
+        hpv = gd.get_non_masked_points()
+        hpv.get_coord_arrays()
+        hpv.set_longitude_range(0.0)
+        longitudes = hpv.get_coord_arrays()[HyperPoint.LONGITUDE]
+        assert(np.min(longitudes) >= 0.0)
+        assert(longitudes[9 + 1] == hpv[1, 1].longitude == 225.0)
+
 
 # if __name__ == '__main__':
 #     import nose
@@ -51,6 +51,70 @@ class TestUngriddedData(TestCase):
         ug.add_history(new_history)
         assert(ug.metadata.history.find(new_history) >= 0)
 
+    def test_GIVEN_range_of_points_WHEN_slice_points_THEN_returns_those_points(self):
+        ug = make_regular_2d_ungridded_data_with_missing_values()
+        sliced = ug.slice_points(4, 9)
+        assert_that(sliced.data.tolist(), is_(ug.data_flattened[4:9].tolist()))
+        assert_that(sliced.lat.points.tolist(), is_(ug.lat.data_flattened[4:9].tolist()))
+        assert_that(sliced.lon.points.tolist(), is_(ug.lon.data_flattened[4:9].tolist()))
+        assert_that(sliced.shape, is_((5,)))
+        assert_that(ug.shape, is_((5, 3)))
+
+    def test_GIVEN_unread_netcdf_variables_WHEN_slice_points_THEN_only_rows_containing_points_read(self):
+        class Variable(object):
+            """A stand-in for a NetCDF variable which records the indices read"""
+            def __init__(self, values):
+                self.values = values
+                self.shape = values.shape
+                self.dtype = values.dtype
+                self.indices_read = []
+
+            def set_auto_scale(self, value):
+                pass
+
+            def __getitem__(self, item):
+                self.indices_read.append(item)
+                return np.ma.masked_array(self.values[item])
+
+        y, x = np.meshgrid(np.arange(-5, 6, 5), np.arange(-10, 11, 5))
+        variables = [Variable(x.astype(float)), Variable(y.astype(float)), Variable(np.arange(15.0).reshape(5, 3))]
+        ug = UngriddedData(variables[2], Metadata(shape=(5, 3)),
+                           [Coord(variables[0], Metadata(standard_name='latitude', units='degrees')),
+                            Coord(variables[1], Metadata(standard_name='longitude', units='degrees'))])
+
+        sliced = ug.slice_points(4, 9)
+        assert_that(ug.get_number_of_points(), is_(15))
+        assert_that(sliced.shape, is_((5,)))
+        assert_that([v.indices_read for v in variables], is_([[], [], []]))
+        assert_that(sliced.data.tolist(), is_(list(range(4, 9))))
+        assert_that(sliced.lat.points.tolist(), is_(x.ravel()[4:9].tolist()))
+        assert_that(sliced.lon.points.tolist(), is_(y.ravel()[4:9].tolist()))
+        assert_that([v.indices_read for v in variables], is_([[slice(1, 3)]] * 3))
+
+    def test_GIVEN_data_appended_in_chunks_WHEN_read_THEN_same_as_data_saved_at_once(self):
+        import os
+        import tempfile
+        from netCDF4 import Dataset
+        from cis.data_io.write_netcdf import append_data
+        ug = make_regular_2d_ungridded_data_with_missing_values()
+        directory = tempfile.mkdtemp()
+        whole_filename = os.path.join(directory, 'whole.nc')
+        chunked_filename = os.path.join(directory, 'chunked.nc')
+        try:
+            ug.save_data(whole_filename)
+            for start in range(0, 15, 4):
+                append_data(ug.slice_points(start, start + 4), chunked_filename, create=(start == 0))
+            with Dataset(whole_filename) as whole, Dataset(chunked_filename) as chunked:
+                assert_that(chunked.dimensions['obs'].isunlimited())
+                assert_that(sorted(chunked.variables), is_(sorted(whole.variables)))
+                for name in whole.variables:
+                    assert_that(chunked.variables[name][:].tolist(), is_(whole.variables[name][:].tolist()))
+        finally:
+            for filename in (whole_filename, chunked_filename):
+                if os.path.exists(filename):
+                    os.remove(filename)
+            os.rmdir(directory)
+
     def test_GIVEN_numpy_array_data_with_missing_coordinate_values_WHEN_data_THEN_missing_values_removed(self):
         x_points = np.arange(-10, 11, 5)
         y_points = np.arange(-5, 6, 5)
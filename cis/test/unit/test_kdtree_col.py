@@ -3,7 +3,6 @@ import datetime as dt
 from hamcrest import *
 from nose.tools import istest, eq_
 import numpy as np
-from cis.collocation.kdtree import KDTree
 
 import cis.data_io.gridded_data as gridded_data
 from cis.data_io.hyperpoint import HyperPoint, HyperPointList
@@ -84,6 +83,16 @@ class Test_nn_horizontal_kdtree(object):
         eq_(new_data.data[2], 10.0)
         eq_(new_data.data[3], 4.0)
 
+    @istest
+    def test_horizontal_separation_limits_the_distance_to_the_nearest_point(self):
+        ug_data = mock.make_regular_2d_ungridded_data()
+        # The first point is about 150km from the nearest data point, the second is on a data point
+        sample_points = UngriddedData.from_points_array([HyperPoint(lat=1.0, lon=1.0), HyperPoint(lat=5.0, lon=5.0)])
+        col = GeneralUngriddedCollocator(fill_value=-999)
+        new_data = col.collocate(sample_points, ug_data, SepConstraintKdtree(h_sep=100), nn_horizontal_kdtree())[0]
+        assert new_data.data.mask[0]
+        eq_(new_data.data[1], 12.0)
+
 
 class TestSepConstraint(object):
     @istest
@@ -194,29 +203,157 @@ class TestSepConstraint(object):
         eq_(ref_vals.size, new_vals.size)
         assert (np.equal(ref_vals, new_vals).all())
 
-    def get_max_depth(self, node, depth):
-        if isinstance(node, KDTree.leafnode):
-            return depth
-        return max(self.get_max_depth(node.less, depth + 1), self.get_max_depth(node.greater, depth + 1))
+    @istest
+    def test_all_constraints_in_4d_for_block_of_sample_points_match_exhaustive_search(self):
+        from cis.collocation.col_implementations import SepConstraint
+        ug_data = mock.make_regular_4d_ungridded_data()
+        ug_data_points = ug_data.get_non_masked_points()
+        sample_points = UngriddedData.from_points_array(
+            [HyperPoint(lat=0.0, lon=0.0, alt=50.0, pres=50.0, t=dt.datetime(1984, 8, 29)),
+             HyperPoint(lat=5.0, lon=-5.0, alt=30.0, pres=30.0, t=dt.datetime(1984, 9, 1)),
+             HyperPoint(lat=-10.0, lon=5.0, alt=91.0, pres=90.0, t=dt.datetime(1984, 9, 4, 12))]).get_all_points()
+        separations = dict(h_sep=1000, a_sep=15, p_sep=1.22, t_sep='P1dT1M')
+
+        constraint = SepConstraintKdtree(**separations)
+        index = HaversineDistanceKDTreeIndex()
+        index.index_data(None, ug_data_points, None)
+        constraint.haversine_distance_kd_tree_index = index
+
+        sample_coords = sample_points.get_coord_arrays()
+        data_coords = ug_data_points.get_coord_arrays()
+        data_indices = np.arange(len(ug_data_points))
+        offsets, indices = constraint.constrain_points_in_batch(sample_coords, data_coords, data_indices)
+        ref_offsets, ref_indices = SepConstraint(**separations).constrain_points_in_batch(sample_coords, data_coords,
+                                                                                         data_indices)
+        assert_that(offsets.tolist(), is_(ref_offsets.tolist()))
+        assert_that(indices.tolist(), is_(ref_indices.tolist()))
+        assert_that(offsets[-1], greater_than(0))
+
+    @istest
+    def test_points_at_exactly_the_horizontal_separation_kept_with_and_without_other_separations(self):
+        from cis.utils import haversine_for_arrays
+        ug_data_points = mock.make_regular_4d_ungridded_data().get_non_masked_points()
+        sample_points = UngriddedData.from_points_array(
+            [HyperPoint(lat=0.0, lon=0.0, alt=50.0, pres=50.0, t=dt.datetime(1984, 8, 29))]).get_all_points()
+        sample_coords = sample_points.get_coord_arrays()
+        data_coords = ug_data_points.get_coord_arrays()
+        data_indices = np.arange(len(ug_data_points))
+        distances = haversine_for_arrays(data_coords[HyperPoint.LATITUDE], data_coords[HyperPoint.LONGITUDE],
+                                         sample_coords[HyperPoint.LATITUDE], sample_coords[HyperPoint.LONGITUDE])
+        # Use the distance to one of the data points as the separation, so that the point is exactly on the boundary.
+        h_sep = np.sort(np.unique(distances))[2]
+        ref_indices = np.flatnonzero(distances <= h_sep)
+
+        for separations in (dict(h_sep=h_sep), dict(h_sep=h_sep, a_sep=1e6)):
+            constraint = SepConstraintKdtree(**separations)
+            index = HaversineDistanceKDTreeIndex()
+            index.index_data(None, ug_data_points, None)
+            if constraint.haversine_distance_kd_tree_index is None:
+                constraint.haversine_distance_kd_tree_index = index
+            offsets, indices = constraint.constrain_points_in_batch(sample_coords, data_coords, data_indices)
+            assert_that(sorted(indices.tolist()), is_(ref_indices.tolist()))
+            assert_that(np.count_nonzero(distances[ref_indices] == h_sep), greater_than(0))
 
     @istest
-    def test_horizontal_constraint_in_2d_when_lats_are_the_same_produces_a_balanced_tree(self):
+    def test_horizontal_constraint_in_2d_when_lats_are_the_same(self):
         ug_data = mock.make_regular_2d_ungridded_data(lat_dim_length=1001, lat_max=10, lat_min=10)
         ug_data_points = ug_data.get_non_masked_points()
         sample_point = HyperPoint(lat=7.5, lon=-2.5)
         sample_points = HyperPointList([sample_point])
         coord_map = None
 
-        # One degree near 0, 0 is about 110km in latitude and longitude, so 300km should keep us to within 3 degrees
-        #  in each direction
         constraint = SepConstraintKdtree(h_sep=400)
 
         index = HaversineDistanceKDTreeIndex()
         index.index_data(sample_points, ug_data_points, coord_map, leafsize=2)
+        constraint.haversine_distance_kd_tree_index = index
+
+        new_points = constraint.constrain_points(sample_point, ug_data_points)
 
-        depth = self.get_max_depth(index.index.tree, 0)
+        # Only the points at a latitude of 10 and a longitude of -5 or 0 are within the separation
+        ref_count = np.count_nonzero([point.haversine_dist(sample_point) < 400 for point in ug_data_points])
+        eq_(len(new_points), ref_count)
+        assert_that(ref_count, greater_than(0))
+        assert all(point.latitude == 10 and point.longitude in (-5, 0) for point in new_points)
+
+
+    @istest
+    def test_haversine_index_only_created_when_horizontal_separation_is_the_only_one(self):
+        from cis.collocation import data_index
+        ug_data_points = mock.make_regular_4d_ungridded_data().get_non_masked_points()
+        sample_point = HyperPoint(lat=0.0, lon=0.0, alt=50.0, pres=50.0, t=dt.datetime(1984, 8, 29))
+
+        constraint = SepConstraintKdtree(h_sep=1000, a_sep=15)
+        data_index.create_indexes(constraint, None, ug_data_points, None)
+        assert_that(constraint.haversine_distance_kd_tree_index, is_(False))
+        ref_count = np.count_nonzero([point.haversine_dist(sample_point) < 1000 and point.alt_sep(sample_point) < 15
+                                      for point in ug_data_points])
+        eq_(len(constraint.constrain_points(sample_point, ug_data_points)), ref_count)
+        assert_that(ref_count, greater_than(0))
+
+        constraint = SepConstraintKdtree(h_sep=1000)
+        data_index.create_indexes(constraint, None, ug_data_points, None)
+        assert_that(constraint.haversine_distance_kd_tree_index, instance_of(HaversineDistanceKDTreeIndex))
+
+class TestHaversineDistanceKDTreeIndex(object):
+    @istest
+    def test_batch_query_finds_same_points_as_single_queries(self):
+        ug_data = mock.make_regular_2d_ungridded_data_with_missing_values()
+        ug_data_points = ug_data.get_non_masked_points()
+        sample_points = [HyperPoint(lat=7.5, lon=-2.5), HyperPoint(lat=0.0, lon=0.0), HyperPoint(lat=-60, lon=170)]
+
+        index = HaversineDistanceKDTreeIndex()
+        index.index_data(None, ug_data_points, None, leafsize=2)
+
+        offsets, indices = index.find_points_within_distance_in_batch([p.latitude for p in sample_points],
+                                                                      [p.longitude for p in sample_points], 800)
+        eq_(len(offsets), 4)
+        for i, sample_point in enumerate(sample_points):
+            expected = [idx for idx, point in ug_data_points.enumerate_non_masked_points()
+                        if point.haversine_dist(sample_point) <= 800]
+            eq_(index.find_points_within_distance(sample_point, 800), expected)
+            eq_(indices[offsets[i]:offsets[i + 1]].tolist(), expected)
+
+    @istest
+    def test_find_nearest_points_in_batch(self):
+        ug_data = mock.make_regular_2d_ungridded_data_with_missing_values()
+        ug_data_points = ug_data.get_non_masked_points()
+        sample_points = [HyperPoint(lat=7.5, lon=-2.5), HyperPoint(lat=0.4, lon=0.2), HyperPoint(lat=-60, lon=170)]
+
+        index = HaversineDistanceKDTreeIndex()
+        index.index_data(None, ug_data_points, None, leafsize=2)
+
+        indices, distances = index.find_nearest_points([p.latitude for p in sample_points],
+                                                       [p.longitude for p in sample_points], max_distance=1000)
+        for i, sample_point in enumerate(sample_points[:2]):
+            nearest_index = index.find_nearest_point(sample_point)
+            eq_(indices[i], nearest_index)
+            assert_that(distances[i], close_to(ug_data_points[nearest_index].haversine_dist(sample_point), 1e-6))
+        # The last point is further than the maximum distance from all of the data
+        eq_(indices[2], -1)
+        eq_(distances[2], np.inf)
+
+    @istest
+    def test_nearest_point_across_the_dateline(self):
+        ug_data = UngriddedData.from_points_array([HyperPoint(lat=0.0, lon=-179.5, val=1.0),
+                                                   HyperPoint(lat=0.0, lon=175.0, val=2.0),
+                                                   HyperPoint(lat=10.0, lon=179.0, val=3.0)])
+        index = HaversineDistanceKDTreeIndex()
+        index.index_data(None, ug_data.get_non_masked_points(), None)
+
+        eq_(index.find_nearest_point(HyperPoint(lat=0.0, lon=179.5)), 0)
+        eq_(index.find_nearest_point(HyperPoint(lat=9.0, lon=-179.9)), 2)
+
+    @istest
+    def test_first_of_many_equidistant_points_is_nearest(self):
+        points = [HyperPoint(lat=30.0, lon=30.0 + i, val=1.0) for i in range(3)]
+        points += [HyperPoint(lat=5.0, lon=5.0, alt=float(i), val=1.0) for i in range(50)]
+        ug_data = UngriddedData.from_points_array(points)
+        index = HaversineDistanceKDTreeIndex()
+        index.index_data(None, ug_data.get_non_masked_points(), None, leafsize=2)
 
-        assert_that(depth, is_(2), "Depth is 2, there are three unique values -10, 0, 10")
+        eq_(index.find_nearest_point(HyperPoint(lat=5.0, lon=5.0)), 3)
+        eq_(index.find_nearest_point(HyperPoint(lat=6.0, lon=5.0)), 3)
 
 
 class TestSepConstraintWithoutHorizontalSeparation(object):
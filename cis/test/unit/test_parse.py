@@ -664,6 +664,50 @@ class TestParseCollocate(ParseTestFiles):
         eq_([{'variables': ['variable'], 'product': None, 'filenames': [self.test_directory_files[0]]}],
             args.datagroups)
 
+    def test_GIVEN_no_workers_WHEN_collocate_THEN_one_worker(self):
+        args = ["col", "variable:" + self.escaped_test_directory_files[0], self.escaped_test_directory_files[0] +
+                ':collocator=bin']
+        args = parse_args(args)
+        eq_(1, args.workers)
+
+    def test_GIVEN_workers_WHEN_collocate_THEN_workers_parsed(self):
+        args = ["col", "variable:" + self.escaped_test_directory_files[0], self.escaped_test_directory_files[0] +
+                ':collocator=bin', '--workers', '4']
+        args = parse_args(args)
+        eq_(4, args.workers)
+
+    def test_GIVEN_zero_workers_WHEN_collocate_THEN_raises_error(self):
+        args = ["col", "variable:" + self.escaped_test_directory_files[0], self.escaped_test_directory_files[0] +
+                ':collocator=bin', '--workers', '0']
+        try:
+            parse_args(args)
+            assert False
+        except SystemExit as e:
+            if e.code != 2:
+                raise e
+
+    def test_GIVEN_chunk_size_WHEN_collocate_THEN_chunk_size_parsed(self):
+        args = ["col", "variable:" + self.escaped_test_directory_files[0], self.escaped_test_directory_files[0] +
+                ':collocator=bin', '--chunk-size', '1000']
+        args = parse_args(args)
+        eq_(1000, args.chunk_size)
+
+    def test_GIVEN_no_index_cache_option_WHEN_collocate_THEN_index_cache_not_used(self):
+        args = ["col", "variable:" + self.escaped_test_directory_files[0], self.escaped_test_directory_files[0] +
+                ':collocator=bin']
+        eq_(False, parse_args(args).index_cache)
+        eq_(True, parse_args(args + ['--index-cache']).index_cache)
+
+    def test_GIVEN_zero_chunk_size_WHEN_collocate_THEN_raises_error(self):
+        args = ["col", "variable:" + self.escaped_test_directory_files[0], self.escaped_test_directory_files[0] +
+                ':collocator=bin', '--chunk-size', '0']
+        try:
+            parse_args(args)
+            assert False
+        except SystemExit as e:
+            if e.code != 2:
+                raise e
+
     def test_can_specify_one_valid_samplefile_and_one_datafile_without_other_options(self):
         args = ["col", "variable:" + self.escaped_test_directory_files[0], self.escaped_test_directory_files[0] +
                 ':collocator=bin']
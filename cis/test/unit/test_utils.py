@@ -267,6 +267,22 @@ class TestUtils(unittest.TestCase):
         new_lons = fix_longitude_range(lons, -180)
         assert numpy.array_equal(new_lons, [0, 90, -180, -90, 0])
 
+    def test_GIVEN_lons_already_in_range_WHEN_fix_longitude_THEN_same_array_returned(self):
+        lons = numpy.array([-180., -90., 0., 90., 179.5])
+        assert fix_longitude_range(lons, -180) is lons
+
+    def test_GIVEN_in_place_WHEN_fix_longitude_THEN_longitudes_fixed_in_same_array(self):
+        lons = numpy.array([0., 90., 180., 270., 360.])
+        new_lons = fix_longitude_range(lons, -180, in_place=True)
+        assert new_lons is lons
+        assert numpy.array_equal(lons, [0, 90, -180, -90, 0])
+
+    def test_GIVEN_not_in_place_WHEN_fix_longitude_THEN_original_longitudes_unchanged(self):
+        lons = numpy.array([0., 90., 180., 270., 360.])
+        new_lons = fix_longitude_range(lons, -180)
+        assert numpy.array_equal(new_lons, [0, 90, -180, -90, 0])
+        assert numpy.array_equal(lons, [0, 90, 180, 270, 360])
+
     def test_GIVEN_list_of_arrays_to_concatenate_WHEN_all_are_masked_THEN_returns_masked_array_with_correct_mask(self):
         arrays = []
         for i in range(0, 3):
@@ -306,16 +306,28 @@ def unpack_data_object(data_object, x_variable, y_variable, x_wrap_start):
     return {"data": data, "x": x, "y": y}
 
 
-def fix_longitude_range(lons, range_start):
+def fix_longitude_range(lons, range_start, in_place=False):
     """Shifts longitude values by +/- 360 to fit within a 360 degree range starting at a specified value.
-    It is assumed that a no shifts larger than 360 are needed.
+    Only the values outside the range are changed, and if there are none the array is returned without being copied.
 
     :param lons: numpy array of longitude values
     :param range_start: longitude at start of 360 degree range into which values are required to fit
+    :param in_place: if True, and lons is a writable floating point array, the values are changed in lons itself
     :return: array of fixed longitudes
     """
     from iris.analysis.cartography import wrap_lons
-    return wrap_lons(lons, range_start, 360)
+    lons = np.asanyarray(lons)
+    values = np.ma.getdata(lons)
+    range_end = range_start + 360.0
+    if values.size == 0 or (np.min(values) >= range_start and np.max(values) < range_end):
+        return lons
+
+    if not (in_place and values.flags.writeable and np.issubdtype(values.dtype, np.floating)):
+        lons = lons.astype(lons.dtype if np.issubdtype(lons.dtype, np.floating) else np.float64)
+        values = np.ma.getdata(lons)
+    outside = (values < range_start) | (values >= range_end)
+    values[outside] = wrap_lons(values[outside], range_start, 360)
+    return lons
 
 
 def find_longitude_wrap_start(x_variable, packed_data_items):
@@ -420,6 +432,21 @@ def haversine(lat, lon, lat2, lon2):
     return arclen * R_E
 
 
+def haversine_for_arrays(lat, lon, lat2, lon2):
+    """
+    Computes the Haversine distance between two sets of points given as numpy arrays (which are broadcast against each
+    other)
+    """
+    R_E = 6378  # Radius of the earth in km
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lat2)
+    lon1 = np.radians(lon)
+    lon2 = np.radians(lon2)
+    arclen = 2 * np.arcsin(np.minimum(1.0, np.sqrt(
+        (np.sin((lat2 - lat1) / 2)) ** 2 + np.cos(lat1) * np.cos(lat2) * (np.sin((lon2 - lon1) / 2)) ** 2)))
+    return arclen * R_E
+
+
 class OrderedSet(collections.MutableSet):
     """
     From http://code.activestate.com/recipes/576694/